@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+save_to_disk()済みのHuggingFaceデータセット（danbooru-tags-2024）をArrowのまま読むユーティリティ
+Arrowファイルをメモリマップで開くため、スライスはコピーなしでpolarsに渡せる（pandasを経由しない）
+
+datasetsの保存形式はArrowのストリーム形式で、pl.scan_ipc / pyarrow.datasetは読めない。
+そのためscan_dataset()はメモリマップしたTableをpolarsのIOソースとして登録し、
+列の射影・行の絞り込み・先頭N行をクエリプランからスキャンへ押し下げる:
+
+    scan_dataset().filter(ACTIVE_FILTER).select(['id', 'created_at', 'score']).collect()
+"""
+
+import datetime
+import json
+import logging
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.ipc
+from polars.io.plugins import register_io_source
+
+logger = logging.getLogger(__name__)
+
+DATASET_PATH = "data/0_raw/danbooru-tags-2024"
+SCAN_BATCH_SIZE = 200000
+
+# 削除・BANされておらずスコアが正の投稿（各サンプラー共通の抽出条件）
+ACTIVE_FILTER = (pl.col("is_deleted") == False) & (pl.col("is_banned") == False) & (pl.col("score") > 0)
+
+# created_at（"2005-05-24T12:35:31.000+09:00"）の形式
+CREATED_AT_FORMAT = "%Y-%m-%dT%H:%M:%S%.f%z"
+
+
+def dataset_files(dataset_path: str = DATASET_PATH, split: str = "train") -> List[Path]:
+    """分割のArrowファイル一覧（state.jsonの順序、なければファイル名順）"""
+    split_dir = Path(dataset_path) / split
+    state_file = split_dir / "state.json"
+    if state_file.exists():
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        files = [split_dir / data_file['filename'] for data_file in state.get('_data_files', [])]
+    else:
+        files = sorted(split_dir.glob("*.arrow"))
+    if not files:
+        raise FileNotFoundError(f"Arrowファイルが見つかりません: {split_dir}")
+    return files
+
+
+def open_arrow_dataset(dataset_path: str = DATASET_PATH, split: str = "train") -> pa.Table:
+    """全Arrowファイルをメモリマップで開き、1つのTableとして返す（データは読み込まない）"""
+    tables = []
+    for path in dataset_files(dataset_path, split):
+        # datasetsはArrowのストリーム形式で保存する
+        source = pa.memory_map(str(path), 'r')
+        tables.append(pa.ipc.open_stream(source).read_all())
+    table = pa.concat_tables(tables)
+    logger.info(f"Arrowデータセット: {dataset_path}/{split} ({len(tables)}ファイル, {table.num_rows:,}件, メモリマップ)")
+    return table
+
+
+def iter_slices(table: pa.Table, chunk_size: int, start: int = 0) -> Iterator[Tuple[int, int, pa.Table]]:
+    """(開始行, 終了行, スライス) を順に返す（スライスはゼロコピー）"""
+    for offset in range(start, table.num_rows, chunk_size):
+        end = min(offset + chunk_size, table.num_rows)
+        yield offset, end, table.slice(offset, end - offset)
+
+
+def to_polars(table: pa.Table, columns: Sequence[str] = None) -> pl.DataFrame:
+    """必要な列だけpolarsへ（rechunkしないので数値列はArrowバッファをそのまま参照する）"""
+    if columns is not None:
+        table = table.select(list(columns))
+    return pl.from_arrow(table, rechunk=False)
+
+
+def scan_arrow_table(table: pa.Table, batch_size: int = SCAN_BATCH_SIZE) -> pl.LazyFrame:
+    """Arrow TableをLazyFrameとして公開する（射影・絞り込み・先頭N行はスキャン側で処理）
+
+    絞り込みはまず条件式が参照する列だけを変換して評価し、残った行の必要な列だけを
+    polarsへ変換する。tag列のような大きな文字列列は、条件を満たす行の分しか読まれない
+    """
+    schema = pl.from_arrow(table.schema.empty_table()).schema
+
+    def source(with_columns: Optional[List[str]], predicate: Optional[pl.Expr],
+               n_rows: Optional[int], batch_size_hint: Optional[int]) -> Iterator[pl.DataFrame]:
+        columns = with_columns if with_columns is not None else table.column_names
+        predicate_columns = predicate.meta.root_names() if predicate is not None else []
+        remaining = n_rows
+        for _, _, batch in iter_slices(table, batch_size_hint or batch_size):
+            if remaining is not None:
+                # n_rowsは絞り込み前の行数（head(n).filter(...) の順で押し下げられる）
+                if remaining <= 0:
+                    break
+                batch = batch.slice(0, remaining)
+                remaining -= batch.num_rows
+            projected = batch.select(columns)
+            if predicate is not None:
+                mask = to_polars(batch, predicate_columns).select(predicate.fill_null(False)).to_series()
+                projected = projected.filter(mask.to_arrow())
+            if projected.num_rows:
+                yield to_polars(projected)
+
+    return register_io_source(source, schema=schema)
+
+
+def scan_dataset(dataset_path: str = DATASET_PATH, split: str = "train",
+                 batch_size: int = SCAN_BATCH_SIZE) -> pl.LazyFrame:
+    """データセット全体の遅延スキャン（全サンプラー共通の入口）"""
+    return scan_arrow_table(open_arrow_dataset(dataset_path, split), batch_size)
+
+
+def scan_active_posts(dataset_path: str = DATASET_PATH, columns: Sequence[str] = None,
+                      split: str = "train") -> pl.LazyFrame:
+    """アクティブな投稿だけを、指定した列だけ読む遅延スキャン"""
+    lazy = scan_dataset(dataset_path, split).filter(ACTIVE_FILTER)
+    return lazy.select(list(columns)) if columns is not None else lazy
+
+
+def created_datetime_expr() -> pl.Expr:
+    """created_at文字列をDatetime（UTC）に変換した created_datetime 列"""
+    return pl.col("created_at").str.strptime(pl.Datetime, CREATED_AT_FORMAT).alias("created_datetime")
+
+
+def min_created_datetime(lazy: pl.LazyFrame):
+    """created_atの最小値（created_at列だけを読む事前パス）
+
+    全行を日時に変換せず、文字列のまま最小値を取る。ISO 8601は同じUTCオフセット同士なら
+    辞書順 = 時刻順で、オフセットの差（最大26時間）で順序が入れ替わりうるのは文字列の最小値から
+    2日以内の行だけなので、その数行だけを変換して最小値を求める
+    """
+    created_at = pl.col("created_at")
+    first = lazy.select(created_at.min()).collect().item()
+    if first is None:
+        return None
+    bound = (datetime.date.fromisoformat(first[:10]) + datetime.timedelta(days=2)).isoformat()
+    return lazy.filter(created_at < bound).select(created_datetime_expr().min()).collect().item()
+
+
+def with_score_per_hour(frame, min_date):
+    """hours_since_start / score_per_hour 列を追加（created_datetime列が必要）
+
+    min_dateは対象全体の最古日時を渡す（一部のチャンクから推定すると時間当たりスコアがずれる）
+    """
+    return frame.with_columns(
+        ((pl.col("created_datetime") - pl.lit(min_date)).dt.total_hours() + 1).alias("hours_since_start")
+    ).with_columns(
+        (pl.col("score") / pl.col("hours_since_start")).alias("score_per_hour")
+    )
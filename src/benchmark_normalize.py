@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+正規化処理（normalize_data + 統合処理）のベンチマーク
+合成した階層（大文字混在・大文字小文字違いの重複・tag group:X と X の組）で
+アイテム数を変えて時間を測り、1アイテムあたりの時間がほぼ一定（線形）であることを確認する
+"""
+
+import argparse
+import gc
+import logging
+import random
+import time
+from typing import Dict, List
+
+from scalable_hierarchy_scraper import NodeType, ScalableHierarchyScraper, ScrapingConfig
+
+logger = logging.getLogger(__name__)
+
+# 分類の出現比率（最終タグが大半で、下位リストを持つ項目とtag group名の項目が少数）
+CLASSIFICATION_WEIGHTS = {
+    NodeType.FINAL_TAG_ONLY.value: 0.85,
+    NodeType.TAG_AND_TAG_GROUP.value: 0.07,
+    NodeType.TAG_GROUP_ONLY.value: 0.05,
+    NodeType.TRADITIONAL_TAG_GROUP.value: 0.03,
+}
+CLASSIFICATIONS = list(CLASSIFICATION_WEIGHTS)
+DUPLICATE_RATIO = 0.05        # 大文字小文字違いの重複（別のグループに別の分類で現れる）
+TAG_GROUP_PAIR_RATIO = 0.03   # tag group:X（または tag group:X tags）と X の組
+
+
+def synthetic_hierarchy(size: int, seed: int = 0) -> Dict:
+    """extract_hierarchy_from_page()と同じ形の合成階層（約size件のitems）
+
+    重複は分類を独立に選ぶので、優先度の異なる組（_classify_priorityで決まる）と
+    同じ組（パスの短い方が残る）の両方ができる。tag group:Xの組はパスの長さが
+    ランダムなので、統合処理のbase_item_preferred / tag_group_more_detailedの両方を通る
+    """
+    rng = random.Random(seed)
+    weights = list(CLASSIFICATION_WEIGHTS.values())
+    items: Dict[str, Dict] = {}
+    groups = [f"Group {i}" for i in range(max(1, size // 1000))]
+    for i in range(size):
+        roll = rng.random()
+        classification = rng.choices(CLASSIFICATIONS, weights)[0]
+        if roll < DUPLICATE_RATIO and i > 0:
+            # 大文字小文字違いの重複（元の項目とは別のグループ）
+            name = f"Tag_{rng.randrange(i)}".upper()
+            group = rng.choice(groups)
+        elif roll < DUPLICATE_RATIO + TAG_GROUP_PAIR_RATIO:
+            # tag group:X と X の組（後でXが現れる）
+            suffix = ' tags' if rng.random() < 0.5 else ''
+            name = f"Tag group:tag_{i + 1}{suffix}"
+            classification = NodeType.TRADITIONAL_TAG_GROUP.value
+            group = groups[i % len(groups)]
+        else:
+            name = f"Tag_{i}" if roll < 0.5 else f"tag_{i}"
+            group = groups[i % len(groups)]
+        depth = rng.randint(1, 4)
+        path = [group] + [f"Sub {i % (7 + d)}" for d in range(depth - 1)] + [name]
+        items[name] = {
+            'name': name,
+            'url': f"https://danbooru.donmai.us/wiki_pages/{name.lower()}",
+            'path': path,
+            'parent': path[-2],
+            'depth': len(path),
+            'has_nested_list': classification in (NodeType.TAG_AND_TAG_GROUP.value, NodeType.TAG_GROUP_ONLY.value),
+            'classification': classification,
+            'should_follow': False
+        }
+    return {
+        'headings': [{'level': 2, 'text': group} for group in groups],
+        'items': items,
+        'excluded_sections': ['See Also'],
+        'ignored_elements': []
+    }
+
+
+def benchmark_size(scraper: ScalableHierarchyScraper, size: int, repeat: int = 3) -> Dict:
+    """1サイズ分の計測（repeat回の最良値）"""
+    hierarchy = synthetic_hierarchy(size)
+    best = float('inf')
+    for _ in range(repeat):
+        # 世代別GCの走査は生存オブジェクト数に比例して重くなるので、計測中は止める
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = scraper.normalize_data(hierarchy)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    removed = result['removed_duplicates']
+    duplicates = len(removed)
+    return {
+        'size': size,
+        'input_items': len(hierarchy['items']),
+        'output_items': len(result['items']),
+        'duplicates': duplicates,
+        # 分類の異なる重複（優先度で解決された組）
+        'conflicts': sum(record['kept_classification'] != record['discarded_classification'] for record in removed),
+        'consolidated': len(hierarchy['items']) - duplicates - len(result['items']),
+        'seconds': best,
+        'us_per_item': best / len(hierarchy['items']) * 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='正規化処理のベンチマーク')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 1000000], help='合成アイテム数')
+    parser.add_argument('--repeat', type=int, default=3, help='繰り返し回数（最良値を採用）')
+    args = parser.parse_args()
+
+    scraper = ScalableHierarchyScraper(ScrapingConfig(fetch_backend='curl'))
+    logging.getLogger('scalable_hierarchy_scraper').setLevel(logging.WARNING)
+
+    results: List[Dict] = [benchmark_size(scraper, size, args.repeat) for size in sorted(args.sizes)]
+    baseline = results[0]
+
+    logger.info(f"\n{'size':>9} {'in':>9} {'out':>9} {'dups':>7} {'conflict':>8} {'merged':>7} {'time(s)':>9} {'µs/item':>8} {'ratio':>6}")
+    for result in results:
+        ratio = result['us_per_item'] / baseline['us_per_item'] if baseline['us_per_item'] > 0 else 0.0
+        logger.info(
+            f"{result['size']:>9} {result['input_items']:>9} {result['output_items']:>9} {result['duplicates']:>7} "
+            f"{result['conflicts']:>8} {result['consolidated']:>7} {result['seconds']:>9.3f} {result['us_per_item']:>8.2f} {ratio:>5.2f}x"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
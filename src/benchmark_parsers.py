@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+HTMLパーサーバックエンドのベンチマーク
+保存済みのtag groupページ（.html / レスポンスキャッシュの.gz / スナップショット形式のコーパス）で
+パース+階層抽出の時間を比較する。--crawlでは記録済みコーパスをreplayバックエンドで取得し、
+クロール全体（フロンティア処理・マージ込み）をネットワークなしで計測する
+"""
+
+import argparse
+import gzip
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from hierarchy_snapshots import SnapshotStore
+from html_parsers import PARSER_BACKENDS, HAS_LXML, HAS_SELECTOLAX, parse_wiki_page
+from scalable_hierarchy_scraper import ScalableHierarchyScraper, ScrapingConfig
+
+logger = logging.getLogger(__name__)
+
+
+def load_pages(paths: List[str]) -> Dict[str, str]:
+    """ファイル/ディレクトリから保存済みページを読み込む（manifest.jsonlがあればコーパスとして読む）"""
+    files = []
+    pages = {}
+    for path in map(Path, paths):
+        if (path / 'manifest.jsonl').exists():
+            store = SnapshotStore(str(path))
+            for entry in store.load_manifest():
+                pages[entry.url] = store.read(entry)
+        elif path.is_dir():
+            files.extend(sorted(p for p in path.rglob('*') if p.suffix in ('.html', '.gz')))
+        elif path.exists():
+            files.append(path)
+
+    for file in files:
+        data = file.read_bytes()
+        if file.suffix == '.gz':
+            data = gzip.decompress(data)
+        pages[str(file)] = data.decode('utf-8', errors='replace')
+    return pages
+
+
+def available_backends() -> List[str]:
+    backends = ['html.parser']
+    if HAS_LXML:
+        backends.append('lxml')
+    if HAS_SELECTOLAX:
+        backends.append('selectolax')
+    return backends
+
+
+def benchmark_backend(scraper: ScalableHierarchyScraper, pages: Dict[str, str], backend: str,
+                      repeat: int = 3) -> Dict:
+    """1バックエンド分の計測（repeat回の最良値）"""
+    best_parse = best_total = float('inf')
+    items_by_page = {}
+    for _ in range(repeat):
+        parse_time = total_time = 0.0
+        for name, html in pages.items():
+            start = time.perf_counter()
+            soup, _ = parse_wiki_page(html, backend)
+            parsed = time.perf_counter()
+            result = scraper.extract_hierarchy_from_page(soup, ['benchmark'], name)
+            done = time.perf_counter()
+            parse_time += parsed - start
+            total_time += done - start
+            items_by_page[name] = result['items']
+        best_parse = min(best_parse, parse_time)
+        best_total = min(best_total, total_time)
+
+    total_items = sum(len(items) for items in items_by_page.values())
+    return {
+        'backend': backend,
+        'parse_seconds': best_parse,
+        'total_seconds': best_total,
+        'pages_per_sec': len(pages) / best_total if best_total > 0 else 0.0,
+        'items': total_items,
+        'items_per_sec': total_items / best_total if best_total > 0 else 0.0,
+        'items_by_page': items_by_page
+    }
+
+
+def benchmark_crawl(corpus_dir: str, backend: str, repeat: int = 3, concurrency: int = 1,
+                    latency: float = 0.0) -> Dict:
+    """記録済みコーパスをreplayで取得し、メインページからのクロール全体を計測（repeat回の最良値）"""
+    # 記録時のメインページ（深度0）から開始する
+    start_url = next(entry.url for entry in SnapshotStore(corpus_dir).load_manifest() if entry.depth == 0)
+    best_total = float('inf')
+    for _ in range(repeat):
+        scraper = ScalableHierarchyScraper(ScrapingConfig(
+            fetch_backend='replay', replay_dir=corpus_dir, replay_latency=latency,
+            parser_backend=backend, concurrency=concurrency, rate_limit=0.0, max_retries=0
+        ))
+        try:
+            start = time.perf_counter()
+            result = scraper.scrape_complete_hierarchy_scalable(start_url)
+            total = time.perf_counter() - start
+        finally:
+            scraper.close()
+        if total < best_total:
+            best_total, best_scraper, items = total, scraper, result['items']
+
+    metrics = best_scraper.metrics.summary()
+    pages = metrics['parse_seconds']['count']
+    return {
+        'backend': backend,
+        'parse_seconds': metrics['parse_seconds']['sum'],
+        'total_seconds': best_total,
+        'pages': pages,
+        'pages_per_sec': pages / best_total if best_total > 0 else 0.0,
+        'items': len(items),
+        'items_per_sec': len(items) / best_total if best_total > 0 else 0.0,
+        'items_by_page': {'crawl': items}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTMLパーサーバックエンドのベンチマーク')
+    parser.add_argument('paths', nargs='*', default=['tmp/http_cache/bodies'], help='保存済みページ（ファイル or ディレクトリ）')
+    parser.add_argument('--backends', nargs='+', choices=PARSER_BACKENDS[1:], help='比較するバックエンド（省略時はインストール済み全て）')
+    parser.add_argument('--repeat', type=int, default=3, help='繰り返し回数（最良値を採用）')
+    parser.add_argument('--crawl', metavar='CORPUS', help='記録済みコーパス（--fetch-only --snapshot-dirの出力）をreplayしてクロール全体を計測')
+    parser.add_argument('--concurrency', type=int, default=1, help='--crawl時の並行取得ワーカー数')
+    parser.add_argument('--latency', type=float, default=0.0, help='--crawl時に1リクエストごとに待つ秒数（通信の模擬）')
+    args = parser.parse_args()
+    backends = args.backends or available_backends()
+
+    if args.crawl:
+        logging.getLogger('scalable_hierarchy_scraper').setLevel(logging.WARNING)
+        logging.getLogger('fetch_backends').setLevel(logging.WARNING)
+        logger.info(f"クロール計測: {args.crawl} (concurrency={args.concurrency}, latency={args.latency}秒)")
+        results = [benchmark_crawl(args.crawl, backend, args.repeat, args.concurrency, args.latency) for backend in backends]
+        page_names = ['crawl']
+    else:
+        pages = load_pages(args.paths)
+        if not pages:
+            logger.error(f"ページが見つかりません: {args.paths}")
+            return None
+        total_bytes = sum(len(html) for html in pages.values())
+        logger.info(f"対象ページ: {len(pages)}件, {total_bytes / (1024*1024):.2f} MB")
+
+        # 抽出ロジックはバックエンド共通、ネットワークは使わない
+        scraper = ScalableHierarchyScraper(ScrapingConfig(fetch_backend='curl'))
+        logging.getLogger('scalable_hierarchy_scraper').setLevel(logging.WARNING)
+
+        results = [benchmark_backend(scraper, pages, backend, args.repeat) for backend in backends]
+        page_names = list(pages)
+    baseline = results[0]
+
+    logger.info(f"\n{'backend':<12} {'parse(s)':>9} {'total(s)':>9} {'pages/s':>9} {'items':>8} {'items/s':>10} {'speedup':>8}  一致")
+    for result in results:
+        speedup = baseline['total_seconds'] / result['total_seconds'] if result['total_seconds'] > 0 else 0.0
+        same = all(
+            set(result['items_by_page'][name]) == set(baseline['items_by_page'][name])
+            for name in page_names
+        )
+        logger.info(
+            f"{result['backend']:<12} {result['parse_seconds']:>9.3f} {result['total_seconds']:>9.3f} "
+            f"{result['pages_per_sec']:>9.1f} {result['items']:>8} {result['items_per_sec']:>10.1f} "
+            f"{speedup:>7.2f}x  {'✅' if same else '❌'}"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
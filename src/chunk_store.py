@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+中間チャンクのParquetストア（作成月ごとのHiveパーティション）
+
+    data/temp_chunks/created_month=2024-01/chunk_00003.parquet
+
+チャンクは作成月ごとに分けて書き、行グループごとのmin/max統計を付ける。
+読む側はscan_chunks()で必要な列・必要な月だけを遅延スキャンできる:
+
+    scan_chunks(columns=['id', 'score'], months=['2024-01', '2024-02']).collect()
+
+チャンクごとの処理状態はmanifest.json（1チャンク1レコード）に記録し、一時ファイル経由で置き換える
+列の最小値・最大値はcolumn_range()でParquetのフッター統計から求める（行データは読まない）
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import polars as pl
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+CHUNK_STORE_DIR = "data/temp_chunks"
+PARTITION_COLUMN = "created_month"
+ROW_GROUP_SIZE = 50000
+MANIFEST_NAME = "manifest.json"
+
+
+@dataclass
+class ChunkRecord:
+    """manifest.jsonの1レコード（チャンク1件分）"""
+    chunk_id: int
+    start: int                                              # 入力の開始行
+    end: int                                                # 入力の終了行（含まない）
+    status: str                                             # 'done' / 'failed'
+    input_rows: int = 0
+    active_rows: int = 0
+    months: Dict[str, int] = field(default_factory=dict)    # 作成月 → 行数
+    checksum: str = ''                                      # 書いたParquetファイルのsha256（月順に連結）
+    error: Optional[str] = None
+    seconds: float = 0.0
+    finished_at: float = 0.0
+
+
+def _partition_dir(store_dir: Path, month: str) -> Path:
+    return store_dir / f"{PARTITION_COLUMN}={month}"
+
+
+def _chunk_name(chunk_id: int) -> str:
+    return f"chunk_{chunk_id:05d}.parquet"
+
+
+def month_expr() -> pl.Expr:
+    """created_at（"YYYY-MM-DDTHH:MM:SS..."）から作成月 "YYYY-MM" を取り出す式"""
+    return pl.col("created_at").str.slice(0, 7)
+
+
+def write_chunk(df: pl.DataFrame, chunk_id: int, store_dir: str = CHUNK_STORE_DIR) -> Dict[str, int]:
+    """チャンクを作成月ごとに書き出し、月 → 行数を返す
+
+    同じchunk_idの古いファイルは先に消すので、チャンクの再処理で行が重複しない。
+    各ファイルは一時ファイルに書いてから置き換える（途中で落ちても半端なParquetは残らない）
+    """
+    store = Path(store_dir)
+    remove_chunk(chunk_id, store_dir)
+
+    counts: Dict[str, int] = {}
+    if df.is_empty():
+        return counts
+
+    partitions = df.with_columns(month_expr().alias(PARTITION_COLUMN)).partition_by(
+        PARTITION_COLUMN, as_dict=True, include_key=False
+    )
+    for (month,), part in sorted(partitions.items()):
+        target = _partition_dir(store, month) / _chunk_name(chunk_id)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix(f".{os.getpid()}.tmp")
+        part.write_parquet(tmp_path, statistics=True, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, target)
+        counts[month] = len(part)
+    return counts
+
+
+def remove_chunk(chunk_id: int, store_dir: str = CHUNK_STORE_DIR) -> int:
+    """chunk_idのファイルを全パーティションから削除し、削除数を返す"""
+    removed = 0
+    for path in chunk_paths(chunk_id, store_dir):
+        path.unlink()
+        removed += 1
+    return removed
+
+
+def chunk_paths(chunk_id: int, store_dir: str = CHUNK_STORE_DIR) -> List[Path]:
+    """chunk_idのファイル（作成月順）"""
+    return sorted(Path(store_dir).glob(f"{PARTITION_COLUMN}=*/{_chunk_name(chunk_id)}"))
+
+
+def chunk_checksum(chunk_id: int, store_dir: str = CHUNK_STORE_DIR) -> str:
+    """chunk_idの全ファイルの内容（パーティション名を含む）から計算したsha256"""
+    digest = hashlib.sha256()
+    for path in chunk_paths(chunk_id, store_dir):
+        digest.update(path.parent.name.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def clear_store(store_dir: str = CHUNK_STORE_DIR) -> int:
+    """全チャンクファイルとmanifestを削除し、削除したファイル数を返す"""
+    files = chunk_files(store_dir)
+    for path in files:
+        path.unlink()
+    manifest = Path(store_dir) / MANIFEST_NAME
+    if manifest.exists():
+        manifest.unlink()
+    return len(files)
+
+
+def chunk_files(store_dir: str = CHUNK_STORE_DIR) -> List[Path]:
+    """ストア内のParquetファイル（月 → チャンク番号の順）"""
+    return sorted(Path(store_dir).glob(f"{PARTITION_COLUMN}=*/chunk_*.parquet"))
+
+
+def list_months(store_dir: str = CHUNK_STORE_DIR) -> List[str]:
+    """ストアに存在する作成月"""
+    prefix = f"{PARTITION_COLUMN}="
+    return sorted(path.name[len(prefix):] for path in Path(store_dir).glob(f"{prefix}*") if path.is_dir())
+
+
+def column_range(column: str, store_dir: str = CHUNK_STORE_DIR) -> Tuple[Any, Any]:
+    """ストア全体での列の (最小値, 最大値)
+
+    各ファイルの行グループ統計だけを読む。統計のない行グループがあれば列をスキャンする
+    """
+    files = chunk_files(store_dir)
+    if not files:
+        raise FileNotFoundError(f"チャンクファイルが見つかりません: {store_dir}")
+
+    low, high = None, None
+    for path in files:
+        metadata = pq.read_metadata(path)
+        index = metadata.schema.names.index(column)
+        for row_group in range(metadata.num_row_groups):
+            statistics = metadata.row_group(row_group).column(index).statistics
+            if statistics is None or not statistics.has_min_max:
+                logger.warning(f"統計のない行グループがあるため列をスキャンします: {path} ({column})")
+                return tuple(pl.scan_parquet(files, hive_partitioning=False)
+                             .select(pl.col(column).min().alias('min'), pl.col(column).max().alias('max'))
+                             .collect().row(0))
+            low = statistics.min if low is None else min(low, statistics.min)
+            high = statistics.max if high is None else max(high, statistics.max)
+    return low, high
+
+
+def scan_chunks(store_dir: str = CHUNK_STORE_DIR, columns: Optional[Sequence[str]] = None,
+                months: Optional[Sequence[str]] = None) -> pl.LazyFrame:
+    """ストア全体の遅延スキャン
+
+    monthsを指定すると該当パーティションのファイルだけを読む（それ以外は開かない）。
+    列の射影と、行グループ統計による絞り込みはscan_parquetに押し下げられる
+    """
+    files = chunk_files(store_dir)
+    if months is not None:
+        wanted = {_partition_dir(Path(store_dir), month) for month in months}
+        files = [path for path in files if path.parent in wanted]
+    if not files:
+        raise FileNotFoundError(f"チャンクファイルが見つかりません: {store_dir}")
+
+    lazy = pl.scan_parquet(files, hive_partitioning=True)
+    return lazy.select(list(columns)) if columns is not None else lazy
+
+
+class ChunkManifest:
+    """<store_dir>/manifest.json（入力の識別情報 + チャンクごとの処理結果）
+
+    書き込みはメインプロセスだけが行い、毎回全体を一時ファイルに書いてから置き換える。
+    入力（パス・総行数・チャンクサイズ・列構成）が変わった場合、既存のレコードは使わない
+    """
+
+    def __init__(self, store_dir: str = CHUNK_STORE_DIR):
+        self.store_dir = Path(store_dir)
+        self.path = self.store_dir / MANIFEST_NAME
+
+    def load(self, source: Dict) -> Optional[Dict[int, ChunkRecord]]:
+        """sourceが一致すればchunk_id → レコード、manifestがなければ空、一致しなければNone"""
+        if not self.path.exists():
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('source') != source:
+            return None
+        return {record['chunk_id']: ChunkRecord(**record) for record in manifest.get('chunks', [])}
+
+    def commit(self, source: Dict, records: Dict[int, ChunkRecord]):
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {
+            'source': source,
+            'updated_at': time.time(),
+            'chunks': [asdict(records[chunk_id]) for chunk_id in sorted(records)],
+        }
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def is_complete(self, record: Optional[ChunkRecord], verify_checksum: bool = False) -> bool:
+        """レコードがdoneで、記録した月のファイルが揃っているか（必要ならチェックサムも照合）"""
+        if record is None or record.status != 'done':
+            return False
+        months = {path.parent.name[len(PARTITION_COLUMN) + 1:] for path in chunk_paths(record.chunk_id, str(self.store_dir))}
+        if months != set(record.months):
+            return False
+        return not verify_checksum or chunk_checksum(record.chunk_id, str(self.store_dir)) == record.checksum
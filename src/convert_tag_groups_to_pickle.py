@@ -8,6 +8,8 @@ import polars as pl
 import logging
 from pathlib import Path
 
+from result_store import has_table_result, read_result_metadata, scan_items_with_paths
+
 # ログ設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -17,6 +19,15 @@ def convert_tag_groups_to_pickle():
     input_file = "data/0_raw/scalable_scraping_result.json"
     output_file = "data/tag_groups.pkl"
     
+    # 表形式（.meta.json + items.jsonl/.arrow）の方が新しければ全体を読み込まずに変換
+    if has_table_result(input_file):
+        metadata = read_result_metadata(input_file)
+        logger.info(f"表形式を読み込み: {metadata['tables']['items']['file']} ({metadata['format']})")
+        # パス文字列はノードごとに1回だけ連結（アイテムごとのjoinを避ける）
+        df = scan_items_with_paths(input_file, 'items', separator=" → ").collect()
+        save_tag_groups(df, output_file)
+        return
+    
     logger.info(f"JSON読み込み開始: {input_file}")
     
     # JSONファイル読み込み
@@ -48,7 +59,10 @@ def convert_tag_groups_to_pickle():
     # polars DataFrameに変換
     logger.info("polars DataFrameに変換中...")
     df = pl.DataFrame(records)
-    
+    save_tag_groups(df, output_file)
+
+def save_tag_groups(df: pl.DataFrame, output_file: str):
+    """DataFrameをpickle保存"""
     # pickle保存
     logger.info(f"pickle保存: {output_file}")
     Path(output_file).parent.mkdir(exist_ok=True)
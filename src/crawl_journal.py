@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+階層スクレイピングの再開用ジャーナル
+追記専用のJSON Linesにページ単位の結果と定期チェックポイント（フロンティア・訪問済みURL）を記録する
+"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (正規化URL, アイテム, 取得URL, 追跡深度)
+JournalTarget = Tuple[str, Dict, str, int]
+
+
+@dataclass
+class ResumeState:
+    """ジャーナルから復元したクロール状態"""
+    start_url: str
+    main_result: Dict
+    page_results: List[Dict] = field(default_factory=list)
+    pending: Dict[str, JournalTarget] = field(default_factory=dict)
+    visited_urls: Set[str] = field(default_factory=set)
+    scheduled_count: int = 0
+
+
+class CrawlJournal:
+    """レコード種別: main（メインページ解析結果と初期フロンティア）、page（1ページ分の結果）、checkpoint"""
+
+    def __init__(self, path: str = "tmp/scalable_scraping_journal.jsonl", checkpoint_interval: int = 20):
+        self.path = Path(path)
+        self.checkpoint_interval = checkpoint_interval
+        self._pages_since_checkpoint = 0
+        self._file = None
+
+    def _append(self, record: Dict, sync: bool = False):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def start(self, start_url: str, main_result: Dict, pending: List[JournalTarget],
+              visited_urls: Set[str], scheduled_count: int):
+        """新規クロール開始: 既存ジャーナルを破棄してmainレコードを書く"""
+        self.close()
+        if self.path.exists():
+            self.path.unlink()
+        self._append({
+            'type': 'main',
+            'start_url': start_url,
+            'main_result': main_result,
+            'pending': pending,
+            'visited_urls': sorted(visited_urls),
+            'scheduled_count': scheduled_count
+        }, sync=True)
+        self._pages_since_checkpoint = 0
+        logger.info(f"ジャーナル記録開始: {self.path}")
+
+    def record_page(self, target: JournalTarget, item_result: Optional[Dict], discovered: List[JournalTarget]):
+        """1ページ分の処理結果を追記（item_resultがNoneなら取得失敗）"""
+        self._append({
+            'type': 'page',
+            'target': target,
+            'result': item_result,
+            'discovered': discovered
+        })
+        self._pages_since_checkpoint += 1
+
+    def should_checkpoint(self) -> bool:
+        return self._pages_since_checkpoint >= self.checkpoint_interval
+
+    def checkpoint(self, pending: List[JournalTarget], visited_urls: Set[str], scheduled_count: int,
+                   failed: List[JournalTarget]):
+        """フロンティア（処理中を含む）・訪問済みURL・失敗ページを記録してfsync"""
+        self._append({
+            'type': 'checkpoint',
+            'pending': pending,
+            'visited_urls': sorted(visited_urls),
+            'scheduled_count': scheduled_count,
+            'failed': failed
+        }, sync=True)
+        self._pages_since_checkpoint = 0
+
+    def load(self) -> Optional[ResumeState]:
+        """最後のチェックポイントと、それ以降のpageレコードからクロール状態を復元"""
+        if not self.path.exists():
+            return None
+
+        main_record = None
+        page_records: List[Dict] = []
+        last_checkpoint = None
+        after_checkpoint: List[Dict] = []
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 書き込み途中で中断した末尾行
+                    logger.warning(f"ジャーナル{line_no}行目が不完全なため以降を無視します")
+                    break
+                if record['type'] == 'main':
+                    main_record = record
+                    page_records, last_checkpoint, after_checkpoint = [], None, []
+                elif record['type'] == 'page':
+                    page_records.append(record)
+                    after_checkpoint.append(record)
+                elif record['type'] == 'checkpoint':
+                    last_checkpoint = record
+                    after_checkpoint = []
+
+        if main_record is None:
+            return None
+
+        base = last_checkpoint or main_record
+        state = ResumeState(
+            start_url=main_record['start_url'],
+            main_result=main_record['main_result'],
+            pending={target[0]: tuple(target) for target in base['pending']},
+            visited_urls=set(base['visited_urls']),
+            scheduled_count=base['scheduled_count']
+        )
+        failed = {target[0]: tuple(target) for target in base.get('failed', [])}
+
+        # チェックポイント後に完了したページを反映
+        for record in after_checkpoint:
+            key = record['target'][0]
+            state.pending.pop(key, None)
+            if record['result'] is None:
+                failed[key] = tuple(record['target'])
+            else:
+                # チェックポイント時点で失敗していても、その後の再試行で取得できた
+                failed.pop(key, None)
+            for target in record['discovered']:
+                state.pending[target[0]] = tuple(target)
+                state.visited_urls.add(target[0])
+                state.scheduled_count += 1
+
+        # 失敗したページは再開時に再取得する
+        for key, target in failed.items():
+            state.pending.setdefault(key, target)
+
+        state.page_results = [record['result'] for record in page_records if record['result'] is not None]
+        logger.info(
+            f"ジャーナルから復元: 完了{len(state.page_results)}ページ, "
+            f"残り{len(state.pending)}ページ（再試行{len(failed)}）, 訪問済み{len(state.visited_urls)}"
+        )
+        return state
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+クロールの計測（リクエスト遅延・レスポンスサイズ・パース時間・レート制限の待機・再試行・キャッシュ・キュー長）
+実行結果のmetadataにJSONで残し、必要ならPrometheusのテキスト形式（node_exporterのtextfile collector用）でも書き出す
+"""
+
+import bisect
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# 既定のバケット上限（Prometheusのヒストグラムと同じく「以下」の累積で数える）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1024, 10 * 1024, 50 * 1024, 100 * 1024, 250 * 1024, 500 * 1024, 1024 * 1024, 5 * 1024 * 1024)
+PARSE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUEUE_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000)
+
+METRIC_PREFIX = 'danbooru_scraper'
+
+
+class Histogram:
+    """固定バケットのヒストグラム（件数・合計・最小/最大と、バケットからの分位点推定）"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後は+Inf
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """バケット内を線形補間した分位点（上限は観測した最大値で頭打ち）"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                value = lower + (upper - lower) * (rank - cumulative) / count
+                return min(max(value, self.min), self.max)
+            cumulative += count
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {str(bound): count for bound, count in zip(self._bounds(), self._cumulative())},
+        }
+
+    def _bounds(self) -> List[str]:
+        return [repr(bound) for bound in self.buckets] + ['+Inf']
+
+    def _cumulative(self) -> List[int]:
+        cumulative, total = [], 0
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+
+class CrawlMetrics:
+    """スクレイパー1回分の計測値（ワーカースレッドから記録されるためロックで保護）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_seconds = Histogram(LATENCY_BUCKETS)      # ネットワークリクエスト1回ごと（再試行も含む）
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.parse_seconds = Histogram(PARSE_BUCKETS)          # ページごとのHTMLパース + 階層抽出
+        self.queue_depth = Histogram(QUEUE_BUCKETS)            # ページ取り出し時点のフロンティア長
+        self.max_queue_depth = 0
+        self.responses: Dict[str, int] = {}                    # HTTPステータス or エラー種別 → 件数
+        self.retries = 0
+        self.rate_limit_waits = 0                              # 実際に待機したリクエスト数
+        self.rate_limit_sleep_seconds = 0.0
+        self.cache: Dict[str, int] = {'hit': 0, 'revalidated': 0, 'miss': 0}
+        self.reused_pages = 0                                  # 差分更新でパースを省略したページ
+
+    def record_wait(self, seconds: float):
+        """レート制限（RateLimiter / TokenBucketLimiter）で待機した時間"""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.rate_limit_waits += 1
+            self.rate_limit_sleep_seconds += seconds
+
+    def record_response(self, status: Optional[int], error: Optional[str], elapsed: float, size: int):
+        """ネットワークリクエスト1回分（キャッシュから返した分は含めない）"""
+        label = str(status) if status is not None else (error or 'unknown')
+        with self._lock:
+            self.responses[label] = self.responses.get(label, 0) + 1
+            self.request_seconds.observe(elapsed)
+            if size:
+                self.response_bytes.observe(size)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_cache(self, outcome: str):
+        """'hit'（再検証なしで使用）/ 'revalidated'（304）/ 'miss'"""
+        with self._lock:
+            self.cache[outcome] += 1
+
+    def record_parse(self, seconds: float):
+        with self._lock:
+            self.parse_seconds.observe(seconds)
+
+    def record_reuse(self):
+        with self._lock:
+            self.reused_pages += 1
+
+    def record_queue_depth(self, depth: int):
+        with self._lock:
+            self.queue_depth.observe(depth)
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def cache_hit_rate(self) -> Optional[float]:
+        """キャッシュ参照のうち本文を再取得せずに済んだ割合（hit + 304）"""
+        lookups = sum(self.cache.values())
+        if lookups == 0:
+            return None
+        return (self.cache['hit'] + self.cache['revalidated']) / lookups
+
+    def summary(self) -> Dict:
+        """metadataに入れるJSONサマリー"""
+        with self._lock:
+            return {
+                'requests': self.request_seconds.count,
+                'responses': dict(sorted(self.responses.items())),
+                'retries': self.retries,
+                'request_seconds': self.request_seconds.summary(),
+                'response_bytes': self.response_bytes.summary(),
+                'parse_seconds': self.parse_seconds.summary(),
+                'rate_limit': {
+                    'waits': self.rate_limit_waits,
+                    'sleep_seconds': self.rate_limit_sleep_seconds,
+                },
+                'cache': {**self.cache, 'hit_rate': self.cache_hit_rate()},
+                'reused_pages': self.reused_pages,
+                'queue_depth': {**self.queue_depth.summary(), 'max': self.max_queue_depth},
+            }
+
+    def to_prometheus(self, prefix: str = METRIC_PREFIX) -> str:
+        """Prometheusのテキスト形式（exposition format 0.0.4）"""
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(name: str, help_text: str, hist: Histogram):
+            metric(name, 'histogram', help_text)
+            for bound, count in zip(hist._bounds(), hist._cumulative()):
+                lines.append(f'{prefix}_{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{prefix}_{name}_sum {hist.total!r}")
+            lines.append(f"{prefix}_{name}_count {hist.count}")
+
+        with self._lock:
+            histogram('request_duration_seconds', 'Network request latency per attempt.', self.request_seconds)
+            histogram('response_size_bytes', 'Decoded response body size.', self.response_bytes)
+            histogram('parse_duration_seconds', 'HTML parse and hierarchy extraction time per page.', self.parse_seconds)
+            histogram('queue_depth', 'Frontier length when a page is dequeued.', self.queue_depth)
+
+            metric('responses_total', 'counter', 'Network responses by HTTP status or error kind.')
+            for label, count in sorted(self.responses.items()):
+                lines.append(f'{prefix}_responses_total{{status="{label}"}} {count}')
+            metric('retries_total', 'counter', 'Retried requests (429, 5xx, timeout, network error).')
+            lines.append(f"{prefix}_retries_total {self.retries}")
+            metric('rate_limit_sleep_seconds_total', 'counter', 'Time spent waiting in the rate limiter.')
+            lines.append(f"{prefix}_rate_limit_sleep_seconds_total {self.rate_limit_sleep_seconds!r}")
+            metric('rate_limit_waits_total', 'counter', 'Requests delayed by the rate limiter.')
+            lines.append(f"{prefix}_rate_limit_waits_total {self.rate_limit_waits}")
+            metric('cache_lookups_total', 'counter', 'Response cache lookups by outcome.')
+            for outcome, count in self.cache.items():
+                lines.append(f'{prefix}_cache_lookups_total{{outcome="{outcome}"}} {count}')
+            metric('reused_pages_total', 'counter', 'Pages whose previous extraction was reused (incremental mode).')
+            lines.append(f"{prefix}_reused_pages_total {self.reused_pages}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str, prefix: str = METRIC_PREFIX):
+        """textfile collectorが途中の内容を読まないよう、一時ファイル経由で置き換える"""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_suffix(target.suffix + f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(tmp_path, target)
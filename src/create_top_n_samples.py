@@ -1,118 +1,76 @@
 #!/usr/bin/env python3
 """
 Danbooru-tags-2024から上位N件のサンプルデータを作成するスクリプト
+top / random はアクティブデータ全体を読み込んでから抽出し、
+reservoir / weighted / stratified_rating / stratified_month はバッチを流しながら抽出する（streaming_samplers）
 """
 
 import polars as pl
 import logging
 from pathlib import Path
 import pickle
-from datasets import load_from_disk
 import gc
 import sys
 import argparse
+from typing import Iterator, List, Tuple
+
+from arrow_dataset import ACTIVE_FILTER, created_datetime_expr, open_arrow_dataset, scan_arrow_table, with_score_per_hour
+from streaming_samplers import reservoir_sample, stratified_sample, weighted_sample
 
 # ログ設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# サンプルに残す列
+COLUMNS_TO_KEEP = [
+    'id', 'created_at', 'score', 'rating',
+    'image_width', 'image_height', 'file_ext', 'tag_count',
+    'tag_count_general', 'tag_count_artist', 'tag_count_character',
+    'tag_count_copyright', 'tag_count_meta', 'fav_count',
+    'general', 'character', 'copyright', 'artist', 'meta'
+]
+
+# データ全体を読み込まずに抽出する方法
+STREAMING_METHODS = ['reservoir', 'weighted', 'stratified_rating', 'stratified_month']
 
 def filter_active_data(dataset_path: str) -> pl.DataFrame:
-    """アクティブデータをフィルタリング"""
+    """アクティブデータをフィルタリング（必要な列だけ、条件を満たす行だけを読む）"""
     logger.info("データセット読み込み中...")
-    dataset = load_from_disk(dataset_path)
-    train_dataset = dataset['train']
-    
-    # メモリ効率のため分割処理
-    # まず全体のアクティブデータ数を推定
-    logger.info("アクティブデータ数推定中...")
-    
-    # 最初のチャンクでフィルタリング率を推定
-    sample_size = min(100000, len(train_dataset))
-    sample_chunk = train_dataset.select(range(sample_size))
-    df_sample = pl.from_pandas(sample_chunk.to_pandas())
-    
-    df_filtered_sample = df_sample.filter(
-        (pl.col("is_deleted") == False) &
-        (pl.col("is_banned") == False) &
-        (pl.col("score") > 0)
+    table = open_arrow_dataset(dataset_path, "train")
+    
+    # 絞り込みと列の射影はスキャンへ押し下げられる
+    df_all = (
+        scan_arrow_table(table)
+        .filter(ACTIVE_FILTER)
+        .select(COLUMNS_TO_KEEP)
+        .collect()
     )
     
-    filter_rate = len(df_filtered_sample) / len(df_sample)
-    logger.info(f"フィルタリング率: {filter_rate:.2%} ({len(df_filtered_sample):,}/{len(df_sample):,})")
-    
-    # 必要なカラム
-    columns_to_keep = [
-        'id', 'created_at', 'score', 'rating',
-        'image_width', 'image_height', 'file_ext', 'tag_count',
-        'tag_count_general', 'tag_count_artist', 'tag_count_character',
-        'tag_count_copyright', 'tag_count_meta', 'fav_count',
-        'general', 'character', 'copyright', 'artist', 'meta',
-        'is_deleted', 'is_banned'
-    ]
-    
-    # 全データをチャンクで処理
-    total_size = len(train_dataset)
-    chunk_size = 200000
-    filtered_dfs = []
-    
-    logger.info(f"全データ処理開始: {total_size:,}件, チャンクサイズ: {chunk_size:,}件")
-    
-    for i in range(0, total_size, chunk_size):
-        end_idx = min(i + chunk_size, total_size)
-        logger.info(f"処理中: {i:,} - {end_idx:,} ({end_idx/total_size:.1%})")
-        
-        chunk = train_dataset.select(range(i, end_idx))
-        df_chunk = pl.from_pandas(chunk.to_pandas())
-        
-        # フィルタリング
-        df_filtered = df_chunk.filter(
-            (pl.col("is_deleted") == False) &
-            (pl.col("is_banned") == False) &
-            (pl.col("score") > 0)
-        )
-        
-        if len(df_filtered) > 0:
-            df_filtered = df_filtered.select(columns_to_keep)
-            filtered_dfs.append(df_filtered)
-        
-        # メモリクリーンアップ
-        del df_chunk, df_filtered, chunk
-        gc.collect()
-    
-    # 結合
-    logger.info("データ結合中...")
-    df_all = pl.concat(filtered_dfs)
-    
+    total_size = table.num_rows
+    filter_rate = len(df_all) / total_size if total_size else 0.0
+    logger.info(f"フィルタリング率: {filter_rate:.2%} ({len(df_all):,}/{total_size:,})")
     logger.info(f"アクティブデータ数: {len(df_all):,}件")
     
     return df_all
 
 
 def extract_top_by_score_per_hour(df: pl.DataFrame, top_n: int) -> pl.DataFrame:
-    """時間当たりスコア上位N件を抽出"""
+    """時間当たりスコア上位N件を降順で抽出（先頭n件がそのまま上位n件になる）"""
     logger.info(f"時間当たりスコア上位{top_n:,}件抽出中...")
     
     # 日時パース
-    df = df.with_columns([
-        pl.col("created_at").str.strptime(pl.Datetime, "%Y-%m-%dT%H:%M:%S%.f%z").alias("created_datetime")
-    ])
+    df = df.with_columns(created_datetime_expr())
     
     # 最古の日付
     min_date = df.select(pl.col("created_datetime").min()).item()
     logger.info(f"最古日付: {min_date}")
     
-    # 時間当たりスコア計算
-    df = df.with_columns([
-        ((pl.col("created_datetime") - pl.lit(min_date)).dt.total_hours() + 1).alias("hours_since_start")
-    ])
-    
-    df = df.with_columns([
-        (pl.col("score") / pl.col("hours_since_start")).alias("score_per_hour")
-    ])
-    
-    # 上位N件抽出
-    df_top = df.sort("score_per_hour", descending=True).head(top_n)
+    # 時間当たりスコア計算、上位N件抽出（全体のソートはしない）
+    df_top = (
+        with_score_per_hour(df, min_date)
+        .top_k(top_n, by="score_per_hour")
+        .sort("score_per_hour", descending=True)
+    )
     
     logger.info(f"上位{top_n:,}件抽出完了")
     
@@ -120,14 +78,14 @@ def extract_top_by_score_per_hour(df: pl.DataFrame, top_n: int) -> pl.DataFrame:
 
 
 def extract_random_sample(df: pl.DataFrame, sample_n: int) -> pl.DataFrame:
-    """ランダムN件を抽出"""
+    """ランダムN件をランダムな順序で抽出（先頭n件がそのまま一様なn件のサンプルになる）"""
     logger.info(f"ランダム{sample_n:,}件抽出中...")
     
     if len(df) <= sample_n:
         logger.info(f"データ数が要求数以下のため全件使用: {len(df):,}件")
-        return df
+        sample_n = len(df)
     
-    # ランダムサンプリング
+    # ランダムサンプリング（全件の場合も順序はシャッフルする）
     df_sample = df.sample(n=sample_n, seed=42, shuffle=True)
     
     logger.info(f"ランダム{sample_n:,}件抽出完了")
@@ -135,30 +93,23 @@ def extract_random_sample(df: pl.DataFrame, sample_n: int) -> pl.DataFrame:
     return df_sample
 
 
+def sample_type_name(method: str, n: int) -> str:
+    """ファイル名用のサンプル種別（100万 -> top1m, 50万 -> top500k, 10万 -> top100k）"""
+    if n >= 1000000:
+        return f"{method}{n//1000000}m"
+    return f"{method}{n//1000}k"
+
+
 def save_sample(df: pl.DataFrame, output_path: str, sample_type: str, n: int):
     """サンプルデータを保存"""
     # 不要なカラム削除
-    columns_to_save = [
-        'id', 'created_at', 'score', 'rating',
-        'image_width', 'image_height', 'file_ext', 'tag_count',
-        'tag_count_general', 'tag_count_artist', 'tag_count_character',
-        'tag_count_copyright', 'tag_count_meta', 'fav_count',
-        'general', 'character', 'copyright', 'artist', 'meta'
-    ]
+    df_to_save = df.select(COLUMNS_TO_KEEP)
     
-    df_to_save = df.select(columns_to_save)
-    
-    # 追加カラム（score_per_hourがある場合）
+    # 追加カラム（score_per_hourがある場合はサンプル内の最古日時を基準に計算し直す）
     if "score_per_hour" in df.columns:
-        df_to_save = df_to_save.with_columns([
-            pl.col("created_at").str.strptime(pl.Datetime, "%Y-%m-%dT%H:%M:%S%.f%z").alias("created_datetime")
-        ])
-        df_to_save = df_to_save.with_columns([
-            ((df_to_save["created_datetime"] - df_to_save["created_datetime"].min()).dt.total_hours() + 1).alias("hours_since_start")
-        ])
-        df_to_save = df_to_save.with_columns([
-            (pl.col("score") / pl.col("hours_since_start")).alias("score_per_hour")
-        ])
+        df_to_save = df_to_save.with_columns(df["created_datetime"])
+        min_date = df_to_save.select(pl.col("created_datetime").min()).item()
+        df_to_save = with_score_per_hour(df_to_save, min_date)
     
     # 保存
     with open(output_path, 'wb') as f:
@@ -169,12 +120,59 @@ def save_sample(df: pl.DataFrame, output_path: str, sample_type: str, n: int):
     logger.info(f"レコード数: {len(df_to_save):,}件")
 
 
+def streaming_samples(dataset_path: str, method: str, sample_sizes: List[int], seed: int = 42,
+                      allocation: str = 'proportional') -> Iterator[Tuple[int, pl.DataFrame]]:
+    """ストリーミングで (件数, サンプル) を大きい順に返す
+
+    reservoir / weighted は最大件数で1回だけ抽出し、小さい件数はその先頭（キー順なのでそのまま標本になる）。
+    層別は先頭を切ると層の比率が崩れるため、件数ごとに抽出する
+    """
+    table = open_arrow_dataset(dataset_path, "train")
+    sizes = sorted(set(sample_sizes), reverse=True)
+    
+    if method in ('reservoir', 'weighted'):
+        sampler = reservoir_sample if method == 'reservoir' else weighted_sample
+        df_largest = sampler(table, sizes[0], COLUMNS_TO_KEEP, seed=seed)
+        for n in sizes:
+            yield n, df_largest.head(n)
+    else:
+        by = method[len('stratified_'):]
+        for n in sizes:
+            yield n, stratified_sample(table, n, COLUMNS_TO_KEEP, by=by, allocation=allocation, seed=seed)
+
+
+def save_and_report(df_sample: pl.DataFrame, method: str, n: int):
+    """サンプルを保存して統計を表示"""
+    sample_type = sample_type_name(method, n)
+    
+    # 出力パス
+    output_dir = Path("data/1_intermediate")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"danbooru_tags_{sample_type}.pkl"
+    
+    # 保存
+    save_sample(df_sample, str(output_path), sample_type, n)
+    
+    # 統計表示
+    logger.info(f"=== {sample_type} 統計 ===")
+    logger.info(f"件数: {len(df_sample):,}")
+    if "score_per_hour" in df_sample.columns:
+        logger.info(f"score_per_hour 範囲: {df_sample.select('score_per_hour').min().item():.6f} - {df_sample.select('score_per_hour').max().item():.6f}")
+    logger.info(f"スコア範囲: {df_sample.select('score').min().item()} - {df_sample.select('score').max().item()}")
+    logger.info(f"rating分布: {df_sample.group_by('rating').agg(pl.len()).sort('rating', descending=True)}")
+
+
 def main():
     """メイン処理"""
     parser = argparse.ArgumentParser(description='Danbooruサンプルデータ作成')
     parser.add_argument('--input', type=str, default='data/0_raw/danbooru-tags-2024', help='入力データパス')
-    parser.add_argument('--method', type=str, choices=['top', 'random'], default='top', help='抽出方法: top(スコア上位), random(ランダム)')
+    parser.add_argument('--method', type=str, choices=['top', 'random'] + STREAMING_METHODS, default='top',
+                        help='抽出方法: top(スコア上位), random(ランダム), reservoir(一様), weighted(スコアで重み付け), '
+                             'stratified_rating / stratified_month(rating・作成月で層別)')
     parser.add_argument('--n', type=int, nargs='+', default=[1000000, 500000, 100000], help='抽出件数（複数指定可）')
+    parser.add_argument('--seed', type=int, default=42, help='乱数シード（ストリーミング抽出）')
+    parser.add_argument('--allocation', type=str, choices=['proportional', 'equal'], default='proportional',
+                        help='層別抽出の割り当て: proportional(層の大きさに比例), equal(均等)')
     
     args = parser.parse_args()
     
@@ -187,47 +185,36 @@ def main():
     logger.info(f"抽出方法: {method}")
     logger.info(f"抽出件数: {', '.join([f'{n:,}件' for n in sample_sizes])}")
     
+    if method in STREAMING_METHODS:
+        for n, df_sample in streaming_samples(input_path, method, sample_sizes, args.seed, args.allocation):
+            save_and_report(df_sample, method, n)
+        logger.info("=== 処理完了 ===")
+        return
+    
     # アクティブデータフィルタリング
     df_active = filter_active_data(input_path)
     
     if len(df_active) < max(sample_sizes):
         logger.warning(f"アクティブデータ数が最大要求数を下回っています: {len(df_active):,} < {max(sample_sizes):,}")
     
-    # 各サイズで抽出・保存
     for n in sample_sizes:
         if n > len(df_active):
             logger.warning(f"要求数{n:,}件がアクティブデータ数を超えているためスキップ")
-            continue
-        
-        if method == 'top':
-            df_sample = extract_top_by_score_per_hour(df_active, n)
-            # ファイル名生成（100万 -> top1m, 50万 -> top500k, 10万 -> top100k）
-            if n >= 1000000:
-                sample_type = f"top{n//1000000}m"
-            else:
-                sample_type = f"top{n//1000}k"
-        else:  # random
-            df_sample = extract_random_sample(df_active, n)
-            if n >= 1000000:
-                sample_type = f"random{n//1000000}m"
-            else:
-                sample_type = f"random{n//1000}k"
-        
-        # 出力パス
-        output_dir = Path("data/1_intermediate")
-        output_dir.mkdir(parents=True, exist_ok=True)
-        output_path = output_dir / f"danbooru_tags_{sample_type}.pkl"
-        
-        # 保存
-        save_sample(df_sample, str(output_path), sample_type, n)
-        
-        # 統計表示
-        logger.info(f"=== {sample_type} 統計 ===")
-        logger.info(f"件数: {len(df_sample):,}")
-        if "score_per_hour" in df_sample.columns:
-            logger.info(f"score_per_hour 範囲: {df_sample.select('score_per_hour').min().item():.6f} - {df_sample.select('score_per_hour').max().item():.6f}")
-        logger.info(f"スコア範囲: {df_sample.select('score').min().item()} - {df_sample.select('score').max().item()}")
-        logger.info(f"rating分布: {df_sample.group_by('rating').agg(pl.len()).sort('rating', descending=True)}")
+    valid_sizes = sorted({n for n in sample_sizes if n <= len(df_active)}, reverse=True)
+    if not valid_sizes:
+        logger.warning("抽出できるサイズがありません")
+        return
+    
+    # 最大の件数で1回だけ抽出し、各サイズはその先頭を切り出す
+    if method == 'top':
+        df_ranked = extract_top_by_score_per_hour(df_active, valid_sizes[0])
+    else:  # random
+        df_ranked = extract_random_sample(df_active, valid_sizes[0])
+    
+    # 各サイズで保存
+    for n in valid_sizes:
+        df_sample = df_ranked.head(n)
+        save_and_report(df_sample, method, n)
         
         # メモリクリーンアップ
         del df_sample
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+スクレイパー用HTTP取得バックエンド
+aiohttpによるkeep-aliveコネクションプール取得と、従来のcurl(subprocess)取得を切り替え可能にする
+"""
+
+import asyncio
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from hierarchy_snapshots import SnapshotEntry, SnapshotStore, read_snapshot_bytes
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+try:
+    import brotli  # aiohttpのbrデコード用  # noqa: F401
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Referer': 'https://danbooru.donmai.us/',
+}
+
+
+@dataclass
+class FetchResult:
+    """HTTP取得結果（バックエンド共通）"""
+    url: str
+    status: Optional[int] = None                 # HTTPステータス（取得できなかった場合はNone）
+    body: bytes = b''                            # デコード済み（gzip/br展開後）の本文
+    headers: Dict[str, str] = field(default_factory=dict)  # キーは小文字
+    error: Optional[str] = None                  # 'http', 'timeout', 'network', 'curl', 'curl_not_found', 'offline_miss'
+    message: str = ''
+    elapsed: float = 0.0
+    from_cache: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status is not None and 200 <= self.status < 300
+
+    def text(self) -> str:
+        return self.body.decode('utf-8', errors='replace')
+
+
+class BaseFetcher:
+    """取得バックエンドの基底クラス（同期fetchと非同期fetch_asyncの両方を提供）"""
+    name = 'base'
+
+    def __init__(self, timeout: float = 30.0, headers: Dict[str, str] = None):
+        self.timeout = timeout
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def run(self, coro):
+        """バックエンド専用イベントループ上でコルーチンを実行"""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+
+    def fetch(self, url: str, headers: Dict[str, str] = None) -> FetchResult:
+        return self.run(self.fetch_async(url, headers))
+
+    async def fetch_async(self, url: str, headers: Dict[str, str] = None) -> FetchResult:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+    def close(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.run_until_complete(self.aclose())
+            self._loop.close()
+        self._loop = None
+
+
+class AiohttpFetcher(BaseFetcher):
+    """aiohttpによるkeep-aliveコネクションプール型バックエンド（本文はメモリ上で処理）"""
+    name = 'aiohttp'
+
+    def __init__(self, timeout: float = 30.0, headers: Dict[str, str] = None, max_connections: int = 8):
+        if not HAS_AIOHTTP:
+            raise RuntimeError("aiohttpがインストールされていません")
+        super().__init__(timeout, headers)
+        self.headers['Accept-Encoding'] = 'gzip, deflate, br' if HAS_BROTLI else 'gzip, deflate'
+        self.max_connections = max_connections
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections,
+                ttl_dns_cache=300,
+                keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                auto_decompress=True
+            )
+        return self._session
+
+    async def fetch_async(self, url: str, headers: Dict[str, str] = None) -> FetchResult:
+        start = time.monotonic()
+        session = await self._get_session()
+        try:
+            async with session.get(url, headers=headers, allow_redirects=True) as response:
+                body = await response.read()
+                result = FetchResult(
+                    url=url,
+                    status=response.status,
+                    body=body,
+                    headers={k.lower(): v for k, v in response.headers.items()}
+                )
+                if response.status >= 400:
+                    result.error = 'http'
+                    result.message = f"HTTP {response.status} {response.reason or ''}".strip()
+        except asyncio.TimeoutError:
+            result = FetchResult(url=url, error='timeout', message=f"{self.timeout}秒でタイムアウト")
+        except aiohttp.ClientError as e:
+            result = FetchResult(url=url, error='network', message=str(e))
+        result.elapsed = time.monotonic() - start
+        return result
+
+    async def aclose(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class CurlFetcher(BaseFetcher):
+    """従来のcurl(subprocess)バックエンド（aiohttpが使えない環境用フォールバック）"""
+    name = 'curl'
+
+    def fetch(self, url: str, headers: Dict[str, str] = None) -> FetchResult:
+        start = time.monotonic()
+        request_headers = {**self.headers, **(headers or {})}
+
+        # 一時ファイルを作成（本文とレスポンスヘッダ）
+        with tempfile.NamedTemporaryFile(mode='w+', suffix='.html', delete=False) as temp_file:
+            temp_filename = temp_file.name
+        with tempfile.NamedTemporaryFile(mode='w+', suffix='.headers', delete=False) as header_file:
+            header_filename = header_file.name
+
+        curl_command = [
+            'curl',
+            '--compressed',
+            '--silent',
+            '--show-error',
+            '--fail',
+            '--location',
+            '--max-time', str(int(self.timeout)),
+            '--write-out', '%{http_code}',
+            '--dump-header', header_filename,
+        ]
+        for key, value in request_headers.items():
+            curl_command.extend(['-H', f"{key}: {value}"])
+        curl_command.extend(['-o', temp_filename, url])
+
+        try:
+            completed = subprocess.run(curl_command, capture_output=True, text=True, timeout=self.timeout + 5)
+            result = FetchResult(url=url, headers=self._read_headers(header_filename))
+
+            status_text = completed.stdout.strip()[-3:]
+            if status_text.isdigit() and status_text != '000':
+                result.status = int(status_text)
+
+            if completed.returncode == 0:
+                with open(temp_filename, 'rb') as f:
+                    result.body = f.read()
+            else:
+                error_msg = completed.stderr.strip() if completed.stderr else "Unknown error"
+                result.message = error_msg
+                if completed.returncode == 22:  # HTTP error
+                    result.error = 'http'
+                    if result.status is None:
+                        match = re.search(r'error:\s*(\d{3})', error_msg)
+                        if match:
+                            result.status = int(match.group(1))
+                elif completed.returncode == 28:  # Timeout
+                    result.error = 'timeout'
+                else:
+                    result.error = 'curl'
+                    result.message = f"code {completed.returncode}: {error_msg}"
+        except subprocess.TimeoutExpired:
+            result = FetchResult(url=url, error='timeout', message="curlプロセスタイムアウト")
+        except FileNotFoundError:
+            result = FetchResult(url=url, error='curl_not_found', message="curlコマンドが見つかりません")
+        finally:
+            for filename in (temp_filename, header_filename):
+                if os.path.exists(filename):
+                    os.unlink(filename)
+
+        result.elapsed = time.monotonic() - start
+        return result
+
+    async def fetch_async(self, url: str, headers: Dict[str, str] = None) -> FetchResult:
+        return await asyncio.to_thread(self.fetch, url, headers)
+
+    def _read_headers(self, header_filename: str) -> Dict[str, str]:
+        """--dump-headerの出力から最終レスポンス（リダイレクト後）のヘッダを取得"""
+        if not os.path.exists(header_filename):
+            return {}
+        with open(header_filename, 'r', encoding='latin-1') as f:
+            blocks = [b for b in re.split(r'\r?\n\r?\n', f.read()) if b.strip()]
+        if not blocks:
+            return {}
+        headers = {}
+        for line in blocks[-1].splitlines()[1:]:
+            if ':' in line:
+                key, value = line.split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+        return headers
+
+
+class ReplayFetcher(BaseFetcher):
+    """記録済みコーパス（スナップショット形式: manifest.jsonl + pages/）からページを返すバックエンド
+
+    ネットワークを使わずにクロール全体を再現する（ベンチマーク・回帰確認用）。
+    ETagには本文のsha256を使い、条件付きリクエストには304を返す。latencyを指定すると
+    1リクエストごとにその秒数だけ待ち、ネットワーク越しの取得を模擬する
+    """
+    name = 'replay'
+
+    def __init__(self, corpus_dir: str, key_func: Callable[[str], str] = None, latency: float = 0.0,
+                 timeout: float = 30.0, headers: Dict[str, str] = None):
+        super().__init__(timeout, headers)
+        self.store = SnapshotStore(corpus_dir)
+        self.key_func = key_func
+        self.latency = latency
+        manifest = self.store.load_manifest()
+        if not manifest:
+            raise ValueError(f"リプレイ用コーパスが空です: {self.store.manifest_path}")
+        self.entries: Dict[str, SnapshotEntry] = {}  # 正規化URL / 記録時のURL → エントリ
+        for entry in manifest:
+            self.entries[entry.key] = entry
+            self.entries.setdefault(entry.url, entry)
+        logger.info(f"リプレイコーパス: {corpus_dir} ({len(manifest)}ページ)")
+
+    def _lookup(self, url: str) -> Optional[SnapshotEntry]:
+        entry = self.entries.get(url)
+        if entry is None and self.key_func is not None:
+            entry = self.entries.get(self.key_func(url))
+        return entry
+
+    def _replay(self, url: str, headers: Dict[str, str] = None) -> FetchResult:
+        entry = self._lookup(url)
+        if entry is None:
+            return FetchResult(url=url, status=404, error='http', message="HTTP 404 リプレイコーパスに存在しません")
+        etag = f'"{entry.sha256}"'
+        response_headers = {'etag': etag, 'content-type': 'text/html; charset=utf-8'}
+        if headers and headers.get('If-None-Match') == etag:
+            return FetchResult(url=url, status=304, headers=response_headers)
+        body = read_snapshot_bytes(str(self.store.root / entry.file), entry.codec)
+        return FetchResult(url=url, status=200, body=body, headers=response_headers)
+
+    def fetch(self, url: str, headers: Dict[str, str] = None) -> FetchResult:
+        start = time.monotonic()
+        if self.latency > 0:
+            time.sleep(self.latency)
+        result = self._replay(url, headers)
+        result.elapsed = time.monotonic() - start
+        return result
+
+    async def fetch_async(self, url: str, headers: Dict[str, str] = None) -> FetchResult:
+        start = time.monotonic()
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        result = await asyncio.to_thread(self._replay, url, headers)
+        result.elapsed = time.monotonic() - start
+        return result
+
+
+FETCH_BACKENDS = ['auto', 'aiohttp', 'curl', 'replay']
+
+
+def create_fetcher(backend: str = 'auto', timeout: float = 30.0, max_connections: int = 8,
+                   replay_dir: str = None, key_func: Callable[[str], str] = None,
+                   replay_latency: float = 0.0) -> BaseFetcher:
+    """設定名から取得バックエンドを生成（autoはaiohttpが使えればaiohttp、なければcurl）"""
+    if backend not in FETCH_BACKENDS:
+        raise ValueError(f"未対応の取得バックエンド: {backend} (選択肢: {FETCH_BACKENDS})")
+
+    if backend == 'replay':
+        if not replay_dir:
+            raise ValueError("replayバックエンドにはコーパスのディレクトリ指定が必要です")
+        return ReplayFetcher(replay_dir, key_func=key_func, latency=replay_latency, timeout=timeout)
+
+    if backend == 'aiohttp' or (backend == 'auto' and HAS_AIOHTTP):
+        return AiohttpFetcher(timeout=timeout, max_connections=max_connections)
+
+    if backend == 'auto':
+        logger.warning("aiohttpが見つからないためcurlバックエンドを使用します")
+    return CurlFetcher(timeout=timeout)
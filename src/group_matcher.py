@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+グループ選択（除外セクション・target_groups・名前パターン）の判定器
+設定を1回だけ正規表現にコンパイルし、判定結果はパス（の接頭辞）/名前ごとにキャッシュする
+"""
+
+import fnmatch
+import re
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+PATH_SEPARATOR = ' -> '
+_UNSEEN = object()
+
+
+def literal_alternation(words: Iterable[str]) -> Optional[re.Pattern]:
+    """文字列リテラルの集合を、共通接頭辞でまとめた1つの正規表現にする（空ならNone）
+
+    "tag group" と "tag list" は tag (?:group|list) のような木構造になるため、
+    候補が数百あっても1位置あたりの試行は最長語の長さ程度で済む
+    """
+    trie: Dict = {}
+    for word in set(words):
+        if not word:
+            continue
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}  # 語の終端
+
+    if not trie:
+        return None
+
+    def build(node: Dict) -> str:
+        alternatives = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        optional = '' in node
+        if not alternatives:
+            return ''
+        if len(alternatives) == 1 and not optional:
+            return alternatives[0]
+        group = '(?:' + '|'.join(alternatives) + ')'
+        return group + '?' if optional else group
+
+    return re.compile(build(trie))
+
+
+class GroupMatcher:
+    """ScrapingConfigのexclude_sections / target_groups / group_name_patternsをコンパイルした判定器"""
+
+    def __init__(self, exclude_sections: Sequence[str] = (), target_groups: Optional[Sequence[str]] = None,
+                 group_name_patterns: Optional[Sequence[str]] = None):
+        # 除外: 小文字化したセグメントにいずれかの除外語が含まれていれば除外
+        self._exclude_re = literal_alternation(s.lower() for s in exclude_sections or ())
+        # target_groups: 名前の完全一致、またはパス文字列（小文字）に部分一致
+        self.has_targets = target_groups is not None
+        self._target_names = frozenset(target_groups or ())
+        self._target_re = literal_alternation(t.lower() for t in target_groups or ())
+        # 名前パターン: fnmatchのパターンを1つの正規表現に連結
+        self.has_patterns = group_name_patterns is not None
+        self._pattern_re = re.compile('|'.join(
+            f'(?:{fnmatch.translate(pattern.lower())})' for pattern in group_name_patterns
+        )) if group_name_patterns else None
+
+        self._excluded_segments: Dict[str, bool] = {}
+        self._excluded_paths: Dict[Tuple[str, ...], Optional[str]] = {(): None}
+        self._target_paths: Dict[Tuple[str, ...], bool] = {}
+        self._pattern_names: Dict[str, bool] = {}
+
+    def is_excluded(self, section_name: str) -> bool:
+        """セクション名（パスの1セグメント）が除外対象か"""
+        cached = self._excluded_segments.get(section_name)
+        if cached is None:
+            cached = self._exclude_re is not None and self._exclude_re.search(section_name.lower().strip()) is not None
+            self._excluded_segments[section_name] = cached
+        return cached
+
+    def excluded_segment(self, path: Sequence[str]) -> Optional[str]:
+        """パス中で最初に除外対象となるセグメント（なければNone）
+
+        結果はパスの接頭辞ごとに覚えるので、同じ親を持つアイテムは親までの判定を再利用する
+        """
+        key = tuple(path)
+        result = self._excluded_paths.get(key, _UNSEEN)
+        if result is _UNSEEN:
+            # 空のパスは初期化時に登録済みなので、再帰は未判定の接頭辞で止まる
+            result = self.excluded_segment(key[:-1])
+            if result is None and self.is_excluded(key[-1]):
+                result = key[-1]
+            self._excluded_paths[key] = result
+        return result
+
+    def is_target_name(self, group_name: str) -> bool:
+        """target_groupsに名前が完全一致するか"""
+        return group_name in self._target_names
+
+    def matches_target_path(self, path: Optional[Sequence[str]]) -> bool:
+        """パス文字列（小文字）にtarget_groupsのいずれかが含まれるか"""
+        if path is None or self._target_re is None:
+            return False
+        key = tuple(path)
+        cached = self._target_paths.get(key)
+        if cached is None:
+            cached = self._target_re.search(PATH_SEPARATOR.join(key).lower()) is not None
+            self._target_paths[key] = cached
+        return cached
+
+    def matches_pattern(self, group_name: str) -> bool:
+        """group_name_patternsのいずれかに一致するか（大文字小文字は区別しない）"""
+        if self._pattern_re is None:
+            return False
+        cached = self._pattern_names.get(group_name)
+        if cached is None:
+            cached = self._pattern_re.match(group_name.lower()) is not None
+            self._pattern_names[group_name] = cached
+        return cached
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+tag groupページの生HTMLスナップショット保存
+取得段階でページをzstd圧縮保存し、パース段階でネットワークなしに階層を再構築できるようにする
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SnapshotEntry:
+    """manifest.jsonlの1行（ページ1件分）"""
+    key: str                             # 正規化URL
+    url: str
+    file: str                            # pages/以下の相対パス
+    codec: str                           # 'zstd' / 'gzip'
+    depth: int                           # 追跡深度（メインページは0）
+    name: Optional[str] = None           # 取得元アイテム名（メインページはNone）
+    path: Optional[List[str]] = None     # 取得時点のアイテムパス
+    size: int = 0                        # 非圧縮サイズ
+    sha256: str = ''
+    fetched_at: float = 0.0
+
+
+class SnapshotStore:
+    """<root>/pages/<URLハッシュ>.html.zst と <root>/manifest.jsonl からなるスナップショット保存先"""
+
+    def __init__(self, root: str = "tmp/snapshots", level: int = 10):
+        self.root = Path(root)
+        self.pages_dir = self.root / "pages"
+        self.manifest_path = self.root / "manifest.jsonl"
+        self.level = level
+        self.codec = 'zstd' if HAS_ZSTD else 'gzip'
+        if not HAS_ZSTD:
+            logger.warning("zstandardが見つからないためスナップショットはgzipで保存します")
+
+    def save(self, key: str, url: str, body: bytes, depth: int, item: Optional[Dict] = None) -> SnapshotEntry:
+        """ページ本文を圧縮保存し、manifestに追記"""
+        self.pages_dir.mkdir(parents=True, exist_ok=True)
+        url_hash = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        if self.codec == 'zstd':
+            file_name = f"{url_hash}.html.zst"
+            data = zstandard.ZstdCompressor(level=self.level).compress(body)
+        else:
+            file_name = f"{url_hash}.html.gz"
+            data = gzip.compress(body)
+
+        file_path = self.pages_dir / file_name
+        tmp_path = file_path.with_suffix(file_path.suffix + f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+
+        entry = SnapshotEntry(
+            key=key,
+            url=url,
+            file=f"pages/{file_name}",
+            codec=self.codec,
+            depth=depth,
+            name=item['name'] if item else None,
+            path=item['path'] if item else None,
+            size=len(body),
+            sha256=hashlib.sha256(body).hexdigest(),
+            fetched_at=time.time()
+        )
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(asdict(entry), ensure_ascii=False) + '\n')
+        return entry
+
+    def load_manifest(self) -> List[SnapshotEntry]:
+        """manifestを読み込む（同じURLは最後の記録を採用、初出順を維持）"""
+        if not self.manifest_path.exists():
+            return []
+        entries: Dict[str, SnapshotEntry] = {}
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = SnapshotEntry(**json.loads(line))
+                except (ValueError, TypeError):
+                    logger.warning(f"manifestの不完全な行を無視: {line[:80]!r}")
+                    continue
+                entries[entry.key] = entry
+        return list(entries.values())
+
+    def read(self, entry: SnapshotEntry) -> str:
+        return read_snapshot(str(self.root / entry.file), entry.codec)
+
+
+def read_snapshot(file_path: str, codec: str) -> str:
+    """スナップショットを展開してHTML文字列を返す（プロセスプールのワーカーからも使用）"""
+    return read_snapshot_bytes(file_path, codec).decode('utf-8', errors='replace')
+
+
+def read_snapshot_bytes(file_path: str, codec: str) -> bytes:
+    """スナップショットを展開して本文のバイト列を返す（リプレイ取得用）"""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
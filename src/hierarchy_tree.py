@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+階層パスのインターン表（親ポインタ木）
+アイテムごとのpathリストの代わりに、ノードごとに整数ID・親ID・深さを列（array）で持ち、
+パスは必要な時に親を辿って復元する
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+ROOT = -1  # 最上位ノードの親ID
+
+
+class NodeTable:
+    """ノードID = 行番号。親は必ず子より小さいIDを持つ（インターン順に採番するため）"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.parents = array('i')
+        self.depths = array('i')                     # 最上位ノードは1（item['depth'] = len(path)と一致）
+        self._index: Dict[Tuple[int, str], int] = {}  # (親ID, 名前) → ノードID
+        self._child_offsets: Optional[array] = None  # 子ノードのCSR（初回の子/子孫クエリ時に構築）
+        self._child_ids: Optional[array] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[Sequence[str]]) -> 'NodeTable':
+        table = cls()
+        for path in paths:
+            table.intern(path)
+        return table
+
+    @classmethod
+    def from_columns(cls, names: Sequence[str], parents: Sequence[Optional[int]]) -> 'NodeTable':
+        """保存済みの列（name, parent）から復元（parentがNoneなら最上位）"""
+        table = cls()
+        for node, (name, parent) in enumerate(zip(names, parents)):
+            parent = ROOT if parent is None else parent
+            table.names.append(name)
+            table.parents.append(parent)
+            table.depths.append(1 if parent == ROOT else table.depths[parent] + 1)
+            table._index[(parent, name)] = node
+        return table
+
+    def _add(self, parent: int, name: str) -> int:
+        node = len(self.names)
+        self.names.append(name)
+        self.parents.append(parent)
+        self.depths.append(1 if parent == ROOT else self.depths[parent] + 1)
+        self._index[(parent, name)] = node
+        self._child_offsets = self._child_ids = None
+        return node
+
+    def intern(self, path: Sequence[str]) -> int:
+        """パスの各接頭辞をノードとして登録し、末端のノードIDを返す"""
+        node = ROOT
+        for name in path:
+            child = self._index.get((node, name))
+            node = self._add(node, name) if child is None else child
+        return node
+
+    def find(self, path: Sequence[str]) -> Optional[int]:
+        node = ROOT
+        for name in path:
+            node = self._index.get((node, name))
+            if node is None:
+                return None
+        return None if node == ROOT else node
+
+    def path(self, node: int) -> List[str]:
+        """親を辿ってパスを復元"""
+        names = []
+        while node != ROOT:
+            names.append(self.names[node])
+            node = self.parents[node]
+        names.reverse()
+        return names
+
+    def parent_name(self, node: int) -> Optional[str]:
+        parent = self.parents[node]
+        return None if parent == ROOT else self.names[parent]
+
+    def path_strings(self, separator: str = " → ") -> List[str]:
+        """全ノードのパス文字列（親の文字列を再利用し、ID順に1回ずつ連結）"""
+        strings: List[str] = []
+        for name, parent in zip(self.names, self.parents):
+            strings.append(name if parent == ROOT else strings[parent] + separator + name)
+        return strings
+
+    def ancestors(self, node: int) -> List[int]:
+        """祖先ノードID（近い順）"""
+        result = []
+        node = self.parents[node]
+        while node != ROOT:
+            result.append(node)
+            node = self.parents[node]
+        return result
+
+    def is_ancestor(self, ancestor: int, node: int) -> bool:
+        # 祖先の方が浅いので、深さの差だけ親を辿れば判定できる
+        steps = self.depths[node] - self.depths[ancestor]
+        if steps <= 0:
+            return False
+        for _ in range(steps):
+            node = self.parents[node]
+        return node == ancestor
+
+    def _build_children(self):
+        """親IDごとに子IDを並べたCSR（offsets[親+1]..offsets[親+2]、最上位はスロット0）"""
+        counts = array('i', bytes(4 * (len(self) + 2)))
+        for parent in self.parents:
+            counts[parent + 2] += 1
+        for slot in range(1, len(counts)):
+            counts[slot] += counts[slot - 1]
+        child_ids = array('i', bytes(4 * len(self)))
+        cursor = array('i', counts)
+        for node, parent in enumerate(self.parents):
+            child_ids[cursor[parent + 1]] = node
+            cursor[parent + 1] += 1
+        self._child_offsets = counts
+        self._child_ids = child_ids
+
+    def children(self, node: int = ROOT) -> List[int]:
+        if self._child_offsets is None:
+            self._build_children()
+        return self._child_ids[self._child_offsets[node + 1]:self._child_offsets[node + 2]].tolist()
+
+    def descendants(self, node: int) -> List[int]:
+        """子孫ノードID（自身は含まない）"""
+        if self._child_offsets is None:
+            self._build_children()
+        offsets, child_ids = self._child_offsets, self._child_ids
+        result = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            children = child_ids[offsets[current + 1]:offsets[current + 2]]
+            result.extend(children)
+            stack.extend(reversed(children))
+        return result
+
+    def columns(self) -> Dict[str, list]:
+        """保存用の列（parentは最上位ならNone）"""
+        return {
+            'id': list(range(len(self))),
+            'name': self.names,
+            'parent': [None if parent == ROOT else parent for parent in self.parents],
+            'depth': self.depths.tolist(),
+        }
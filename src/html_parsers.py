@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+tag groupページ用HTMLパーサーバックエンド
+ページ全体ではなくwiki本文（div#wiki-page-body）のみをBeautifulSoup化する
+"""
+
+import logging
+from typing import Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser  # selectolax<0.3系（Modestバックエンド）
+        HAS_SELECTOLAX = True
+    except ImportError:
+        HAS_SELECTOLAX = False
+
+logger = logging.getLogger(__name__)
+
+WIKI_BODY_ID = 'wiki-page-body'
+PARSER_BACKENDS = ['auto', 'html.parser', 'lxml', 'selectolax']
+
+
+def resolve_parser_backend(backend: str = 'auto') -> str:
+    """autoをインストール済みの最速バックエンドに解決（selectolax > lxml > html.parser）"""
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"未対応のパーサーバックエンド: {backend} (選択肢: {PARSER_BACKENDS})")
+    if backend == 'auto':
+        if HAS_SELECTOLAX:
+            return 'selectolax'
+        return 'lxml' if HAS_LXML else 'html.parser'
+    if backend == 'selectolax' and not HAS_SELECTOLAX:
+        raise RuntimeError("selectolaxがインストールされていません")
+    if backend == 'lxml' and not HAS_LXML:
+        raise RuntimeError("lxmlがインストールされていません")
+    return backend
+
+
+def parse_wiki_page(html: str, backend: str = 'html.parser') -> Tuple[BeautifulSoup, bool]:
+    """wiki本文のみをパースし、(soup, 本文のみか) を返す
+
+    wiki本文が見つからないページはページ全体をパースする（従来のノイズ除去が適用される）
+    """
+    if backend == 'selectolax':
+        # CSSセレクタで本文ノードを直接取り出し、小さな断片だけをBeautifulSoup化
+        node = HTMLParser(html).css_first(f'#{WIKI_BODY_ID}')
+        fragment_builder = 'lxml' if HAS_LXML else 'html.parser'
+        if node is not None:
+            return BeautifulSoup(node.html, fragment_builder), True
+        return BeautifulSoup(html, fragment_builder), False
+
+    # SoupStrainerでツリー構築を本文サブツリーに限定
+    soup = BeautifulSoup(html, backend, parse_only=SoupStrainer(id=WIKI_BODY_ID))
+    if soup.find(id=WIKI_BODY_ID) is not None:
+        return soup, True
+    return BeautifulSoup(html, backend), False
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+スクレイパー用の永続HTTPレスポンスキャッシュ
+正規化URLをキーにETag/Last-Modifiedを保持し、本文は内容ハッシュ単位でgzip圧縮保存する
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, Optional
+
+from fetch_backends import FetchResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """URL単位のキャッシュメタデータ"""
+    url: str
+    body_hash: str                       # 本文のsha256（bodies/以下のファイル名）
+    fetched_at: float                    # 最終取得/再検証時刻（UNIX時間）
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    size: int = 0
+
+
+class ResponseCache:
+    """index/<URLハッシュ>.json と bodies/<xx>/<本文ハッシュ>.gz からなるディスクキャッシュ"""
+
+    def __init__(self, cache_dir: str = "tmp/http_cache", ttl: Optional[float] = 86400.0):
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl                   # 秒。この期間内は再検証せずに使用（Noneなら常に新鮮扱い）
+        self.index_dir = self.cache_dir / "index"
+        self.body_dir = self.cache_dir / "bodies"
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.body_dir.mkdir(parents=True, exist_ok=True)
+
+    def _index_path(self, key: str) -> Path:
+        return self.index_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def _body_path(self, body_hash: str) -> Path:
+        return self.body_dir / body_hash[:2] / f"{body_hash}.gz"
+
+    def _write_atomic(self, path: Path, data: bytes):
+        tmp_path = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        """キャッシュエントリを取得（本文が欠けている場合はNone）"""
+        index_path = self._index_path(key)
+        if not index_path.exists():
+            return None
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                entry = CacheEntry(**json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"  キャッシュメタデータ破損のため無視: {index_path} ({e})")
+            return None
+        if not self._body_path(entry.body_hash).exists():
+            return None
+        return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return self.ttl is None or time.time() - entry.fetched_at < self.ttl
+
+    def conditional_headers(self, entry: CacheEntry) -> Dict[str, str]:
+        """再検証用の条件付きリクエストヘッダ"""
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def load(self, entry: CacheEntry) -> FetchResult:
+        """キャッシュ済み本文をFetchResultとして復元"""
+        with open(self._body_path(entry.body_hash), 'rb') as f:
+            body = gzip.decompress(f.read())
+        headers = {}
+        if entry.etag:
+            headers['etag'] = entry.etag
+        if entry.last_modified:
+            headers['last-modified'] = entry.last_modified
+        return FetchResult(url=entry.url, status=200, body=body, headers=headers, from_cache=True)
+
+    def store(self, key: str, response: FetchResult) -> CacheEntry:
+        """成功レスポンスを保存（同一内容の本文は共有される）"""
+        body_hash = hashlib.sha256(response.body).hexdigest()
+        body_path = self._body_path(body_hash)
+        if not body_path.exists():
+            body_path.parent.mkdir(exist_ok=True)
+            self._write_atomic(body_path, gzip.compress(response.body, compresslevel=6))
+
+        entry = CacheEntry(
+            url=response.url,
+            body_hash=body_hash,
+            fetched_at=time.time(),
+            etag=response.headers.get('etag'),
+            last_modified=response.headers.get('last-modified'),
+            size=len(response.body)
+        )
+        self._write_entry(key, entry)
+        return entry
+
+    def refresh(self, key: str, entry: CacheEntry, response: FetchResult) -> CacheEntry:
+        """304 Not Modified受信時に取得時刻と検証子を更新"""
+        entry.fetched_at = time.time()
+        entry.etag = response.headers.get('etag', entry.etag)
+        entry.last_modified = response.headers.get('last-modified', entry.last_modified)
+        self._write_entry(key, entry)
+        return entry
+
+    def _write_entry(self, key: str, entry: CacheEntry):
+        data = json.dumps(asdict(entry), ensure_ascii=False).encode('utf-8')
+        self._write_atomic(self._index_path(key), data)
@@ -1,135 +1,183 @@
 #!/usr/bin/env python3
 """
-Danbooru-tags-2024をメモリ効率的な分割実行でpickle化
+Danbooru-tags-2024をメモリ効率的な分割実行で中間チャンク化
+データセットは1回だけメモリマップで開き、チャンクはArrowのスライスから直接polarsに変換する
+チャンクは作成月でパーティションしたParquetストア（chunk_store）に書き、処理状態はmanifest.jsonに残す
 """
 
 import polars as pl
+import pyarrow as pa
 import logging
 from pathlib import Path
 import pickle
-from datasets import load_from_disk
-import gc
+import argparse
+import multiprocessing
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+from arrow_dataset import (ACTIVE_FILTER, DATASET_PATH, created_datetime_expr, iter_slices, open_arrow_dataset,
+                           scan_arrow_table, with_score_per_hour)
+from chunk_store import (CHUNK_STORE_DIR, ChunkManifest, ChunkRecord, chunk_checksum, chunk_files,
+                         clear_store, column_range, write_chunk)
 
 # ログ設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# チャンクに残す列
+COLUMNS_TO_KEEP = [
+    'id', 'created_at', 'score', 'rating', 
+    'image_width', 'image_height', 'file_ext', 'tag_count',
+    'tag_count_general', 'tag_count_artist', 'tag_count_character', 
+    'tag_count_copyright', 'tag_count_meta', 'fav_count',
+    'general', 'character', 'copyright', 'artist', 'meta'
+]
+# ストアの列（created_atはチャンク作成時に1回だけDatetimeへ変換しておく）
+STORE_COLUMNS = COLUMNS_TO_KEEP + ['created_datetime']
+
+def process_chunk(table: pa.Table, chunk_id: int, start_idx: int, end_idx: int,
+                  store_dir: str = CHUNK_STORE_DIR) -> ChunkRecord:
+    """行範囲 [start_idx, end_idx) を絞り込んでストアに書き、manifestのレコードを返す"""
+    logger.info(f"=== チャンク {chunk_id}: {start_idx:,} - {end_idx:,} ===")
+    started = time.perf_counter()
+    
+    # チャンクを抽出（メモリマップ上のスライス、アクティブな行の必要な列だけpolarsへ）
+    chunk = table.slice(start_idx, end_idx - start_idx)
+    df_final = (
+        scan_arrow_table(chunk)
+        .filter(ACTIVE_FILTER)
+        .select(COLUMNS_TO_KEEP)
+        .with_columns(created_datetime_expr())
+        .collect()
+    )
+    
+    # チャンクを作成月ごとに保存（再処理時は同じチャンクの古いファイルを置き換える）
+    month_counts = write_chunk(df_final, chunk_id, store_dir)
+    
+    return ChunkRecord(
+        chunk_id=chunk_id,
+        start=start_idx,
+        end=end_idx,
+        status='done',
+        input_rows=chunk.num_rows,
+        active_rows=len(df_final),
+        months=month_counts,
+        checksum=chunk_checksum(chunk_id, store_dir),
+        seconds=time.perf_counter() - started,
+        finished_at=time.time()
+    )
+
+
+def run_chunk(table: pa.Table, chunk_id: int, start_idx: int, end_idx: int,
+              store_dir: str = CHUNK_STORE_DIR) -> ChunkRecord:
+    """process_chunk()の例外をfailedレコードにする"""
+    try:
+        return process_chunk(table, chunk_id, start_idx, end_idx, store_dir)
+    except Exception as e:
+        return ChunkRecord(chunk_id=chunk_id, start=start_idx, end=end_idx, status='failed',
+                           error=f"{type(e).__name__}: {e}", finished_at=time.time())
+
+
+_worker_tables: Dict[str, pa.Table] = {}
+
+
+def _chunk_worker(input_path: str, chunk_id: int, start_idx: int, end_idx: int, store_dir: str) -> ChunkRecord:
+    """プロセスプール用（データセットはワーカーごとに1回だけメモリマップで開く）"""
+    try:
+        table = _worker_tables.get(input_path)
+        if table is None:
+            table = _worker_tables[input_path] = open_arrow_dataset(input_path, "train")
+    except Exception as e:
+        return ChunkRecord(chunk_id=chunk_id, start=start_idx, end=end_idx, status='failed',
+                           error=f"{type(e).__name__}: {e}", finished_at=time.time())
+    return run_chunk(table, chunk_id, start_idx, end_idx, store_dir)
+
+
 class IncrementalPickler:
-    def __init__(self, input_path="data/0_raw/danbooru-tags-2024", chunk_size=50000):
+    def __init__(self, input_path=DATASET_PATH, chunk_size=50000, combine_batch_size=64):
         self.input_path = input_path
         self.chunk_size = chunk_size
-        self.state_file = "data/pickle_state.txt"
-        self.temp_dir = Path("data/temp_chunks")
-        self.temp_dir.mkdir(exist_ok=True)
-        
-    def save_state(self, processed_chunks: int, total_active: int):
-        """処理状態を保存"""
-        with open(self.state_file, 'w') as f:
-            f.write(f"{processed_chunks},{total_active}")
-    
-    def load_state(self):
-        """処理状態を読み込み"""
-        if Path(self.state_file).exists():
-            with open(self.state_file, 'r') as f:
-                processed_chunks, total_active = map(int, f.read().strip().split(','))
-                return processed_chunks, total_active
-        return 0, 0
+        self.combine_batch_size = combine_batch_size  # 結合時に同時に読むファイル数
+        self.store_dir = Path(CHUNK_STORE_DIR)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._table = None
     
-    def process_single_chunk(self, chunk_id: int, start_idx: int, end_idx: int):
-        """単一チャンクを処理"""
-        logger.info(f"=== チャンク {chunk_id}: {start_idx:,} - {end_idx:,} ===")
-        
-        # データセット読み込み
-        dataset = load_from_disk(self.input_path)
-        train_dataset = dataset['train']
-        
-        # チャンクを抽出
-        chunk = train_dataset.select(range(start_idx, end_idx))
-        df_chunk = pl.from_pandas(chunk.to_pandas())
-        
-        logger.info(f"チャンク読み込み完了: {len(df_chunk):,}件")
-        
-        # フィルタリング
-        df_filtered = df_chunk.filter(
-            (pl.col("is_deleted") == False) & 
-            (pl.col("is_banned") == False) &
-            (pl.col("score") > 0)
-        )
-        
-        active_count = len(df_filtered)
-        logger.info(f"アクティブデータ: {active_count:,}件")
-        
-        if active_count > 0:
-            # 必要なカラムのみ選択
-            columns_to_keep = [
-                'id', 'created_at', 'score', 'rating', 
-                'image_width', 'image_height', 'file_ext', 'tag_count',
-                'tag_count_general', 'tag_count_artist', 'tag_count_character', 
-                'tag_count_copyright', 'tag_count_meta', 'fav_count',
-                'general', 'character', 'copyright', 'artist', 'meta'
-            ]
-            
-            df_final = df_filtered.select(columns_to_keep)
-            
-            # チャンクを個別保存
-            chunk_file = self.temp_dir / f"chunk_{chunk_id:03d}.pkl"
-            with open(chunk_file, 'wb') as f:
-                pickle.dump(df_final, f)
-            
-            logger.info(f"チャンク保存完了: {chunk_file}")
+    @property
+    def table(self):
+        """train分割のArrow Table（初回アクセス時に1回だけメモリマップで開く）"""
+        if self._table is None:
+            self._table = open_arrow_dataset(self.input_path, "train")
+        return self._table
         
-        # メモリクリーンアップ
-        del df_chunk, df_filtered, chunk, train_dataset, dataset
-        gc.collect()
-        
-        return active_count
+    def process_single_chunk(self, chunk_id: int, start_idx: int, end_idx: int) -> ChunkRecord:
+        """単一チャンクを処理"""
+        return process_chunk(self.table, chunk_id, start_idx, end_idx, str(self.store_dir))
+    
+    def chunk_ranges(self) -> List[Tuple[int, int, int]]:
+        """(chunk_id, 開始行, 終了行) の一覧"""
+        return [(chunk_id, start, end) for chunk_id, (start, end, _) in
+                enumerate(iter_slices(self.table, self.chunk_size))]
     
-    def run_incremental_processing(self):
-        """段階的処理を実行"""
-        # データセット情報を取得
-        dataset = load_from_disk(self.input_path)
-        total_size = len(dataset['train'])
-        del dataset
-        gc.collect()
+    def run_incremental_processing(self, workers: int = 1, verify_checksum: bool = False):
+        """段階的処理を実行（manifestで未完了・失敗のチャンクだけを処理する）
+        
+        workers > 1 ではチャンクをプロセスプールに分配する。各ワーカーはデータセットを
+        自分でメモリマップし、互いに重ならない行範囲を読んで別々のファイルに書く。
+        manifestはメインプロセスがチャンク完了ごとに書き換える
+        """
+        # データセット情報を取得（メタデータのみ、行データは読まない）
+        total_size = self.table.num_rows
         
         logger.info(f"総データ数: {total_size:,}件")
         logger.info(f"チャンクサイズ: {self.chunk_size:,}件")
         
-        # 状態復元
-        processed_chunks, total_active = self.load_state()
-        start_chunk = processed_chunks
+        # 状態復元（入力が変わっていればストアを作り直す）
+        source = {'input_path': str(self.input_path), 'total_rows': total_size, 'chunk_size': self.chunk_size,
+                  'columns': STORE_COLUMNS}
+        manifest = ChunkManifest(str(self.store_dir))
+        records = manifest.load(source)
+        if records is None:
+            logger.warning(f"入力・チャンクサイズ・列構成が前回と異なるためストアを削除します: {self.store_dir}")
+            clear_store(str(self.store_dir))
+            records = {}
         
-        if start_chunk > 0:
-            logger.info(f"前回の続きから開始: チャンク{start_chunk}から, 累計{total_active:,}件")
+        ranges = self.chunk_ranges()
+        pending = [r for r in ranges if not manifest.is_complete(records.get(r[0]), verify_checksum)]
+        if len(pending) < len(ranges):
+            logger.info(f"前回の続きから開始: 完了済み{len(ranges) - len(pending)}チャンク, 残り{len(pending)}チャンク")
         
-        # チャンク単位で処理
-        chunk_id = start_chunk
+        def finish(record: ChunkRecord):
+            records[record.chunk_id] = record
+            manifest.commit(source, records)
+            done = sum(1 for r in records.values() if r.status == 'done')
+            if record.status == 'done':
+                logger.info(f"チャンク{record.chunk_id}完了: {record.active_rows:,}/{record.input_rows:,}件 "
+                            f"({record.seconds:.1f}秒) - 進捗: {done}/{len(ranges)}")
+            else:
+                logger.error(f"チャンク{record.chunk_id}でエラー: {record.error}")
         
-        for i in range(start_chunk * self.chunk_size, total_size, self.chunk_size):
-            end_idx = min(i + self.chunk_size, total_size)
-            
-            try:
-                active_count = self.process_single_chunk(chunk_id, i, end_idx)
-                total_active += active_count
-                chunk_id += 1
-                
-                # 状態保存
-                self.save_state(chunk_id, total_active)
-                
-                logger.info(f"進捗: {chunk_id}/{(total_size-1)//self.chunk_size + 1}, 累計アクティブ: {total_active:,}件")
-                
-                # 5チャンクごとに詳細ログ
-                if chunk_id % 5 == 0:
-                    logger.info(f"=== 中間報告 ({chunk_id}チャンク完了) ===")
-                    logger.info(f"累計アクティブデータ: {total_active:,}件")
-                    logger.info(f"処理進捗: {(chunk_id * self.chunk_size / total_size * 100):.1f}%")
-                
-            except Exception as e:
-                logger.error(f"チャンク{chunk_id}でエラー: {e}")
-                logger.info(f"現在の状態を保存して終了...")
-                self.save_state(chunk_id, total_active)
-                return False
+        if workers <= 1:
+            for chunk_id, start, end in pending:
+                finish(run_chunk(self.table, chunk_id, start, end, str(self.store_dir)))
+        else:
+            # polarsのスレッドプールはforkと相性が悪いのでspawnで起動する
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                futures = [
+                    executor.submit(_chunk_worker, str(self.input_path), chunk_id, start, end, str(self.store_dir))
+                    for chunk_id, start, end in pending
+                ]
+                for future in as_completed(futures):
+                    finish(future.result())
+        
+        failed = sorted(r.chunk_id for r in records.values() if r.status != 'done')
+        total_active = sum(r.active_rows for r in records.values() if r.status == 'done')
+        if failed:
+            logger.error(f"失敗したチャンク: {failed}（再実行すると失敗分だけ処理します）")
+            return False
         
         logger.info(f"全チャンク処理完了: {total_active:,}件のアクティブデータ")
         return True
@@ -138,74 +186,37 @@ class IncrementalPickler:
         """チャンクを結合して上位抽出"""
         logger.info("=== チャンク結合と上位抽出 ===")
         
-        chunk_files = sorted(self.temp_dir.glob("chunk_*.pkl"))
-        logger.info(f"チャンクファイル数: {len(chunk_files)}")
-        
-        # 最古の日付を推定
-        logger.info("最古の日付を推定中...")
-        with open(chunk_files[0], 'rb') as f:
-            sample_df = pickle.load(f)
-        
-        sample_df = sample_df.with_columns([
-            pl.col("created_at").str.strptime(pl.Datetime, "%Y-%m-%dT%H:%M:%S%.f%z").alias("created_datetime")
-        ])
-        min_date = sample_df.select(pl.col("created_datetime").min()).item()
-        logger.info(f"推定最古日付: {min_date}")
-        del sample_df
-        gc.collect()
-        
-        # 上位スコア管理用のヒープ
-        import heapq
-        top_records = []
-        
-        # チャンクを順次処理
-        for i, chunk_file in enumerate(chunk_files):
-            logger.info(f"チャンク結合中: {i+1}/{len(chunk_files)} - {chunk_file.name}")
-            
-            with open(chunk_file, 'rb') as f:
-                df = pickle.load(f)
-            
-            if len(df) == 0:
-                continue
-            
-            # 時間当たりスコア計算
-            df = df.with_columns([
-                pl.col("created_at").str.strptime(pl.Datetime, "%Y-%m-%dT%H:%M:%S%.f%z").alias("created_datetime")
-            ])
-            
-            df = df.with_columns([
-                ((pl.col("created_datetime") - pl.lit(min_date)).dt.total_hours() + 1).alias("hours_since_start")
-            ])
-            
-            df = df.with_columns([
-                (pl.col("score") / pl.col("hours_since_start")).alias("score_per_hour")
-            ])
-            
-            # ヒープで上位管理
-            for idx, row in enumerate(df.iter_rows(named=True)):
-                score_per_hour = row['score_per_hour']
-                
-                if len(top_records) < top_n:
-                    heapq.heappush(top_records, (score_per_hour, i * 100000 + idx, row))
-                elif score_per_hour > top_records[0][0]:
-                    heapq.heapreplace(top_records, (score_per_hour, i * 100000 + idx, row))
+        files = chunk_files(str(self.store_dir))
+        logger.info(f"チャンクファイル数: {len(files)}")
+        
+        # 最古の日付（全チャンクのParquet統計から厳密に求める）
+        min_date, max_date = column_range("created_datetime", str(self.store_dir))
+        logger.info(f"日付範囲: {min_date} - {max_date}")
+        
+        # 上位抽出（ファイルごとにtop_kを並列に取り、生き残りと合わせて再度top_k）
+        top_df = None
+        for start in range(0, len(files), self.combine_batch_size):
+            batch = files[start:start + self.combine_batch_size]
+            logger.info(f"チャンク結合中: {start + len(batch)}/{len(files)}")
             
-            del df
-            gc.collect()
+            # 既にtop_n件あれば、その最小値未満の行は候補になり得ない
+            threshold = top_df['score_per_hour'].min() if top_df is not None and len(top_df) >= top_n else None
+            queries = []
+            for chunk_file in batch:
+                lazy = with_score_per_hour(pl.scan_parquet(chunk_file, hive_partitioning=False), min_date)
+                if threshold is not None:
+                    lazy = lazy.filter(pl.col("score_per_hour") >= threshold)
+                queries.append(lazy.top_k(top_n, by="score_per_hour"))
             
-            if i % 10 == 0:
-                current_min = top_records[0][0] if top_records else 0
-                logger.info(f"現在の最小スコア/時間: {current_min:.3f}")
+            frames = pl.collect_all(queries)
+            if top_df is not None:
+                frames.append(top_df)
+            top_df = pl.concat(frames).top_k(top_n, by="score_per_hour")
+            logger.info(f"現在の最小スコア/時間: {top_df['score_per_hour'].min():.3f}")
         
         # 最終結果作成
         logger.info("最終結果作成中...")
-        final_records = []
-        while top_records:
-            score_per_hour, idx, record = heapq.heappop(top_records)
-            final_records.append(record)
-        
-        final_records.reverse()  # 降順に
-        top_df = pl.DataFrame(final_records)
+        top_df = top_df.sort("score_per_hour", descending=True)
         
         # 結果保存
         output_file = "data/danbooru_tags_top20k.pkl"
@@ -225,20 +236,25 @@ class IncrementalPickler:
 
 def main():
     """メイン処理"""
-    if len(sys.argv) > 1:
-        action = sys.argv[1]
-    else:
-        action = "process"
+    parser = argparse.ArgumentParser(description='Danbooru-tags-2024の分割処理')
+    parser.add_argument('action', nargs='?', choices=['process', 'combine', 'full'], default='process', help='実行する処理')
+    parser.add_argument('--input', type=str, default=DATASET_PATH, help='入力データパス')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='チャンクあたりの行数')
+    parser.add_argument('--workers', type=int, default=1, help=f'チャンク処理のプロセス数（CPU数: {os.cpu_count()}）')
+    parser.add_argument('--verify', action='store_true', help='再開時に完了済みチャンクのチェックサムも照合する')
+    args = parser.parse_args()
+    action = args.action
     
-    pickler = IncrementalPickler()
+    pickler = IncrementalPickler(args.input, chunk_size=args.chunk_size)
     
     if action == "process":
         logger.info("=== 段階的処理開始 ===")
-        success = pickler.run_incremental_processing()
+        success = pickler.run_incremental_processing(args.workers, args.verify)
         if success:
             logger.info("処理完了。次は 'combine' で結合してください。")
         else:
-            logger.info("エラーで中断。修正後、再実行してください。")
+            logger.error("エラーで中断。修正後、再実行してください。")
+            sys.exit(1)
     
     elif action == "combine":
         logger.info("=== チャンク結合開始 ===")
@@ -246,9 +262,11 @@ def main():
     
     elif action == "full":
         logger.info("=== 全処理実行 ===")
-        success = pickler.run_incremental_processing()
-        if success:
-            pickler.combine_chunks_and_extract_top()
+        success = pickler.run_incremental_processing(args.workers, args.verify)
+        if not success:
+            logger.error("チャンク処理が失敗したため結合を行いません。修正後、再実行してください。")
+            sys.exit(1)
+        pickler.combine_chunks_and_extract_top()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
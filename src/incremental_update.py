@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+差分更新（incremental re-scrape）用のページ索引と構造差分
+ページごとの抽出結果を本文ハッシュ付きで保存し、次回は本文が変わったページだけ再パースする
+"""
+
+import json
+import logging
+import os
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from result_store import has_table_result, load_result_items, metadata_path
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PageRecord:
+    """1ページ分の抽出結果（前回結果の再利用判定用）"""
+    key: str                             # 正規化URL
+    url: str
+    depth: int                           # 追跡深度（メインページは0）
+    base_path: List[str]                 # 抽出時の基準パス（変わっていれば再パース）
+    sha256: str                          # 本文のハッシュ
+    result: Dict                         # extract_hierarchy_from_pageの結果
+
+
+class PageIndex:
+    """ページ単位の抽出結果を保存するJSON Lines（実行終了時に丸ごと書き換える）"""
+
+    def __init__(self, path: str = "tmp/scalable_scraping_pages.jsonl"):
+        self.path = Path(path)
+
+    def load(self) -> Dict[str, PageRecord]:
+        if not self.path.exists():
+            return {}
+        records = {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = PageRecord(**json.loads(line))
+                except (ValueError, TypeError):
+                    logger.warning(f"ページ索引の不完全な行を無視: {line[:80]!r}")
+                    continue
+                records[record.key] = record
+        logger.info(f"ページ索引読み込み: {len(records)}ページ ({self.path})")
+        return records
+
+    def save(self, records: Dict[str, PageRecord]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records.values():
+                f.write(json.dumps(asdict(record), ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+        logger.info(f"ページ索引保存: {len(records)}ページ ({self.path})")
+
+
+def load_previous_items(output_base: str) -> Optional[Dict[str, Dict]]:
+    """前回の結果からitemsを読み込む（表形式と単一JSONのうち新しい方、どちらもなければNone）"""
+    if has_table_result(output_base):
+        return load_result_items(output_base, 'raw_items')
+    json_path = metadata_path(output_base)[:-len('.meta.json')] + '.json'
+    if not os.path.exists(json_path):
+        return None
+    with open(json_path, 'r', encoding='utf-8') as f:
+        result = json.load(f)
+    return result.get('raw_hierarchy_data', {}).get('items', {})
+
+
+def diff_items(old_items: Dict[str, Dict], new_items: Dict[str, Dict]) -> Dict:
+    """2つのitems間の構造差分（追加・削除・移動・再分類）"""
+    added = {name: new_items[name] for name in new_items.keys() - old_items.keys()}
+    removed = {name: old_items[name] for name in old_items.keys() - new_items.keys()}
+    moved = {}
+    reclassified = {}
+    for name in new_items.keys() & old_items.keys():
+        old, new = old_items[name], new_items[name]
+        if old['path'] != new['path']:
+            moved[name] = {'old_path': old['path'], 'new_path': new['path']}
+        if old['classification'] != new['classification']:
+            reclassified[name] = {'old': old['classification'], 'new': new['classification']}
+
+    return {
+        'summary': {
+            'added': len(added),
+            'removed': len(removed),
+            'moved': len(moved),
+            'reclassified': len(reclassified),
+            'unchanged': len(new_items) - len(added) - len(moved.keys() | reclassified.keys())
+        },
+        'added': dict(sorted(added.items())),
+        'removed': dict(sorted(removed.items())),
+        'moved': dict(sorted(moved.items())),
+        'reclassified': dict(sorted(reclassified.items()))
+    }
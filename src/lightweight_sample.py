@@ -3,11 +3,12 @@
 軽量サンプル版: 最初の10万件から上位5000件を抽出
 """
 
-import polars as pl
 import logging
 from pathlib import Path
 import pickle
-from datasets import load_from_disk
+
+from arrow_dataset import (ACTIVE_FILTER, created_datetime_expr, min_created_datetime, open_arrow_dataset,
+                           scan_arrow_table, with_score_per_hour)
 
 # ログ設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,29 +23,7 @@ def lightweight_sample():
     
     logger.info(f"軽量サンプル処理開始: {input_path}")
     
-    # データセット読み込み
-    dataset = load_from_disk(input_path)
-    train_dataset = dataset['train']
-    
-    logger.info(f"総データ数: {len(train_dataset):,}件")
-    logger.info(f"サンプルサイズ: {sample_size:,}件を処理")
-    
-    # 最初のN件をサンプルとして取得
-    sample = train_dataset.select(range(sample_size))
-    df = pl.from_pandas(sample.to_pandas())
-    
-    logger.info(f"サンプル読み込み完了: {len(df):,}件")
-    
-    # フィルタリング
-    df_filtered = df.filter(
-        (pl.col("is_deleted") == False) & 
-        (pl.col("is_banned") == False) &
-        (pl.col("score") > 0)
-    )
-    
-    logger.info(f"アクティブデータ: {len(df_filtered):,}件")
-    
-    # 必要なカラムのみ選択
+    # 必要なカラム
     columns_to_keep = [
         'id', 'created_at', 'score', 'rating', 
         'image_width', 'image_height', 'file_ext', 'tag_count',
@@ -53,24 +32,30 @@ def lightweight_sample():
         'general', 'character', 'copyright', 'artist', 'meta'
     ]
     
-    df_final = df_filtered.select(columns_to_keep)
+    # データセット読み込み（メモリマップのみ）
+    table = open_arrow_dataset(input_path, "train")
     
-    # 時間当たりスコア計算
-    logger.info("時間当たりスコア計算中...")
-    df_final = df_final.with_columns([
-        pl.col("created_at").str.strptime(pl.Datetime, "%Y-%m-%dT%H:%M:%S%.f%z").alias("created_datetime")
-    ])
+    logger.info(f"総データ数: {table.num_rows:,}件")
+    logger.info(f"サンプルサイズ: {sample_size:,}件を処理")
     
-    min_date = df_final.select(pl.col("created_datetime").min()).item()
-    logger.info(f"最古日付: {min_date}")
+    # 最初のN件から、アクティブな行の必要なカラムだけを読む
+    df_final = (
+        scan_arrow_table(table)
+        .head(sample_size)
+        .filter(ACTIVE_FILTER)
+        .select(columns_to_keep)
+        .collect()
+    )
     
-    df_final = df_final.with_columns([
-        ((pl.col("created_datetime") - pl.lit(min_date)).dt.total_hours() + 1).alias("hours_since_start")
-    ])
+    logger.info(f"アクティブデータ: {len(df_final):,}件")
     
-    df_final = df_final.with_columns([
-        (pl.col("score") / pl.col("hours_since_start")).alias("score_per_hour")
-    ])
+    # 最古日付は全データのアクティブな投稿から求める（created_at文字列の最小値を取る事前パス）
+    min_date = min_created_datetime(scan_arrow_table(table).filter(ACTIVE_FILTER))
+    logger.info(f"最古日付: {min_date}")
+    
+    # 時間当たりスコア計算
+    logger.info("時間当たりスコア計算中...")
+    df_final = with_score_per_hour(df_final.with_columns(created_datetime_expr()), min_date)
     
     # 上位抽出
     logger.info(f"上位{top_n:,}件を抽出中...")
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+スクレイピング結果の表形式（JSON Lines / Arrow IPC）での保存・読み込み（--output-format jsonl / arrow）
+クロール完了後、itemsなどの大きな表を表ごとのファイルにバッチ単位で書き出し、その他は小さなメタデータJSONにまとめる。
+読み込み側は全体を載せずに行単位で読むか、LazyFrame（Arrowはメモリマップ）で開ける
+
+    tmp/scalable_scraping_result.meta.json        メタデータ・統計・見出し等 + 各表のファイル名と行数
+    tmp/scalable_scraping_result.items.jsonl      normalized_data.items（1行1アイテム、pathの代わりにノードID）
+    tmp/scalable_scraping_result.nodes.jsonl      itemsのパスのノード表（id, name, parent, depth）
+    tmp/scalable_scraping_result.raw_items.jsonl  raw_hierarchy_data.items
+    tmp/scalable_scraping_result.raw_nodes.jsonl
+    ...
+"""
+
+import json
+import logging
+import os
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import polars as pl
+
+from hierarchy_tree import NodeTable
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ['json', 'jsonl', 'arrow']
+FORMAT_SUFFIXES = {'jsonl': '.jsonl', 'arrow': '.arrow'}
+NODE_TABLES = {'items': 'nodes', 'raw_items': 'raw_nodes'}  # アイテム表 → パスのノード表
+# 読み込み時に復元するアイテムの列順（従来のitemsと同じ）
+ITEM_COLUMNS = ['name', 'url', 'path', 'parent', 'depth', 'has_nested_list', 'classification', 'should_follow']
+
+# 表ごとの列定義（polarsのスキーマ。Arrowスキーマもここから作る）
+# アイテムのpath（とそこから決まるparent, depth）はノード表に一度だけ持ち、アイテムは末端ノードのIDを参照する
+ITEM_SCHEMA = {
+    'name': pl.Utf8,
+    'url': pl.Utf8,
+    'node': pl.Int64,
+    'has_nested_list': pl.Boolean,
+    'classification': pl.Utf8,
+    'should_follow': pl.Boolean,
+}
+NODE_SCHEMA = {
+    'id': pl.Int64,
+    'name': pl.Utf8,
+    'parent': pl.Int64,
+    'depth': pl.Int64,
+}
+TABLE_SCHEMAS = {
+    'items': ITEM_SCHEMA,
+    'nodes': NODE_SCHEMA,
+    'raw_items': ITEM_SCHEMA,
+    'raw_nodes': NODE_SCHEMA,
+    'normalization_log': {'action': pl.Utf8, 'original': pl.Utf8, 'normalized': pl.Utf8},
+    'removed_duplicates': {
+        'duplicate': pl.Utf8,
+        'kept_classification': pl.Utf8,
+        'kept_path': pl.Utf8,
+        'discarded_classification': pl.Utf8,
+        'discarded_path': pl.Utf8,
+    },
+}
+
+
+def metadata_path(output_base: str) -> str:
+    """出力ベース名（拡張子なし、.json/.meta.json付きも可）からメタデータJSONのパスを返す"""
+    for suffix in ('.meta.json', '.json'):
+        if output_base.endswith(suffix):
+            output_base = output_base[:-len(suffix)]
+            break
+    return f"{output_base}.meta.json"
+
+
+def _arrow_schema(table: str):
+    return pl.DataFrame(schema=TABLE_SCHEMAS[table]).to_arrow().schema
+
+
+class ResultWriter:
+    """表をバッチ単位で書き出すライター（出力全体を1つの文字列やリストに組み立てない）"""
+
+    def __init__(self, output_base: str, output_format: str = 'jsonl', batch_size: int = 10000):
+        if output_format not in FORMAT_SUFFIXES:
+            raise ValueError(f"未対応の表形式: {output_format} (選択肢: {list(FORMAT_SUFFIXES)})")
+        if output_format == 'arrow' and not HAS_PYARROW:
+            raise RuntimeError("Arrow出力にはpyarrowが必要です")
+        self.meta_path = Path(metadata_path(output_base))
+        self.base = str(self.meta_path)[:-len('.meta.json')]
+        self.output_format = output_format
+        self.batch_size = batch_size
+        self.tables: Dict[str, Dict] = {}
+
+    def write_table(self, table: str, rows: Iterable[Dict]) -> int:
+        """行をバッチ単位で書き出し、行数を返す"""
+        file_path = Path(f"{self.base}.{table}{FORMAT_SUFFIXES[self.output_format]}")
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = file_path.with_suffix(file_path.suffix + f".{os.getpid()}.tmp")
+        columns = list(TABLE_SCHEMAS[table])
+
+        row_count = 0
+        rows = iter(rows)
+        if self.output_format == 'jsonl':
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for row in rows:
+                    f.write(json.dumps({column: row.get(column) for column in columns}, ensure_ascii=False))
+                    f.write('\n')
+                    row_count += 1
+        else:
+            schema = _arrow_schema(table)
+            with pa.OSFile(str(tmp_path), 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+                while True:
+                    batch = list(islice(rows, self.batch_size))
+                    if not batch:
+                        break
+                    writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                    row_count += len(batch)
+        os.replace(tmp_path, file_path)
+
+        self.tables[table] = {'file': file_path.name, 'rows': row_count}
+        logger.info(f"  {table}: {row_count}行 → {file_path}")
+        return row_count
+
+    def write_metadata(self, metadata: Dict):
+        """メタデータJSONを書き出す（表の一覧と形式を含む）"""
+        sidecar = {'format': self.output_format, 'tables': self.tables, **metadata}
+        tmp_path = self.meta_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(sidecar, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.meta_path)
+        logger.info(f"  メタデータ → {self.meta_path}")
+
+
+def read_result_metadata(output_base: str) -> Optional[Dict]:
+    """メタデータJSONを読み込む（表形式の出力がなければNone）"""
+    path = metadata_path(output_base)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def has_table_result(output_base: str) -> bool:
+    """表形式の出力があり、同じベース名の単一JSONより新しいか（両方ある場合は新しい方を読む）"""
+    meta_path = Path(metadata_path(output_base))
+    if not meta_path.exists():
+        return False
+    json_path = meta_path.with_name(meta_path.name[:-len('.meta.json')] + '.json')
+    return not json_path.exists() or meta_path.stat().st_mtime >= json_path.stat().st_mtime
+
+
+def _table_file(output_base: str, metadata: Dict, table: str) -> Path:
+    if table not in metadata['tables']:
+        raise KeyError(f"結果に表 {table} がありません: {metadata_path(output_base)}")
+    return Path(metadata_path(output_base)).parent / metadata['tables'][table]['file']
+
+
+def scan_result_table(output_base: str, table: str = 'items') -> pl.LazyFrame:
+    """表をpolars LazyFrameとして開く（Arrowはメモリマップ、JSON Linesはストリーミング読み込み）"""
+    metadata = read_result_metadata(output_base)
+    if metadata is None:
+        raise FileNotFoundError(f"メタデータがありません: {metadata_path(output_base)}")
+    file_path = _table_file(output_base, metadata, table)
+    if metadata['format'] == 'arrow':
+        return pl.scan_ipc(file_path)
+    return pl.scan_ndjson(file_path, schema=TABLE_SCHEMAS[table])
+
+
+def load_node_table(output_base: str, table: str = 'nodes') -> NodeTable:
+    """ノード表を読み込む"""
+    nodes = scan_result_table(output_base, table).select('name', 'parent').collect()
+    return NodeTable.from_columns(nodes['name'].to_list(), nodes['parent'].to_list())
+
+
+def scan_items_with_paths(output_base: str, table: str = 'items', separator: str = None) -> pl.LazyFrame:
+    """アイテム表にノード表から復元したpath, parent, depth列を付けて開く（separator指定時のpathは連結済み文字列）"""
+    nodes = load_node_table(output_base, NODE_TABLES[table])
+    if separator is None:
+        paths = pl.Series('path', [nodes.path(node) for node in range(len(nodes))], dtype=pl.List(pl.Utf8))
+    else:
+        paths = pl.Series('path', nodes.path_strings(separator), dtype=pl.Utf8)
+    node_frame = pl.DataFrame({
+        'node': pl.Series('node', range(len(nodes)), dtype=pl.Int64),
+        'path': paths,
+        'parent': pl.Series('parent', [nodes.parent_name(node) for node in range(len(nodes))], dtype=pl.Utf8),
+        'depth': pl.Series('depth', nodes.depths.tolist(), dtype=pl.Int64),
+    })
+    return scan_result_table(output_base, table).join(
+        node_frame.lazy(), on='node', how='left', maintain_order='left'
+    ).select(ITEM_COLUMNS)
+
+
+def iter_result_rows(output_base: str, table: str = 'items') -> Iterator[Dict]:
+    """表を1行ずつ辞書で返す（全体をメモリに載せない。アイテム表はpath, parent, depthを復元した従来の形）"""
+    metadata = read_result_metadata(output_base)
+    if metadata is None:
+        raise FileNotFoundError(f"メタデータがありません: {metadata_path(output_base)}")
+    if table in NODE_TABLES:
+        nodes = load_node_table(output_base, NODE_TABLES[table])
+        for row in _iter_table_rows(output_base, metadata, table):
+            node = row['node']
+            row.update(path=nodes.path(node), parent=nodes.parent_name(node), depth=nodes.depths[node])
+            yield {column: row[column] for column in ITEM_COLUMNS}
+        return
+    yield from _iter_table_rows(output_base, metadata, table)
+
+
+def _iter_table_rows(output_base: str, metadata: Dict, table: str) -> Iterator[Dict]:
+    file_path = _table_file(output_base, metadata, table)
+    if metadata['format'] == 'arrow':
+        if not HAS_PYARROW:
+            # pyarrowがなければpolarsで読む
+            yield from pl.read_ipc(file_path).iter_rows(named=True)
+            return
+        with pa.memory_map(str(file_path), 'r') as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield from reader.get_batch(i).to_pylist()
+        return
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def load_result_items(output_base: str, table: str = 'items') -> Dict[str, Dict]:
+    """表を name → item の辞書として読み込む"""
+    return {row['name']: row for row in iter_result_rows(output_base, table)}
+
+
+def _item_rows(items: Dict[str, Dict], nodes: NodeTable) -> Iterator[Dict]:
+    """アイテムのpathをノード表にインターンし、ノードIDに置き換えた行を返す"""
+    for item in items.values():
+        yield {**item, 'node': nodes.intern(item['path'])}
+
+
+def _node_rows(nodes: NodeTable) -> Iterator[Dict]:
+    # アイテム表を書き終えてから読まれるので、その時点で全ノードが揃っている
+    columns = nodes.columns()
+    for node_id, name, parent, depth in zip(columns['id'], columns['name'], columns['parent'], columns['depth']):
+        yield {'id': node_id, 'name': name, 'parent': parent, 'depth': depth}
+
+
+def result_tables(result: Dict) -> Dict[str, Iterable[Dict]]:
+    """run_scalable_scraping()の結果から書き出す表を取り出す（アイテム表 → ノード表の順に書く）"""
+    raw = result['raw_hierarchy_data']
+    normalized = result['normalized_data']
+    nodes = NodeTable()
+    raw_nodes = NodeTable()
+    return {
+        'items': _item_rows(normalized['items'], nodes),
+        'nodes': _node_rows(nodes),
+        'raw_items': _item_rows(raw['items'], raw_nodes),
+        'raw_nodes': _node_rows(raw_nodes),
+        'normalization_log': normalized['normalization_log'],
+        'removed_duplicates': normalized['removed_duplicates'],
+    }
+
+
+def result_sidecar(result: Dict) -> Dict:
+    """表以外の小さな部分（メタデータ・統計・見出し・除外/無視要素）"""
+    raw = result['raw_hierarchy_data']
+    normalized = result['normalized_data']
+    sidecar: Dict[str, object] = {key: value for key, value in result.items() if key not in ('raw_hierarchy_data', 'normalized_data')}
+    small_keys: List[str] = ['headings', 'excluded_sections', 'ignored_elements']
+    sidecar['raw_hierarchy_data'] = {key: raw.get(key, []) for key in small_keys}
+    sidecar['normalized_data'] = {key: normalized.get(key, []) for key in small_keys}
+    return sidecar
+
+
+def save_result_tables(result: Dict, output_base: str, output_format: str = 'jsonl',
+                       batch_size: int = 10000) -> str:
+    """結果を表ごとのファイル + メタデータJSONで保存し、メタデータのパスを返す"""
+    writer = ResultWriter(output_base, output_format, batch_size)
+    for table, rows in result_tables(result).items():
+        writer.write_table(table, rows)
+    writer.write_metadata(result_sidecar(result))
+    return str(writer.meta_path)
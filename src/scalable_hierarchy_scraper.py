@@ -6,14 +6,32 @@ Copyrights, artists, projects and mediaを除く全tagに対応可能な設計
 
 import time
 import json
+import hashlib
+import asyncio
+import threading
 import logging
 import os
-import fnmatch
-from bs4 import BeautifulSoup
-from typing import List, Dict, Optional, Set
-from dataclasses import dataclass
+from bs4 import BeautifulSoup, NavigableString
+from typing import Iterator, List, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from collections import deque
+from dataclasses import dataclass, replace
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 import re
+import random
+from email.utils import parsedate_to_datetime
+
+from fetch_backends import FetchResult, FETCH_BACKENDS, create_fetcher
+from group_matcher import GroupMatcher
+from http_cache import ResponseCache, CacheEntry
+from crawl_journal import CrawlJournal, ResumeState, JournalTarget
+from crawl_metrics import CrawlMetrics
+from html_parsers import PARSER_BACKENDS, WIKI_BODY_ID, parse_wiki_page, resolve_parser_backend
+from hierarchy_snapshots import SnapshotStore, read_snapshot
+from result_store import OUTPUT_FORMATS, save_result_tables
+from incremental_update import PageIndex, PageRecord, diff_items, load_previous_items
+from wiki_dump import ROOT_WIKI_TITLE, WIKI_DUMP_PATH, dtext_to_html, load_hierarchy_pages, wiki_page_href
 
 # ログ用ディレクトリ作成
 os.makedirs('tmp', exist_ok=True)
@@ -43,7 +61,7 @@ class ScrapingConfig:
     exclude_sections: List[str] = None
     include_sections: List[str] = None
     ignore_elements: List[str] = None
-    max_depth: int = 10
+    max_depth: int = 10                  # リストのネスト深度 / ネストしたtag groupの追跡深度の上限
     
     # 範囲指定機能
     target_groups: List[str] = None      # 特定グループのみ処理
@@ -51,6 +69,43 @@ class ScrapingConfig:
     skip_first_n: int = 0               # 最初のN個をスキップ
     group_name_patterns: List[str] = None # 名前パターンマッチ
     
+    # 取得バックエンド
+    fetch_backend: str = "auto"          # auto / aiohttp / curl / replay
+    max_connections: int = 8             # keep-aliveコネクションプール上限
+    request_timeout: float = 30.0        # リクエストタイムアウト（秒）
+    parser_backend: str = "auto"         # auto / html.parser / lxml / selectolax
+    replay_dir: str = None               # replay用の記録済みコーパス（スナップショット形式）
+    replay_latency: float = 0.0          # replay時に1リクエストごとに待つ秒数（通信の模擬）
+    
+    # 並行取得
+    concurrency: int = 1                 # ワーカー数（1なら従来の逐次処理）
+    requests_per_second: float = None    # ホスト単位のリクエスト/秒（Noneなら1/rate_limit）
+    burst: int = 1                       # トークンバケットのバースト許容数
+    
+    # 適応的レート制御/リトライ
+    adaptive_rate: bool = True           # 429/503でレートを下げ、健全時に設定値まで戻す（AIMD）
+    max_retries: int = 4                 # 429/5xx/タイムアウト時の再試行回数
+    backoff_base: float = 2.0            # 指数バックオフの基準秒数
+    backoff_max: float = 120.0           # バックオフ/Retry-Afterの上限秒数
+    
+    # レスポンスキャッシュ
+    cache_dir: str = None                # Noneならキャッシュ無効
+    cache_ttl: float = 86400.0           # この秒数以内のキャッシュは再検証せず使用
+    offline: bool = False                # Trueならキャッシュのみから取得（ネットワーク不使用）
+    
+    # チェックポイント/再開
+    journal_path: str = None             # Noneならジャーナル無効
+    checkpoint_interval: int = 20        # チェックポイントを書くページ間隔
+    resume: bool = False                 # ジャーナルの最終チェックポイントから再開
+    
+    # 生HTMLスナップショット（取得段階/パース段階の分離）
+    snapshot_dir: str = None             # Noneなら保存しない
+    parse_workers: int = None            # スナップショット再パースのプロセス数（Noneならos.cpu_count()）
+    
+    # 差分更新
+    page_index_path: str = None          # ページ単位の抽出結果（本文ハッシュ付き）の保存先、Noneなら保存しない
+    incremental: bool = False            # 本文が前回と同じページは再パースせず前回の抽出結果を再利用
+    
     def __post_init__(self):
         if self.exclude_sections is None:
             self.exclude_sections = [
@@ -61,40 +116,192 @@ class ScrapingConfig:
             self.ignore_elements = ["see also"]
 
 class RateLimiter:
-    """レート制限クラス"""
-    def __init__(self, interval: float = 1.0):
+    """レート制限クラス（429/503でAIMD的に間隔を伸縮、Retry-Afterを尊重）"""
+    def __init__(self, interval: float = 1.0, adaptive: bool = True, max_interval: float = 60.0,
+                 increase_step: float = 0.05):
         self.interval = interval
+        self.min_interval = interval          # 設定値 = 許容される最大レート
+        self.max_interval = max(max_interval, interval)
+        self.adaptive = adaptive
+        self.increase_step = increase_step    # 健全なレスポンスごとに増やすreq/s
         self.last_request = 0.0
+        self.blocked_until = 0.0              # Retry-After/バックオフによる待機期限
     
-    def wait_if_needed(self):
-        elapsed = time.time() - self.last_request
-        if elapsed < self.interval:
-            time.sleep(self.interval - elapsed)
+    def wait_if_needed(self) -> float:
+        now = time.time()
+        delay = max(self.interval - (now - self.last_request), self.blocked_until - now, 0.0)
+        if delay > 0:
+            time.sleep(delay)
         self.last_request = time.time()
+        return delay
+    
+    def defer(self, delay: float):
+        """次のリクエストを少なくともdelay秒後まで遅らせる"""
+        self.blocked_until = max(self.blocked_until, time.time() + delay)
+    
+    def on_throttle(self, delay: float):
+        """スロットリング: 間隔を倍にして（乗算的減少）delay秒待機"""
+        if self.adaptive:
+            self.interval = min(self.max_interval, max(self.interval, 0.5) * 2)
+        self.defer(delay)
+    
+    def on_success(self):
+        """健全なレスポンス: レートを少しずつ上げ、設定値まで戻す（加算的増加）"""
+        if self.adaptive and self.interval > self.min_interval:
+            self.interval = max(self.min_interval, 1.0 / (1.0 / self.interval + self.increase_step))
+
+class TokenBucketLimiter:
+    """ホスト単位のトークンバケット型レート制限（並行取得用、429/503でホストごとにAIMD調整）"""
+    def __init__(self, rate: float, burst: int = 1, adaptive: bool = True, min_rate: float = 1.0 / 60,
+                 increase_step: float = 0.05):
+        self.rate = rate                  # 1秒あたりの補充トークン数（<=0なら無制限）
+        self.burst = max(1, burst)
+        self.adaptive = adaptive
+        self.min_rate = min_rate
+        self.increase_step = increase_step
+        self.max_rate = rate if rate > 0 else float('inf')
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # host -> (残トークン, 最終更新時刻)
+        self._host_rates: Dict[str, float] = {}             # host -> 現在のレート
+        self._blocked_until: Dict[str, float] = {}          # host -> 待機期限（monotonic）
+        self._lock = threading.Lock()
+    
+    def host_rate(self, url: str) -> float:
+        return self._host_rates.get(urlsplit(url).netloc, self.max_rate)
+    
+    def _reserve(self, url: str) -> float:
+        """トークンを1つ予約し、予約分が使えるまでの待ち時間を返す"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            blocked = max(0.0, self._blocked_until.get(host, 0.0) - now)
+            rate = self._host_rates.get(host, self.max_rate)
+            if rate == float('inf'):
+                return blocked
+            tokens, last = self._buckets.get(host, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * rate) - 1.0
+            self._buckets[host] = (tokens, now)
+        # 残トークンが負の場合は先行予約者の分も含めて補充を待つ
+        return max(blocked, 0.0 if tokens >= 0 else -tokens / rate)
+    
+    def wait(self, url: str) -> float:
+        delay = self._reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+    
+    async def acquire_async(self, url: str) -> float:
+        delay = self._reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+    
+    def defer(self, url: str, delay: float):
+        """ホストへの次のリクエストを少なくともdelay秒後まで遅らせる"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            self._blocked_until[host] = max(self._blocked_until.get(host, 0.0), time.monotonic() + delay)
+    
+    def on_throttle(self, url: str, delay: float):
+        """スロットリング: ホストのレートを半減（乗算的減少）し、バーストを打ち消してdelay秒待機"""
+        host = urlsplit(url).netloc
+        if self.adaptive:
+            with self._lock:
+                current = self._host_rates.get(host, self.max_rate)
+                if current == float('inf'):
+                    current = 2.0
+                self._host_rates[host] = max(self.min_rate, current / 2)
+                self._buckets[host] = (0.0, time.monotonic())
+        self.defer(url, delay)
+    
+    def on_success(self, url: str):
+        """健全なレスポンス: ホストのレートを設定値まで少しずつ戻す（加算的増加）"""
+        if not self.adaptive:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            current = self._host_rates.get(host)
+            if current is None:
+                return
+            increased = current + self.increase_step
+            if increased >= self.max_rate:
+                del self._host_rates[host]
+            else:
+                self._host_rates[host] = increased
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-Afterヘッダ（秒数 or HTTP日付）を待機秒数に変換"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+def column_records(columns: Dict[str, List]) -> List[Dict]:
+    """列指向のログ（列名 → 値のリスト）をレコードのリストに変換"""
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
 
 class ScalableHierarchyScraper:
     """スケーラブル階層スクレイパー"""
     
     def __init__(self, config: ScrapingConfig = None):
         self.config = config or ScrapingConfig()
-        self.rate_limiter = RateLimiter(self.config.rate_limit)
-        self.visited_urls: Set[str] = set()
+        self.rate_limiter = RateLimiter(self.config.rate_limit, adaptive=self.config.adaptive_rate)
+        requests_per_second = self.config.requests_per_second
+        if requests_per_second is None:
+            requests_per_second = 1.0 / self.config.rate_limit if self.config.rate_limit > 0 else 0.0
+        self.host_limiter = TokenBucketLimiter(requests_per_second, self.config.burst, adaptive=self.config.adaptive_rate)
+        self.fetcher = create_fetcher(
+            self.config.fetch_backend,
+            timeout=self.config.request_timeout,
+            max_connections=max(self.config.max_connections, self.config.concurrency),
+            replay_dir=self.config.replay_dir,
+            key_func=self.normalize_url,
+            replay_latency=self.config.replay_latency
+        )
+        self.parser_backend = resolve_parser_backend(self.config.parser_backend)
+        self.cache = ResponseCache(self.config.cache_dir, self.config.cache_ttl) if self.config.cache_dir else None
+        if self.config.offline and self.cache is None:
+            raise ValueError("オフラインモードにはcache_dirの指定が必要です")
+        self.snapshots = SnapshotStore(self.config.snapshot_dir) if self.config.snapshot_dir else None
+        self.journal = CrawlJournal(self.config.journal_path, self.config.checkpoint_interval) if self.config.journal_path else None
+        if self.config.resume and self.journal is None:
+            raise ValueError("再開にはjournal_pathの指定が必要です")
+        self.page_index = PageIndex(self.config.page_index_path) if self.config.page_index_path else None
+        if self.config.incremental and self.page_index is None:
+            raise ValueError("差分更新にはpage_index_pathの指定が必要です")
+        self.previous_pages: Dict[str, PageRecord] = self.page_index.load() if self.config.incremental else {}
+        self.page_records: Dict[str, PageRecord] = {}  # 今回の実行で抽出したページ
+        self.reused_pages = 0                # 本文が前回と同じため抽出結果を再利用したページ数
+        self.changed_pages: List[str] = []   # 再パースしたページのURL
+        self.visited_urls: Set[str] = set()  # normalize_url済みのURL
+        self.scheduled_count = 0             # 取得を予約したグループページ数（max_groups判定用）
+        self.pending_targets: Dict[str, JournalTarget] = {}  # 予約済み・未完了のページ（処理中を含む）
+        self.failed_targets: Dict[str, JournalTarget] = {}   # 取得失敗ページ（再開時に再試行）
+        self.metrics = CrawlMetrics()        # 取得・パース・待機の計測値（metadataに出力）
         self.hierarchy_data = {}
         self.complete_paths = {}
-        self.excluded_sections = set(s.lower() for s in self.config.exclude_sections)
+        self.group_matcher = GroupMatcher(
+            self.config.exclude_sections, self.config.target_groups, self.config.group_name_patterns
+        )
         self.ignored_elements = set(e.lower() for e in self.config.ignore_elements)
         
         logger.info(f"除外セクション: {self.config.exclude_sections}")
         logger.info(f"無視要素: {self.config.ignore_elements}")
+        logger.info(f"取得バックエンド: {self.fetcher.name}, パーサー: {self.parser_backend}")
+        if self.cache:
+            logger.info(f"レスポンスキャッシュ: {self.config.cache_dir} (TTL={self.config.cache_ttl}秒, offline={self.config.offline})")
     
     def should_exclude_section(self, section_name: str) -> bool:
         """セクションを除外すべきかチェック"""
-        section_lower = section_name.lower().strip()
-        
-        for excluded in self.excluded_sections:
-            if excluded in section_lower:
-                return True
-        return False
+        return self.group_matcher.is_excluded(section_name)
     
     def should_ignore_element(self, element_text: str) -> bool:
         """要素を無視すべきかチェック"""
@@ -130,6 +337,17 @@ class ScalableHierarchyScraper:
         
         return False
     
+    def normalize_url(self, url: str) -> str:
+        """visited_urls用のURL正規化（ホスト小文字化、tagsの表記揺れ吸収、クエリ順序・フラグメント除去）"""
+        parts = urlsplit(url)
+        query = []
+        for key, value in sorted(parse_qsl(parts.query, keep_blank_values=True)):
+            if key == 'tags':
+                value = value.strip().lower().replace(' ', '_')
+            query.append((key, value))
+        path = parts.path.rstrip('/') or '/'
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query, safe=':'), ''))
+    
     def convert_wiki_to_post_url(self, wiki_url: str) -> str:
         """want.md新仕様: wikiページのリンクをpostページに変換"""
         if '/wiki_pages/' in wiki_url:
@@ -163,69 +381,60 @@ class ScalableHierarchyScraper:
             result['items'][name] = item_data
 
     def should_process_group(self, group_name: str, index: int, processed_count: int, 
-                           item_path: List[str] = None) -> tuple[bool, str]:
-        """グループを処理すべきかチェック（除外処理、target_groups、範囲指定統合）"""
+                           item_path: List[str] = None, nested: bool = False) -> tuple[bool, str]:
+        """グループを処理すべきかチェック（除外処理、target_groups、範囲指定統合）
         
-        # 除外処理チェック（最優先）
+        判定順は除外 → スキップ数 → 処理数上限 → target_groups → パターン。
+        nested=Trueはネストしたtag groupの追跡時: 選択済みの祖先から辿っているため
+        除外処理とmax_groupsのみ適用し、skip/target_groups/パターンは適用しない
+        （indexはメインページでの順番なので、ネストしたグループには意味を持たない）
+        """
+        
+        # 除外処理チェック（最優先、パスの接頭辞ごとにキャッシュ）
         if item_path is not None:
-            for path_segment in item_path:
-                if self.should_exclude_section(path_segment):
-                    return False, f"除外パス内（{path_segment}）"
+            excluded_segment = self.group_matcher.excluded_segment(item_path)
+            if excluded_segment is not None:
+                return False, f"除外パス内（{excluded_segment}）"
         
         # グループ名直接除外チェック
         if self.should_exclude_section(group_name):
             return False, f"除外グループ（{group_name}）"
         
         # スキップ数チェック
-        if index < self.config.skip_first_n:
+        if not nested and index < self.config.skip_first_n:
             return False, f"スキップ（{index+1}/{self.config.skip_first_n}番目）"
         
         # 処理数上限チェック
         if self.config.max_groups is not None and processed_count >= self.config.max_groups:
             return False, f"上限到達（{processed_count}/{self.config.max_groups}）"
         
-        # target_groupsフィルタチェック（統合）
-        if self.config.target_groups is not None:
-            # 直接一致チェック
-            if group_name in self.config.target_groups:
+        if nested:
+            return True, ""
+        
+        # target_groupsフィルタチェック（名前の直接一致 or パス内に対象名を含む）
+        if self.group_matcher.has_targets:
+            # 直接一致はパターン判定も省略して処理対象
+            if self.group_matcher.is_target_name(group_name):
                 return True, ""
-            
-            # pathベースマッチング（_should_skip_by_target_groupsから統合）
-            if item_path is not None:
-                # pathの中にtarget_groupsのいずれかが含まれている場合は処理対象
-                path_matches_target = False
-                for target_group in self.config.target_groups:
-                    # より厳密なマッチング：完全パス内にtargetが含まれている必要がある
-                    full_path_str = ' -> '.join(item_path).lower()
-                    if target_group.lower() in full_path_str:
-                        path_matches_target = True
-                        logger.debug(f"  階層的処理対象: {group_name} (path: {' -> '.join(item_path)})")
-                        break
-                
-                if not path_matches_target:
-                    logger.debug(f"target_groups フィルタでスキップ: {group_name} (path: {' -> '.join(item_path)})")
-                    return False, f"対象外グループ"
-            else:
-                # pathがない場合は対象外
+            if not self.group_matcher.matches_target_path(item_path):
+                logger.debug(f"target_groups フィルタでスキップ: {group_name} (path: {' -> '.join(item_path or [])})")
                 return False, f"対象外グループ"
         
         # パターンマッチングチェック
-        if self.config.group_name_patterns is not None:
-            matched = False
-            for pattern in self.config.group_name_patterns:
-                if fnmatch.fnmatch(group_name.lower(), pattern.lower()):
-                    matched = True
-                    break
-            if not matched:
-                return False, f"パターン不一致"
+        if self.group_matcher.has_patterns and not self.group_matcher.matches_pattern(group_name):
+            return False, f"パターン不一致"
         
         return True, ""
     
-    def _parse_li_element(self, li_element) -> Optional[Dict]:
-        """li要素を解析し、テキスト、リンク、ネストulの情報を抽出する"""
+    def _parse_li_element(self, li_element, visited: Set[int] = None) -> Optional[Dict]:
+        """li要素を解析し、テキスト、リンク、ネストulの情報を抽出する
+        
+        visitedは処理済みのli/ul要素のid集合（DOMには印を書き込まない）
+        """
+        visited = visited if visited is not None else set()
         
         # 既に処理済みのli要素はスキップ
-        if li_element.get('processed') == 'true':
+        if id(li_element) in visited:
             return None
 
         text = li_element.get_text(strip=True)
@@ -237,7 +446,7 @@ class ScalableHierarchyScraper:
         sibling_ul = li_element.find_next_sibling('ul')  # 兄弟要素のul
         
         # 既に処理された兄弟ulはスキップ
-        if sibling_ul and sibling_ul.get('processed') == 'true':
+        if sibling_ul and id(sibling_ul) in visited:
             logger.debug(f"    [兄弟ulデバッグ] 既に処理済みのulをスキップ: {li_element.get_text(strip=True)[:50]}...")
             sibling_ul = None
         
@@ -246,11 +455,12 @@ class ScalableHierarchyScraper:
             # より安全なテキスト抽出: liの直接の子テキストのみを取得
             clean_text = ""
             for child in li_element.children:
-                if hasattr(child, 'name') and child.name == 'ul':
+                if child.name == 'ul':
                     continue  # ul要素はスキップ
-                if hasattr(child, 'strip'):
+                # Tagは未知の属性名をfind()として扱うため、hasattr(child, 'strip')では判別できない
+                if isinstance(child, NavigableString):
                     clean_text += child.strip()
-                elif hasattr(child, 'get_text'):
+                else:
                     clean_text += child.get_text(strip=True)
             clean_text = clean_text.strip()
             
@@ -335,7 +545,7 @@ class ScalableHierarchyScraper:
         return True
     
     def _remove_post_page_noise(self, soup: BeautifulSoup):
-        """postページ特有の不要な要素を除去"""
+        """postページ特有の不要な要素を除去し、階層抽出の対象とするルート要素を返す"""
         
         # 除去対象のセレクタ（postページのナビゲーション等）
         noise_selectors = [
@@ -357,14 +567,12 @@ class ScalableHierarchyScraper:
         ]
         
         # wikiコンテンツ部分のみを取得（postページ内のwiki部分）
-        wiki_content = soup.find('div', {'id': 'wiki-page-body'})
+        wiki_content = soup.find('div', {'id': WIKI_BODY_ID})
         if wiki_content:
-            # wiki部分が見つかった場合、それ以外を除去
-            for element in soup.find_all():
-                if not wiki_content.find_parent() or element not in wiki_content.find_all():
-                    if element != wiki_content and not wiki_content in element.find_all():
-                        continue
+            # wiki部分が見つかった場合、そのサブツリーのみを解析対象にする
+            root = wiki_content
         else:
+            root = soup
             # wiki部分が見つからない場合、一般的なノイズ要素を除去
             for selector in noise_selectors:
                 for element in soup.select(selector):
@@ -376,95 +584,219 @@ class ScalableHierarchyScraper:
             'Tags', 'Comments', 'Notes', 'Artists', 'Pools', 'Wiki', 'Forum'
         ]
         
-        for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        for heading in root.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
             if heading.get_text(strip=True) in unwanted_headings:
                 heading.decompose()
+        
+        return root
+    
+    def fetch_page_result(self, url: str, base_path: List[str], depth: int, item: Dict = None) -> Optional[Dict]:
+        """ページを取得して階層を抽出（スナップショット保存、差分更新時は前回結果の再利用を含む）"""
+        logger.info(f"取得中 ({self.fetcher.name}): {url}")
+        response = self._fetch(url)
+        page_result = self._extract_page(url, response, base_path, depth)
+        if page_result is not None:
+            self._save_snapshot(url, response, depth, item)
+        return page_result
     
-    def webfetch_with_parse(self, url: str, prompt: str) -> Optional[BeautifulSoup]:
-        """curlを使用してコンテンツを取得しHTMLパース"""
-        logger.info(f"curl実行中: {url}")
+    def _extract_page(self, url: str, response: FetchResult, base_path: List[str], depth: int) -> Optional[Dict]:
+        """取得結果から階層を抽出し、ページ索引に記録"""
+        page_result, body_hash, reused = self._parse_page(url, response, base_path)
+        return self._record_page(url, depth, base_path, page_result, body_hash, reused)
+    
+    def _parse_page(self, url: str, response: FetchResult, base_path: List[str]) -> Tuple[Optional[Dict], Optional[str], bool]:
+        """取得結果から階層を抽出し (抽出結果, 本文ハッシュ, 前回結果を再利用したか) を返す
+        
+        差分更新時、本文ハッシュと基準パスが前回と同じページはパースせず前回の結果を返す。
+        スクレイパーの状態は読むだけなので、並行モードではワーカースレッドから呼ぶ
+        """
+        body_hash = hashlib.sha256(response.body).hexdigest() if response.ok else None
+        previous = self.previous_pages.get(self.normalize_url(url))
+        if previous is not None and previous.sha256 == body_hash and previous.base_path == base_path:
+            logger.info(f"  ♻️ 前回から変更なし、抽出結果を再利用: {url}")
+            return previous.result, body_hash, True
+        
+        parse_start = time.perf_counter()
+        soup = self._parse_fetch_result(response)
+        if soup is None:
+            return None, body_hash, False
+        page_result = self.extract_hierarchy_from_page(soup, base_path, url)
+        self.metrics.record_parse(time.perf_counter() - parse_start)
+        return page_result, body_hash, False
+    
+    def _record_page(self, url: str, depth: int, base_path: List[str], page_result: Optional[Dict],
+                     body_hash: Optional[str], reused: bool) -> Optional[Dict]:
+        """_parse_page()の結果を再利用数・再パース一覧・ページ索引に反映（並行モードではイベントループ側で呼ぶ）"""
+        if page_result is None:
+            return None
+        if reused:
+            self.reused_pages += 1
+            self.metrics.record_reuse()
+        else:
+            self.changed_pages.append(url)
         
-        try:
-            import subprocess
-            import tempfile
-            import os
-            
-            self.rate_limiter.wait_if_needed()
-            
-            # 一時ファイルを作成
-            with tempfile.NamedTemporaryFile(mode='w+', suffix='.html', delete=False) as temp_file:
-                temp_filename = temp_file.name
-            
-            # curlコマンドを構築
-            curl_command = [
-                'curl',
-                '--compressed',
-                '--silent',
-                '--show-error',
-                '--fail',
-                '--location',
-                '--max-time', '30',
-                '-H', 'User-Agent: Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                '-H', 'Accept: text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                '-H', 'Accept-Language: en-US,en;q=0.5',
-                '-H', 'Referer: https://danbooru.donmai.us/',
-                '-o', temp_filename,
-                url
-            ]
-            
-            # curlを実行
-            result = subprocess.run(curl_command, capture_output=True, text=True, timeout=35)
-            
-            if result.returncode == 0:
-                # ファイルを読み込み
-                with open(temp_filename, 'r', encoding='utf-8') as f:
-                    html_content = f.read()
-                
-                # 一時ファイルを削除
-                os.unlink(temp_filename)
-                
-                if html_content.strip():
-                    soup = BeautifulSoup(html_content, 'html.parser')
-                    logger.info(f"  ✅ 正常取得: {len(html_content)} bytes")
-                    return soup
-                else:
-                    logger.warning(f"  ❌ 空のレスポンス")
-                    return None
+        if self.page_index is not None:
+            key = self.normalize_url(url)
+            self.page_records[key] = PageRecord(key, url, depth, list(base_path), body_hash, page_result)
+        return page_result
+    
+    def _save_snapshot(self, url: str, response: FetchResult, depth: int, item: Dict = None):
+        """取得成功したページの生HTMLをスナップショットとして保存"""
+        if self.snapshots is None or not response.ok:
+            return
+        self.snapshots.save(self.normalize_url(url), url, response.body, depth, item)
+    
+    def _check_cache(self, url: str) -> Tuple[Optional[str], Optional[CacheEntry], Optional[FetchResult]]:
+        """キャッシュを確認し、ネットワーク不要ならその結果を返す"""
+        if self.cache is None:
+            return None, None, None
+        
+        cache_key = self.normalize_url(url)
+        entry = self.cache.lookup(cache_key)
+        if entry is not None and (self.config.offline or self.cache.is_fresh(entry)):
+            logger.info(f"  💾 キャッシュ使用: {url}")
+            self.metrics.record_cache('hit')
+            return cache_key, entry, self.cache.load(entry)
+        if self.config.offline:
+            self.metrics.record_cache('miss')
+            return cache_key, None, FetchResult(url=url, error='offline_miss', message="オフラインモードでキャッシュ未登録")
+        return cache_key, entry, None
+    
+    def _update_cache(self, cache_key: Optional[str], entry: Optional[CacheEntry], response: FetchResult) -> FetchResult:
+        """ネットワーク取得結果をキャッシュへ反映（304なら保存済み本文を返す）"""
+        if self.cache is None:
+            return response
+        
+        if response.status == 304 and entry is not None:
+            logger.info(f"  💾 未更新（304）: キャッシュを再利用")
+            self.metrics.record_cache('revalidated')
+            self.cache.refresh(cache_key, entry, response)
+            cached = self.cache.load(entry)
+            cached.elapsed = response.elapsed
+            return cached
+        
+        self.metrics.record_cache('miss')
+        if response.ok and response.body:
+            self.cache.store(cache_key, response)
+        return response
+    
+    def _should_retry(self, response: FetchResult) -> bool:
+        """再試行対象: 429、5xx、タイムアウト、通信エラー"""
+        if response.error in ('timeout', 'network'):
+            return True
+        return response.error == 'http' and response.status is not None and (response.status == 429 or response.status >= 500)
+    
+    def _retry_delay(self, response: FetchResult, attempt: int) -> float:
+        """Retry-Afterがあればそれに従い、なければジッター付き指数バックオフ"""
+        retry_after = parse_retry_after(response.headers.get('retry-after'))
+        if retry_after is not None:
+            return min(retry_after, self.config.backoff_max)
+        ceiling = min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+    
+    def _record_response(self, response: FetchResult):
+        self.metrics.record_response(response.status, response.error, response.elapsed, len(response.body))
+    
+    def _log_retry(self, response: FetchResult, attempt: int, delay: float):
+        self.metrics.record_retry()
+        reason = f"HTTP {response.status}" if response.status else response.error
+        logger.warning(f"  🔁 再試行 {attempt + 1}/{self.config.max_retries}: {reason}, {delay:.1f}秒後 ({response.url})")
+    
+    def _fetch(self, url: str) -> FetchResult:
+        """キャッシュ確認 → レート制限 → 取得（条件付きリクエスト、429/5xxは再試行）"""
+        cache_key, entry, cached = self._check_cache(url)
+        if cached is not None:
+            return cached
+        
+        headers = self.cache.conditional_headers(entry) if entry is not None else None
+        for attempt in range(self.config.max_retries + 1):
+            self.metrics.record_wait(self.rate_limiter.wait_if_needed())
+            response = self.fetcher.fetch(url, headers=headers)
+            self._record_response(response)
+            if not self._should_retry(response) or attempt == self.config.max_retries:
+                break
+            delay = self._retry_delay(response, attempt)
+            self._log_retry(response, attempt, delay)
+            if response.status in (429, 503):
+                self.rate_limiter.on_throttle(delay)
             else:
-                # エラーハンドリング
-                error_msg = result.stderr.strip() if result.stderr else "Unknown error"
-                
-                if result.returncode == 22:  # HTTP error
-                    if "403" in error_msg:
-                        logger.error(f"  ❌ アクセス拒否（403 Forbidden）: {url}")
-                        logger.error(f"     サイトがアクセスを制限している可能性があります")
-                    elif "404" in error_msg:
-                        logger.warning(f"  ❌ ページが見つかりません（404）: {url}")
-                    elif "429" in error_msg:
-                        logger.warning(f"  ⚠️ レート制限に引っかかりました（429）: {url}")
-                        logger.warning(f"     レート制限間隔を増やすことを検討してください（現在: {self.config.rate_limit}秒）")
-                    else:
-                        logger.error(f"  ❌ HTTPエラー: {error_msg}")
-                elif result.returncode == 28:  # Timeout
-                    logger.warning(f"  ⏰ タイムアウト: {url}")
-                else:
-                    logger.error(f"  ❌ curlエラー (code {result.returncode}): {error_msg}")
-                
-                # 一時ファイルを削除
-                if os.path.exists(temp_filename):
-                    os.unlink(temp_filename)
-                
-                return None
-                
-        except subprocess.TimeoutExpired:
-            logger.warning(f"  ⏰ curlプロセスタイムアウト: {url}")
-            return None
-        except FileNotFoundError:
-            logger.error(f"  ❌ curlコマンドが見つかりません。curlがインストールされているか確認してください")
+                self.rate_limiter.defer(delay)
+        
+        if response.ok or response.status == 304:
+            self.rate_limiter.on_success()
+        return self._update_cache(cache_key, entry, response)
+    
+    async def _fetch_async(self, url: str) -> FetchResult:
+        """並行モード用: キャッシュ確認 → ホスト単位レート制限 → 取得（429/5xxは再試行）"""
+        cache_key, entry, cached = self._check_cache(url)
+        if cached is not None:
+            return cached
+        
+        headers = self.cache.conditional_headers(entry) if entry is not None else None
+        for attempt in range(self.config.max_retries + 1):
+            self.metrics.record_wait(await self.host_limiter.acquire_async(url))
+            response = await self.fetcher.fetch_async(url, headers=headers)
+            self._record_response(response)
+            if not self._should_retry(response) or attempt == self.config.max_retries:
+                break
+            delay = self._retry_delay(response, attempt)
+            self._log_retry(response, attempt, delay)
+            # 同じホストの他ワーカーもまとめて待機させる
+            if response.status in (429, 503):
+                self.host_limiter.on_throttle(url, delay)
+            else:
+                self.host_limiter.defer(url, delay)
+        
+        if response.ok or response.status == 304:
+            self.host_limiter.on_success(url)
+        return self._update_cache(cache_key, entry, response)
+    
+    def _parse_fetch_result(self, response: FetchResult) -> Optional[BeautifulSoup]:
+        """取得結果を検査し、成功していればHTMLパース"""
+        if not response.ok:
+            self._log_fetch_failure(response)
             return None
-        except Exception as e:
-            logger.error(f"  ❌ 予期しないエラー: {e}")
+        
+        html_content = response.text()
+        if not html_content.strip():
+            logger.warning(f"  ❌ 空のレスポンス")
             return None
+        
+        soup, _ = parse_wiki_page(html_content, self.parser_backend)
+        logger.info(f"  ✅ 正常取得: {len(response.body)} bytes ({response.elapsed:.2f}秒)")
+        return soup
+    
+    def _log_fetch_failure(self, response: FetchResult):
+        """取得失敗の種類に応じたログ出力"""
+        url = response.url
+        
+        if response.error == 'http':
+            if response.status == 403:
+                logger.error(f"  ❌ アクセス拒否（403 Forbidden）: {url}")
+                logger.error(f"     サイトがアクセスを制限している可能性があります")
+            elif response.status == 404:
+                logger.warning(f"  ❌ ページが見つかりません（404）: {url}")
+            elif response.status == 429:
+                logger.warning(f"  ⚠️ レート制限に引っかかりました（429）: {url}")
+                logger.warning(f"     {self.config.max_retries}回の再試行後も解消しませんでした（現在の間隔: {self.rate_limiter.interval:.2f}秒）")
+            else:
+                logger.error(f"  ❌ HTTPエラー: {response.message}")
+        elif response.error == 'timeout':
+            logger.warning(f"  ⏰ タイムアウト: {url}")
+        elif response.error == 'curl_not_found':
+            logger.error(f"  ❌ curlコマンドが見つかりません。curlがインストールされているか確認してください")
+        elif response.error == 'offline_miss':
+            logger.warning(f"  💾 オフラインモード: キャッシュに存在しません: {url}")
+        elif response.error == 'curl':
+            logger.error(f"  ❌ curlエラー ({response.message})")
+        else:
+            logger.error(f"  ❌ 取得エラー: {response.message}")
+    
+    def close(self):
+        """取得バックエンドのコネクションとジャーナルを解放"""
+        self.fetcher.close()
+        if self.journal:
+            self.journal.close()
     
     
     def extract_hierarchy_from_page(self, soup: BeautifulSoup, base_path: List[str], 
@@ -477,8 +809,9 @@ class ScalableHierarchyScraper:
             'ignored_elements': []
         }
         
-        # postページ特有の不要な要素を除去
-        self._remove_post_page_noise(soup)
+        # postページ特有の不要な要素を除去（wiki本文があればそのサブツリーのみ走査）
+        root = self._remove_post_page_noise(soup)
+        visited: Set[int] = set()  # 処理済みのli/ul要素のid（このページの走査内で共有）
         
         # 見出しを抽出（除外チェック付き）
         current_path = base_path.copy()
@@ -486,7 +819,7 @@ class ScalableHierarchyScraper:
         current_section = None
         section_excluded = False
         
-        for element in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul']):
+        for element in root.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul']):
             if element.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
                 level = int(element.name[1])
                 text = element.get_text(strip=True)
@@ -517,13 +850,13 @@ class ScalableHierarchyScraper:
             elif element.name == 'ul' and element.parent.name != 'li' :
                 # 除外されていないセクションのリストのみ処理
                 self._process_list_items_with_exclusion(
-                    element, current_path, current_heading_stack, result
+                    element, current_path, current_heading_stack, result, visited
                 )
         
         return result
     
     def _process_list_items_with_exclusion(self, ul_element, base_path: List[str], 
-                                         heading_stack: List[Dict], result: Dict):
+                                         heading_stack: List[Dict], result: Dict, visited: Set[int] = None):
         """除外ルールを適用してリスト項目を処理"""
         current_path = base_path.copy()
         
@@ -533,23 +866,43 @@ class ScalableHierarchyScraper:
         
         # target_groupsフィルタはメインページ（base_pathが空）の時のみ適用
         apply_target_filter = len(base_path) == 0
-        self._process_list_recursive(ul_element, current_path, result, depth=0, apply_target_filter=apply_target_filter)
+        self._process_list_tree(ul_element, current_path, result, visited, apply_target_filter=apply_target_filter)
     
-    def _process_list_recursive(self, ul_element, current_path: List[str], 
-                               result: Dict, depth: int = 0, apply_target_filter: bool = True):
-        """再帰的にリスト構造を処理（リファクタリング版）"""
-        if depth > self.config.max_depth:
-            logger.warning(f"  最大深度 {self.config.max_depth} に到達、処理停止")
-            return
-        
-        for li in ul_element.find_all('li', recursive=False):
+    def _process_list_tree(self, ul_element, current_path: List[str], result: Dict,
+                           visited: Set[int] = None, apply_target_filter: bool = True):
+        """ネストしたリスト構造を明示的なスタックで深さ優先に処理
+        
+        再帰しないのでリストの深さに関わらずPythonのスタックは一定。処理済みのli/ulは
+        visited（要素のid集合）で管理し、DOMを書き換えないため同じsoupを別の設定で再走査できる
+        """
+        visited = visited if visited is not None else set()
+        # (未処理のli, パス, 深度, 処理後にliを処理済みにする兄弟ul)
+        stack: List[Tuple[Iterator, List[str], int, Optional[object]]] = []
+        
+        def enter(ul, path: List[str], depth: int, sibling_ul=None):
+            if depth > self.config.max_depth:
+                logger.warning(f"  最大深度 {self.config.max_depth} に到達、処理停止")
+                if sibling_ul is not None:
+                    visited.update(id(sibling_li) for sibling_li in sibling_ul.find_all('li', recursive=False))
+                return
+            stack.append((iter(ul.find_all('li', recursive=False)), path, depth, sibling_ul))
+        
+        enter(ul_element, current_path, 0)
+        while stack:
+            lis, path, depth, sibling_ul = stack[-1]
+            li = next(lis, None)
+            if li is None:
+                stack.pop()
+                # 兄弟ul内のli要素を処理済みとしてマーク（トップレベルのul走査での重複処理防止）
+                if sibling_ul is not None:
+                    visited.update(id(sibling_li) for sibling_li in sibling_ul.find_all('li', recursive=False))
+                continue
+            
             # li要素を解析
-            parsed_li = self._parse_li_element(li)
+            parsed_li = self._parse_li_element(li, visited)
             if not parsed_li:
                 continue
-                
-            # 処理済みマーク
-            li['processed'] = 'true'
+            visited.add(id(li))
 
             # 無視要素チェック
             if self.should_ignore_element(parsed_li['clean_text']):
@@ -559,31 +912,32 @@ class ScalableHierarchyScraper:
             
             # リンクありの場合
             if parsed_li['has_link']:
-                processed = self._process_link_item(parsed_li, current_path, result, apply_target_filter)
+                processed = self._process_link_item(parsed_li, path, result, apply_target_filter)
             else:
                 # リンクなしの場合
-                processed = self._process_text_item(parsed_li, current_path, result, apply_target_filter)
+                processed = self._process_text_item(parsed_li, path, result, apply_target_filter)
             
             if not processed:
                 continue
             
-            # 再帰処理
-            self._handle_recursive_processing(li, parsed_li, current_path, result, depth, apply_target_filter)
+            # 子のリストを次に処理する（兄弟のliより先 = 再帰版と同じ深さ優先の順序）
+            nested = self._nested_list(li, parsed_li, path, visited)
+            if nested is not None:
+                nested_ul, nested_path, is_sibling = nested
+                enter(nested_ul, nested_path, depth + 1, nested_ul if is_sibling else None)
 
-    def _handle_recursive_processing(self, li, parsed_li: Dict, current_path: List[str], 
-                                   result: Dict, depth: int, apply_target_filter: bool):
-        """再帰処理を管理"""
+    def _nested_list(self, li, parsed_li: Dict, current_path: List[str], visited: Set[int]) -> Optional[Tuple[object, List[str], bool]]:
+        """liの下位リスト（子 or 直後の兄弟ul）と、その処理に使うパスを返す"""
         nested_ul = parsed_li['nested_ul']
         sibling_ul = parsed_li['sibling_ul']
         clean_text = parsed_li['clean_text']
         
-        # ネストしたリストを再帰処理（子要素 or 兄弟要素）
+        # ネストしたリスト（子要素 or 兄弟要素）
         if nested_ul:
-            nested_path = current_path + [clean_text]
-            self._process_list_recursive(nested_ul, nested_path, result, depth + 1, apply_target_filter)
-        elif sibling_ul:
+            return nested_ul, current_path + [clean_text], False
+        if sibling_ul:
             # 兄弟ulの場合、この要素が実際に兄弟ulの「親」であることを確認
-            if li.find_next_sibling() == sibling_ul and sibling_ul.get('processed') != 'true':
+            if li.find_next_sibling() == sibling_ul and id(sibling_ul) not in visited:
                 # 兄弟ul用のパス構築：リンクがある場合はリンクテキストを使用
                 if parsed_li['has_link']:
                     parent_name = parsed_li['link_info']['text']
@@ -594,13 +948,10 @@ class ScalableHierarchyScraper:
                 logger.debug(f"    [階層デバッグ] 兄弟ul処理: 親='{parent_name}', パス={' -> '.join(nested_path)}")
                 
                 # 兄弟ulを処理する前にマークして重複処理を防ぐ
-                sibling_ul['processed'] = 'true'
-                self._process_list_recursive(sibling_ul, nested_path, result, depth + 1, apply_target_filter)
-                # 兄弟ul内のli要素を処理済みとしてマーク（重複処理防止）
-                for sibling_li in sibling_ul.find_all('li', recursive=False):
-                    sibling_li['processed'] = 'true'
-            else:
-                logger.debug(f"    [兄弟ulデバッグ] 兄弟ul処理をスキップ: 直後でないか既に処理済み")
+                visited.add(id(sibling_ul))
+                return sibling_ul, nested_path, True
+            logger.debug(f"    [兄弟ulデバッグ] 兄弟ul処理をスキップ: 直後でないか既に処理済み")
+        return None
     
     def _classify_node(self, name: str, has_link: bool, has_nested_list: bool) -> NodeType:
         """新しい4-way分類システム"""
@@ -632,23 +983,32 @@ class ScalableHierarchyScraper:
             'ignored_elements': []
         }
         
+        # ジャーナルからの再開
+        resume_state = self.journal.load() if self.config.resume else None
+        if self.config.resume and resume_state is None:
+            logger.warning(f"再開可能なジャーナルがありません: {self.config.journal_path} - 最初から実行します")
+        if resume_state is not None:
+            main_result, targets = self._restore_from_journal(resume_state)
+            processed_count = self._run_crawl(main_result, targets)
+            logger.info(f"\n処理完了: 再開後{processed_count}ページを処理（復元{len(resume_state.page_results)}ページ）")
+            return main_result
+        
         # メインページから開始
-        self.rate_limiter.wait_if_needed()
-        soup = self.webfetch_with_parse(start_url, "Extract complete hierarchical structure excluding copyrights and media sections")
+        main_page = self.fetch_page_result(start_url, [], depth=0)
         
-        if not soup:
+        if not main_page:
             logger.error("メインページの取得に失敗 - デフォルト構造を返します")
             return default_result
         
-        # メインページを解析
-        main_result = self.extract_hierarchy_from_page(soup, [], start_url)
+        # メインページの解析結果（以降のマージで書き換わるため、ページ索引用の結果とは別に持つ）
+        main_result = {key: value.copy() for key, value in main_page.items()}
         
         logger.info(f"メインページ解析完了:")
         logger.info(f"  取得したアイテム: {len(main_result['items'])}")
         logger.info(f"  除外したセクション: {len(main_result['excluded_sections'])}")
         
-        # 追跡可能なアイテムを順次処理（再帰的）
-        processed_count = 0
+        # 追跡可能なアイテムをフロンティア（BFS）で処理
+        self.visited_urls.add(self.normalize_url(start_url))
         followable_items = [item for item in main_result['items'].values() if item.get('should_follow', False)]
         total_followable = len(followable_items)
         
@@ -664,67 +1024,380 @@ class ScalableHierarchyScraper:
             range_info.append(f"patterns={len(self.config.group_name_patterns)}")
         
         range_str = f" (制限: {', '.join(range_info)})" if range_info else ""
-        logger.info(f"\nアイテム処理開始: {total_followable}個{range_str}")
+        logger.info(f"\nアイテム処理開始: {total_followable}個{range_str}, 最大追跡深度={self.config.max_depth}")
         
-        for i, item in enumerate(followable_items):
-            logger.info(f"\n進捗 [{i+1}/{total_followable}]: {item['name']}")
-            
-            # 範囲制限チェック（pathを含めて階層的に判定）
-            should_process, skip_reason = self.should_process_group(
-                item['name'], i, processed_count, item_path=item.get('path', [])
+        targets = self._select_crawl_targets(followable_items)
+        
+        if self.journal:
+            self.journal.start(
+                start_url, main_result, list(self.pending_targets.values()),
+                self.visited_urls, self.scheduled_count
             )
-            if not should_process:
-                logger.info(f"  スキップ（{skip_reason}）: {item['name']}")
-                continue
-            
-            if not item.get('url'):
-                logger.warning(f"  スキップ（URL無効）: {item['name']}")
-                continue
-            
-            # want.md新仕様: wiki→post URL変換
-            original_url = item['url']
-            if original_url.startswith('/'):
-                full_url = f"https://danbooru.donmai.us{original_url}"
-            else:
-                full_url = original_url
-            
-            # wiki形式のURLをpost形式に変換
-            full_url = self.convert_wiki_to_post_url(full_url)
-            
-            if full_url in self.visited_urls:
-                logger.info(f"  スキップ（既訪問）: {item['name']}")
-                continue
-            
-            self.visited_urls.add(full_url)
-            self.rate_limiter.wait_if_needed()
+        
+        processed_count = self._run_crawl(main_result, targets)
+        
+        logger.info(f"\n処理完了: {processed_count}/{len(self.visited_urls) - 1} ページを処理（トップレベル{total_followable}個）")
+        if self.config.incremental:
+            logger.info(f"差分更新: 再利用{self.reused_pages}ページ, 再パース{len(self.changed_pages)}ページ")
+        if self.page_index is not None and self.page_records:
+            self.page_index.save(self.page_records)
+        return main_result
+    
+    def _run_crawl(self, main_result: Dict, targets: List[Tuple[Dict, str, int]]) -> int:
+        """フロンティアを処理（中断・例外時も最後にチェックポイントを残す）"""
+        try:
+            if self.config.concurrency > 1:
+                return self._crawl_concurrent(main_result, targets)
+            return self._crawl_sequential(main_result, targets)
+        finally:
+            if self.journal:
+                self._write_checkpoint()
+                logger.info(f"チェックポイント保存: 残り{len(self.pending_targets)}ページ, 失敗{len(self.failed_targets)}ページ")
+    
+    def _restore_from_journal(self, state: ResumeState) -> Tuple[Dict, List[Tuple[Dict, str, int]]]:
+        """ジャーナルの状態から結果とフロンティアを復元"""
+        main_result = state.main_result
+        for page_result in state.page_results:
+            self._merge_results(main_result, page_result)
+        
+        self.visited_urls = state.visited_urls
+        self.scheduled_count = state.scheduled_count
+        self.pending_targets = dict(state.pending)
+        
+        # 深度の浅い順に並べ、BFS順を保つ
+        targets = [(item, url, depth) for _, item, url, depth in sorted(state.pending.values(), key=lambda t: t[3])]
+        logger.info(f"再開: {state.start_url} から、復元済みアイテム{len(main_result['items'])}件, 残りページ{len(targets)}件")
+        return main_result, targets
+    
+    def _write_checkpoint(self):
+        self.journal.checkpoint(
+            list(self.pending_targets.values()), self.visited_urls,
+            self.scheduled_count, list(self.failed_targets.values())
+        )
+    
+    def _finish_page(self, item: Dict, url: str, depth: int, item_result: Optional[Dict],
+                     discovered: List[Tuple[Dict, str, int]]):
+        """ページ処理完了をフロンティア状態とジャーナルに反映"""
+        key = self.normalize_url(url)
+        target = self.pending_targets.pop(key, (key, item, url, depth))
+        if item_result is None:
+            self.failed_targets[key] = target
+        else:
+            self.failed_targets.pop(key, None)
+        
+        if self.journal:
+            discovered_targets = [(self.normalize_url(d_url), d_item, d_url, d_depth) for d_item, d_url, d_depth in discovered]
+            self.journal.record_page(target, item_result, discovered_targets)
+            if self.journal.should_checkpoint():
+                self._write_checkpoint()
+    
+    def _resolve_item_url(self, item: Dict) -> str:
+        """アイテムのURLを絶対URL化し、want.md新仕様に従いwiki→post URLに変換"""
+        original_url = item['url']
+        if original_url.startswith('/'):
+            full_url = f"https://danbooru.donmai.us{original_url}"
+        else:
+            full_url = original_url
+        
+        # wiki形式のURLをpost形式に変換
+        return self.convert_wiki_to_post_url(full_url)
+    
+    def _schedule_target(self, item: Dict, index: int, depth: int) -> Optional[str]:
+        """範囲指定・URL・既訪問チェックを通過したら取得URLを返し、訪問済みとして予約する"""
+        should_process, skip_reason = self.should_process_group(
+            item['name'], index, self.scheduled_count, item_path=item.get('path', []), nested=depth > 1
+        )
+        if not should_process:
+            logger.info(f"  スキップ（{skip_reason}）: {item['name']}")
+            return None
+        
+        if not item.get('url'):
+            logger.warning(f"  スキップ（URL無効）: {item['name']}")
+            return None
+        
+        full_url = self._resolve_item_url(item)
+        url_key = self.normalize_url(full_url)
+        if url_key in self.visited_urls:
+            logger.debug(f"  スキップ（既訪問）: {item['name']}")
+            return None
+        
+        self.visited_urls.add(url_key)
+        self.scheduled_count += 1
+        self.pending_targets[url_key] = (url_key, item, full_url, depth)
+        return full_url
+    
+    def _select_crawl_targets(self, followable_items: List[Dict]) -> List[Tuple[Dict, str, int]]:
+        """メインページの追跡対象を確定（max_groupsは取得を予約した数で判定する）"""
+        targets = []
+        for i, item in enumerate(followable_items):
+            full_url = self._schedule_target(item, i, depth=1)
+            if full_url:
+                targets.append((item, full_url, 1))
+        return targets
+    
+    def _discover_nested_targets(self, item_result: Dict, depth: int) -> List[Tuple[Dict, str, int]]:
+        """取得したページ内の追跡可能アイテムから次の深度の取得対象を作る"""
+        nested_followable = [nested_item for nested_item in item_result['items'].values() if nested_item.get('should_follow', False)]
+        if not nested_followable:
+            return []
+        
+        if depth >= self.config.max_depth:
+            logger.warning(f"  最大追跡深度 {self.config.max_depth} に到達、ネストしたアイテム {len(nested_followable)}個は追跡しません")
+            return []
+        
+        targets = []
+        for nested_item in nested_followable:
+            full_url = self._schedule_target(nested_item, 0, depth=depth + 1)
+            if full_url:
+                targets.append((nested_item, full_url, depth + 1))
+        
+        if targets:
+            logger.info(f"  ネストしたアイテム {len(targets)}個をフロンティアに追加（深度{depth + 1}）")
+        return targets
+    
+    def _crawl_sequential(self, main_result: Dict, targets: List[Tuple[Dict, str, int]]) -> int:
+        """フロンティアを先頭から1件ずつ取得（BFS）"""
+        frontier = deque(targets)
+        processed_count = 0
+        page_count = 0
+        
+        while frontier:
+            self.metrics.record_queue_depth(len(frontier))
+            item, full_url, depth = frontier.popleft()
+            page_count += 1
+            logger.info(f"\n進捗 [{page_count}/{page_count + len(frontier)}] 深度{depth}: {item['name']}")
             
-            item_soup = self.webfetch_with_parse(
-                full_url, 
-                f"Extract detailed structure for {item['name']} excluding see also sections"
-            )
+            item_result = self.fetch_page_result(full_url, item['path'], depth, item)
             
-            if item_soup:
-                item_result = self.extract_hierarchy_from_page(
-                    item_soup, item['path'], full_url
-                )
-                
+            if item_result:
                 # 結果をマージ
                 self._merge_results(main_result, item_result)
                 processed_count += 1
                 
                 logger.info(f"  処理完了: +{len(item_result['items'])} items")
                 
-                # さらにネストしたアイテムを処理（再帰）
-                nested_followable = [nested_item for nested_item in item_result['items'].values() if nested_item.get('should_follow', False)]
-                if nested_followable:
-                    logger.info(f"  ネストしたアイテム {len(nested_followable)}個を発見")
-                    # 再帰処理は必要に応じて実装
+                # さらにネストしたtag groupをフロンティアへ
+                nested_targets = self._discover_nested_targets(item_result, depth)
+                frontier.extend(nested_targets)
+                self._finish_page(item, full_url, depth, item_result, nested_targets)
             else:
                 logger.warning(f"  取得失敗: {item['name']}")
+                self._finish_page(item, full_url, depth, None, [])
+        
+        return processed_count
+    
+    def _crawl_concurrent(self, main_result: Dict, targets: List[Tuple[Dict, str, int]]) -> int:
+        """ワーカープールで並行取得し、結果を発見順にマージ"""
+        logger.info(
+            f"並行取得モード: 初期{len(targets)}件, ワーカー{self.config.concurrency}, "
+            f"{self.host_limiter.rate:.2f}req/s/host, burst={self.host_limiter.burst}"
+        )
+        
+        page_results = self.fetcher.run(self._crawl_concurrent_async(targets))
         
-        logger.info(f"\n処理完了: {processed_count}/{total_followable} アイテムを処理")
+        # 優先度が同じ場合の採用結果が完了順に依存しないよう、発見順にマージする
+        for seq in sorted(page_results):
+            self._merge_results(main_result, page_results[seq])
+        return len(page_results)
+    
+    async def _crawl_concurrent_async(self, targets: List[Tuple[Dict, str, int]]) -> Dict[int, Dict]:
+        """共有キュー（フロンティア）から取得対象を取り出すワーカー群を実行"""
+        queue: asyncio.Queue = asyncio.Queue()
+        next_seq = 0
+        for item, url, depth in targets:
+            queue.put_nowait((next_seq, item, url, depth))
+            next_seq += 1
+        
+        page_results: Dict[int, Dict] = {}
+        
+        async def worker():
+            nonlocal next_seq
+            while True:
+                seq, item, url, depth = await queue.get()
+                self.metrics.record_queue_depth(queue.qsize() + 1)
+                try:
+                    logger.info(f"\n進捗 [{seq+1}/{next_seq}] 深度{depth}: {item['name']} ({url})")
+                    response = await self._fetch_async(url)
+                    # パースはCPU処理のためスレッドに逃がし、他ワーカーの通信を止めない。
+                    # スクレイパーの状態への反映はイベントループ側で行う
+                    parsed = await asyncio.to_thread(self._parse_page, url, response, item['path'])
+                    item_result = self._record_page(url, depth, item['path'], *parsed)
+                    if item_result is None:
+                        logger.warning(f"  取得失敗: {item['name']}")
+                        self._finish_page(item, url, depth, None, [])
+                    else:
+                        self._save_snapshot(url, response, depth, item)
+                        page_results[seq] = item_result
+                        logger.info(f"  処理完了: {item['name']} +{len(item_result['items'])} items")
+                        # task_done前に追加し、queue.join()が先に終わらないようにする
+                        nested_targets = self._discover_nested_targets(item_result, depth)
+                        for nested_item, nested_url, nested_depth in nested_targets:
+                            queue.put_nowait((next_seq, nested_item, nested_url, nested_depth))
+                            next_seq += 1
+                        self._finish_page(item, url, depth, item_result, nested_targets)
+                except Exception as e:
+                    logger.error(f"  ❌ 予期しないエラー: {item['name']}: {e}")
+                finally:
+                    queue.task_done()
+        
+        workers = [asyncio.create_task(worker()) for _ in range(self.config.concurrency)]
+        await queue.join()
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        return page_results
+    
+    def _followable_paths(self, page_result: Dict) -> Dict[str, List[str]]:
+        """ページ結果内の追跡可能アイテムについて 正規化URL → アイテムパス を返す"""
+        paths = {}
+        for item in page_result['items'].values():
+            if item.get('should_follow', False) and item.get('url'):
+                paths.setdefault(self.normalize_url(self._resolve_item_url(item)), item['path'])
+        return paths
+    
+    def rebuild_from_snapshots(self, workers: int = None) -> Dict:
+        """スナップショットから階層を再構築（ネットワーク不使用）
+        
+        深度ごとに並列パースし、各ページの基準パスは一つ浅い深度の解析結果から
+        現在のルールで引き直す（分類ルール変更時も再クロール不要）
+        """
+        if self.snapshots is None:
+            raise ValueError("スナップショット再構築にはsnapshot_dirの指定が必要です")
+        
+        entries = self.snapshots.load_manifest()
+        main_entries = [entry for entry in entries if entry.depth == 0]
+        if not main_entries:
+            logger.error(f"メインページのスナップショットがありません: {self.snapshots.manifest_path}")
+            return {'headings': [], 'items': {}, 'excluded_sections': [], 'ignored_elements': []}
+        
+        main_entry = main_entries[-1]
+        soup, _ = parse_wiki_page(self.snapshots.read(main_entry), self.parser_backend)
+        main_result = self.extract_hierarchy_from_page(soup, [], main_entry.url)
+        path_by_key = self._followable_paths(main_result)
+        
+        levels: Dict[int, List] = {}
+        for entry in entries:
+            if entry.depth > 0:
+                levels.setdefault(entry.depth, []).append(entry)
+        
+        workers = workers or os.cpu_count() or 1
+        logger.info(f"スナップショット再構築: {len(entries)}ページ, 最大深度{max(levels, default=0)}, {workers}プロセス")
+        
+        pool = self._create_parse_pool(workers)
+        processed_count = 0
+        unreachable = 0
+        try:
+            for depth in sorted(levels):
+                tasks = []
+                for entry in levels[depth]:
+                    base_path = path_by_key.get(entry.key)
+                    if base_path is None:
+                        # 現在のルールでは辿れないページ（分類・除外ルール変更など）
+                        unreachable += 1
+                        logger.debug(f"  到達不能のためスキップ: {entry.name} ({entry.url})")
+                        continue
+                    tasks.append((str(self.snapshots.root / entry.file), entry.codec, base_path, entry.url))
+                
+                if pool is not None:
+                    page_results = list(pool.map(_parse_snapshot_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+                else:
+                    page_results = [self._parse_snapshot(*task) for task in tasks]
+                
+                for page_result in page_results:
+                    self._merge_results(main_result, page_result)
+                    for key, path in self._followable_paths(page_result).items():
+                        path_by_key.setdefault(key, path)
+                processed_count += len(page_results)
+                logger.info(f"  深度{depth}: {len(page_results)}ページ再パース完了")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        
+        logger.info(f"スナップショット再構築完了: {processed_count}ページ, 到達不能{unreachable}ページ, {len(main_result['items'])} items")
         return main_result
     
+    def _parse_snapshot(self, file_path: str, codec: str, base_path: List[str], url: str) -> Dict:
+        soup, _ = parse_wiki_page(read_snapshot(file_path, codec), self.parser_backend)
+        return self.extract_hierarchy_from_page(soup, base_path, url)
+    
+    def _create_parse_pool(self, workers: int) -> Optional[ProcessPoolExecutor]:
+        """再パース用プロセスプール（ワーカーはネットワーク・キャッシュ・ジャーナルを使わない）"""
+        if workers <= 1:
+            return None
+        worker_config = replace(
+            self.config, cache_dir=None, offline=False, journal_path=None, resume=False,
+            snapshot_dir=None, fetch_backend='curl', parser_backend=self.parser_backend
+        )
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_parse_worker, initargs=(worker_config,))
+    
+    def wiki_title_key(self, title: str) -> str:
+        """wikiタイトルをクロール時と同じ正規化URL（posts?tags=...）に変換"""
+        wiki_url = f"https://danbooru.donmai.us{wiki_page_href(title)}"
+        return self.normalize_url(self.convert_wiki_to_post_url(wiki_url))
+    
+    def rebuild_from_wiki_dump(self, wiki_path: str, workers: int = None) -> Dict:
+        """wikiダンプのDText本文から階層を構築（ネットワーク不使用）
+        
+        tag groupページのDTextをHTML化して既存の抽出処理に通す。範囲指定・追跡深度は
+        クロールと同じ判定を使い、フロンティアを深度ごとにまとめて並列パースする
+        """
+        default_result = {'headings': [], 'items': {}, 'excluded_sections': [], 'ignored_elements': []}
+        pages = {self.wiki_title_key(title): body for title, body in load_hierarchy_pages(wiki_path).items()}
+        root_key = self.wiki_title_key(ROOT_WIKI_TITLE)
+        if root_key not in pages:
+            logger.error(f"ダンプに{ROOT_WIKI_TITLE}ページがありません: {wiki_path}")
+            return default_result
+        
+        start_url = "https://danbooru.donmai.us/posts?tags=tag_groups"
+        main_result = self._parse_dtext(pages[root_key], [], start_url)
+        self.visited_urls.add(root_key)
+        followable_items = [item for item in main_result['items'].values() if item.get('should_follow', False)]
+        targets = self._select_crawl_targets(followable_items)
+        
+        workers = workers or os.cpu_count() or 1
+        logger.info(f"wikiダンプから再構築: 階層ページ{len(pages)}件, 初期{len(targets)}件, {workers}プロセス")
+        
+        pool = self._create_parse_pool(workers)
+        processed_count = 0
+        missing = []
+        try:
+            while targets:
+                scheduled = []
+                tasks = []
+                for item, url, depth in targets:
+                    key = self.normalize_url(url)
+                    self.pending_targets.pop(key, None)
+                    if key not in pages:
+                        missing.append(item['name'])
+                        continue
+                    scheduled.append((item, depth))
+                    tasks.append((pages[key], item['path'], url))
+                
+                if pool is not None:
+                    page_results = list(pool.map(_parse_dtext_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+                else:
+                    page_results = [self._parse_dtext(*task) for task in tasks]
+                
+                # クロールのBFSと同じ順序でマージ・次深度の予約を行う
+                targets = []
+                for (item, depth), page_result in zip(scheduled, page_results):
+                    self._merge_results(main_result, page_result)
+                    targets.extend(self._discover_nested_targets(page_result, depth))
+                processed_count += len(page_results)
+                logger.info(f"  深度{scheduled[0][1] if scheduled else '-'}: {len(page_results)}ページ解析完了")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        
+        if missing:
+            logger.warning(f"ダンプに存在しないページ: {len(missing)}件 (例: {missing[:5]})")
+        logger.info(f"wikiダンプ再構築完了: {processed_count}ページ, {len(main_result['items'])} items")
+        return main_result
+    
+    def _parse_dtext(self, body: str, base_path: List[str], url: str) -> Dict:
+        soup, _ = parse_wiki_page(dtext_to_html(body), self.parser_backend)
+        return self.extract_hierarchy_from_page(soup, base_path, url)
+    
     def _merge_results(self, main_result: Dict, group_result: Dict):
         """結果をマージ"""
         # 統合されたitemsをマージ
@@ -735,195 +1408,166 @@ class ScalableHierarchyScraper:
         main_result['ignored_elements'].extend(group_result['ignored_elements'])
     
     def normalize_data(self, hierarchy_result: Dict) -> Dict:
-        """データ正規化処理 - 統合されたitems構造で処理"""
+        """データ正規化処理 - 統合されたitems構造で処理
+        
+        itemsを1回だけ走査して小文字化・重複解決を行い、同時に"tag group:"で始まる名前を
+        索引に集めて統合処理に渡す。ログは処理中は列指向（列名 → 値のリスト）で持ち、
+        返す時に従来どおりレコードのリストに戻す
+        """
         logger.info("\nデータ正規化処理開始...")
         
-        normalized_result = {
-            'headings': [],
-            'items': {},
-            'excluded_sections': [],
-            'ignored_elements': [],
-            'normalization_log': [],
-            'removed_duplicates': []
+        normalization_log = {'action': [], 'original': [], 'normalized': []}
+        removed_duplicates = {
+            'duplicate': [], 'kept_classification': [], 'kept_path': [],
+            'discarded_classification': [], 'discarded_path': []
         }
         
+        def log_lowercase(original: str, normalized: str):
+            normalization_log['action'].append('lowercase')
+            normalization_log['original'].append(original)
+            normalization_log['normalized'].append(normalized)
+        
         # headingsの正規化
+        headings = []
         for heading in hierarchy_result.get('headings', []):
-            normalized_heading = {
-                'level': heading['level'],
-                'text': heading['text'].lower()
-            }
-            if normalized_heading['text'] != heading['text']:
-                normalized_result['normalization_log'].append({
-                    'action': 'lowercase',
-                    'original': heading['text'],
-                    'normalized': normalized_heading['text']
-                })
-            normalized_result['headings'].append(normalized_heading)
+            text = heading['text'].lower()
+            if text != heading['text']:
+                log_lowercase(heading['text'], text)
+            headings.append({'level': heading['level'], 'text': text})
         
         # itemsの正規化（重複削除を含む）
-        seen_items = {}
+        items: Dict[str, Dict] = {}
+        priorities: Dict[str, int] = {}      # 正規化名 → 採用中アイテムの優先度
+        tag_group_names: List[str] = []      # "tag group:"で始まる正規化名（統合処理の索引）
         for name, item in hierarchy_result.get('items', {}).items():
             normalized_name = name.lower()
             normalized_path = [segment.lower() for segment in item['path']]
+            priority = self._classify_priority(item['classification'])
             
-            # 名前ベースの重複チェック
-            if normalized_name in seen_items:
-                # 重複の場合、優先度で解決
-                existing_item = seen_items[normalized_name]
-                new_priority = self._classify_priority(item['classification'])
-                existing_priority = self._classify_priority(existing_item['classification'])
-                
-                # 優先度比較（高い方を採用、同じなら短いパスを採用）
-                if (new_priority > existing_priority or 
-                    (new_priority == existing_priority and len(normalized_path) < len(existing_item['path']))):
-                    # 新しいアイテムの方が優先される場合
-                    normalized_item = {
-                        'name': normalized_name,
-                        'url': item.get('url'),
-                        'path': normalized_path,
-                        'parent': item.get('parent', '').lower() if item.get('parent') else None,
-                        'depth': item.get('depth', len(normalized_path)),  # 階層深度を保持
-                        'has_nested_list': item.get('has_nested_list', False),
-                        'classification': item.get('classification'),
-                        'should_follow': item.get('should_follow', False)
-                    }
-                    normalized_result['items'][normalized_name] = normalized_item
-                    seen_items[normalized_name] = normalized_item
+            existing = items.get(normalized_name)
+            if existing is not None:
+                # 重複の場合、優先度で解決（高い方を採用、同じなら短いパスを採用）
+                existing_priority = priorities[normalized_name]
+                if (priority > existing_priority or
+                    (priority == existing_priority and len(normalized_path) < len(existing['path']))):
+                    kept = self._normalized_item(normalized_name, normalized_path, item)
+                    items[normalized_name] = kept
+                    priorities[normalized_name] = priority
+                    discarded_classification, discarded_path = existing['classification'], existing['path']
+                else:
+                    kept = existing
+                    discarded_classification, discarded_path = item['classification'], normalized_path
                 
-                normalized_result['removed_duplicates'].append({
-                    'duplicate': normalized_name,
-                    'kept_classification': normalized_result['items'][normalized_name]['classification'],
-                    'kept_path': ' → '.join(normalized_result['items'][normalized_name]['path']),
-                    'discarded_classification': item['classification'],
-                    'discarded_path': ' → '.join(normalized_path)
-                })
+                removed_duplicates['duplicate'].append(normalized_name)
+                removed_duplicates['kept_classification'].append(kept['classification'])
+                removed_duplicates['kept_path'].append(' → '.join(kept['path']))
+                removed_duplicates['discarded_classification'].append(discarded_classification)
+                removed_duplicates['discarded_path'].append(' → '.join(discarded_path))
                 continue
             
-            normalized_item = {
-                'name': normalized_name,
-                'url': item.get('url'),
-                'path': normalized_path,
-                'parent': item.get('parent', '').lower() if item.get('parent') else None,
-                'depth': item.get('depth', len(normalized_path)),  # 階層深度を保持
-                'has_nested_list': item.get('has_nested_list', False),
-                'classification': item.get('classification'),
-                'should_follow': item.get('should_follow', False)
-            }
-            
             if normalized_name != name:
-                normalized_result['normalization_log'].append({
-                    'action': 'lowercase',
-                    'original': name,
-                    'normalized': normalized_name
-                })
-            
-            normalized_result['items'][normalized_name] = normalized_item
-            seen_items[normalized_name] = normalized_item
+                log_lowercase(name, normalized_name)
+            items[normalized_name] = self._normalized_item(normalized_name, normalized_path, item)
+            priorities[normalized_name] = priority
+            if normalized_name.startswith('tag group:'):
+                tag_group_names.append(normalized_name)
         
         # excluded_sectionsとignored_elementsの正規化
-        for section in hierarchy_result.get('excluded_sections', []):
-            normalized_section = section.lower()
-            if normalized_section != section:
-                normalized_result['normalization_log'].append({
-                    'action': 'lowercase',
-                    'original': section,
-                    'normalized': normalized_section
-                })
-            normalized_result['excluded_sections'].append(normalized_section)
-        
-        for element in hierarchy_result.get('ignored_elements', []):
-            normalized_element = element.lower()
-            if normalized_element != element:
-                normalized_result['normalization_log'].append({
-                    'action': 'lowercase',
-                    'original': element,
-                    'normalized': normalized_element
-                })
-            normalized_result['ignored_elements'].append(normalized_element)
+        normalized_sections = {}
+        for key in ('excluded_sections', 'ignored_elements'):
+            normalized_sections[key] = []
+            for value in hierarchy_result.get(key, []):
+                normalized_value = value.lower()
+                if normalized_value != value:
+                    log_lowercase(value, normalized_value)
+                normalized_sections[key].append(normalized_value)
         
         # 統合処理（breasts + tag group:breasts → breasts）
-        consolidated_items = self._consolidate_redundant_items(normalized_result['items'])
-        normalized_result['items'] = consolidated_items
-        
-        # 重複削除チェック
-        seen_paths = {}
+        normalized_result = {
+            'headings': headings,
+            'items': self._consolidate_redundant_items(items, tag_group_names),
+            'excluded_sections': normalized_sections['excluded_sections'],
+            'ignored_elements': normalized_sections['ignored_elements'],
+            'normalization_log': column_records(normalization_log),
+            'removed_duplicates': column_records(removed_duplicates)
+        }
         
         logger.info(f"  正規化ログ: {len(normalized_result['normalization_log'])}件")
         logger.info(f"  重複削除: {len(normalized_result['removed_duplicates'])}件")
         
         return normalized_result
     
-    def _consolidate_redundant_items(self, items: Dict) -> Dict:
-        """冗長な項目の統合処理（breasts + tag group:breasts → breasts）"""
-        consolidated = {}
-        to_remove = []
+    def _normalized_item(self, normalized_name: str, normalized_path: List[str], item: Dict) -> Dict:
+        return {
+            'name': normalized_name,
+            'url': item.get('url'),
+            'path': normalized_path,
+            'parent': item['parent'].lower() if item.get('parent') else None,
+            'depth': item.get('depth', len(normalized_path)),  # 階層深度を保持
+            'has_nested_list': item.get('has_nested_list', False),
+            'classification': item.get('classification'),
+            'should_follow': item.get('should_follow', False)
+        }
+    
+    def _consolidate_redundant_items(self, items: Dict, tag_group_names: List[str] = None) -> Dict:
+        """冗長な項目の統合処理（breasts + tag group:breasts → breasts）
+        
+        tag_group_namesは"tag group:"で始まる名前の索引（省略時はitemsから作る）。
+        候補だけを見て削除対象をsetに集め、最後に1回だけ組み立て直す
+        """
+        if tag_group_names is None:
+            tag_group_names = [name for name in items if name.startswith('tag group:')]
+        
+        replacements = {}
+        to_remove = set()
         consolidation_log = []
         
-        for name, item in items.items():
-            # tag group:X パターンの検出
-            if name.startswith('tag group:'):
-                base_name_full = name.replace('tag group:', '').strip()
-                
-                # "X tags" → "X" の変換も試行
-                base_name_options = [base_name_full]
-                if base_name_full.endswith(' tags'):
-                    base_name_options.append(base_name_full.replace(' tags', ''))
-                
-                # 対応するベース項目が存在するかチェック
-                matching_base = None
-                for base_option in base_name_options:
-                    if base_option in items:
-                        matching_base = base_option
-                        break
-                
-                if matching_base:
-                    base_item = items[matching_base]
-                    tag_group_item = item
-                    
-                    # より汎用的な項目（ベース項目）を保持
-                    # ただし、より詳細な階層情報がある場合はそれを採用
-                    if len(base_item.get('path', [])) >= len(tag_group_item.get('path', [])):
-                        # ベース項目を保持、tag group項目を削除
-                        to_remove.append(name)
-                        consolidation_log.append({
-                            'action': 'consolidate',
-                            'kept': matching_base,
-                            'removed': name,
-                            'reason': 'base_item_preferred'
-                        })
-                    else:
-                        # tag group項目の方が詳細な階層を持つ場合、そちらを保持
-                        # ただし名前はベース名に変更
-                        consolidated[matching_base] = {
-                            **tag_group_item,
-                            'name': matching_base
-                        }
-                        to_remove.append(name)
-                        to_remove.append(matching_base)  # 元のベース項目も削除
-                        consolidation_log.append({
-                            'action': 'consolidate',
-                            'kept': matching_base,
-                            'removed': name,
-                            'reason': 'tag_group_more_detailed'
-                        })
-        
-        # 統合結果を適用
+        for name in tag_group_names:
+            tag_group_item = items[name]
+            base_name_full = name.replace('tag group:', '').strip()
+            
+            # "X tags" → "X" の変換も試行
+            base_name_options = [base_name_full]
+            if base_name_full.endswith(' tags'):
+                base_name_options.append(base_name_full.replace(' tags', ''))
+            
+            # 対応するベース項目が存在するかチェック
+            matching_base = next((option for option in base_name_options if option in items), None)
+            if matching_base is None:
+                continue
+            
+            # より汎用的な項目（ベース項目）を保持
+            # ただし、より詳細な階層情報がある場合はそれを採用
+            if len(items[matching_base].get('path', [])) >= len(tag_group_item.get('path', [])):
+                to_remove.add(name)
+                reason = 'base_item_preferred'
+            else:
+                # tag group項目の方が詳細な階層を持つ場合、そちらを保持（名前はベース名に変更）
+                replacements[matching_base] = {**tag_group_item, 'name': matching_base}
+                to_remove.add(name)
+                to_remove.add(matching_base)  # 元のベース項目も削除
+                reason = 'tag_group_more_detailed'
+            consolidation_log.append((name, matching_base, reason))
+        
+        if not consolidation_log:
+            return items
+        
+        # 統合結果を適用（置き換えた項目が先頭、残りは元の順序）
+        consolidated = replacements
         for name, item in items.items():
             if name not in to_remove:
                 consolidated[name] = item
         
-        # ログ出力
-        if consolidation_log:
-            logger.info(f"統合処理実行: {len(consolidation_log)}件")
-            for log_entry in consolidation_log:
-                logger.info(f"  統合: {log_entry['removed']} → {log_entry['kept']} ({log_entry['reason']})")
-            logger.info(f"統合前: {len(items)} items, 統合後: {len(consolidated)} items")
+        logger.info(f"統合処理実行: {len(consolidation_log)}件")
+        for removed, kept, reason in consolidation_log:
+            logger.info(f"  統合: {removed} → {kept} ({reason})")
+        logger.info(f"統合前: {len(items)} items, 統合後: {len(consolidated)} items")
         
         return consolidated
     
-    def run_scalable_scraping(self, start_url: str = None) -> Dict:
-        """スケーラブルスクレイピング実行"""
+    def run_scalable_scraping(self, start_url: str = None, from_snapshots: bool = False,
+                              wiki_dump: str = None) -> Dict:
+        """スケーラブルスクレイピング実行（from_snapshots=Trueならスナップショット、wiki_dump指定時はwikiダンプから構築）"""
         logger.info("=" * 70)
         logger.info("スケーラブル階層スクレイパー実行開始")
         logger.info("対象: Copyrights, artists, projects and mediaを除く全tag")
@@ -932,7 +1576,12 @@ class ScalableHierarchyScraper:
         start_time = time.time()
         
         # 階層構造取得
-        hierarchy_result = self.scrape_complete_hierarchy_scalable(start_url)
+        if wiki_dump:
+            hierarchy_result = self.rebuild_from_wiki_dump(wiki_dump, self.config.parse_workers)
+        elif from_snapshots:
+            hierarchy_result = self.rebuild_from_snapshots(self.config.parse_workers)
+        else:
+            hierarchy_result = self.scrape_complete_hierarchy_scalable(start_url)
         
         # データ正規化
         normalized_result = self.normalize_data(hierarchy_result)
@@ -946,9 +1595,12 @@ class ScalableHierarchyScraper:
             'total_followable_items': len([item for item in hierarchy_result.get('items', {}).values() if item.get('should_follow', False)]),
             'excluded_sections': len(set(hierarchy_result.get('excluded_sections', []))),
             'ignored_elements': len(set(hierarchy_result.get('ignored_elements', []))),
-            'normalization_changes': len(normalized_result.get('normalization_log', [])),
-            'removed_duplicates': len(normalized_result.get('removed_duplicates', []))
+            'normalization_changes': len(normalized_result['normalization_log']),
+            'removed_duplicates': len(normalized_result['removed_duplicates'])
         }
+        if self.config.incremental:
+            final_stats['reused_pages'] = self.reused_pages
+            final_stats['reparsed_pages'] = len(self.changed_pages)
         
         # 包括的結果
         comprehensive_result = {
@@ -956,12 +1608,21 @@ class ScalableHierarchyScraper:
                 'scraper_version': 'scalable_v1.0',
                 'target_scope': 'all_tags_except_copyrights_media',
                 'execution_time': execution_time,
+                'source': 'wiki_dump' if wiki_dump else ('snapshots' if from_snapshots else 'web'),
                 'config': {
                     'exclude_sections': self.config.exclude_sections,
                     'ignore_elements': self.config.ignore_elements,
                     'rate_limit': self.config.rate_limit,
+                    'fetch_backend': self.fetcher.name,
+                    'parser_backend': self.parser_backend,
+                    'concurrency': self.config.concurrency,
+                    'requests_per_second': self.host_limiter.rate,
+                    'burst': self.host_limiter.burst,
+                    'adaptive_rate': self.config.adaptive_rate,
+                    'max_retries': self.config.max_retries,
                     'target_groups': self.config.target_groups
-                }
+                },
+                'metrics': self.metrics.summary()
             },
             'raw_hierarchy_data': hierarchy_result,
             'normalized_data': normalized_result,
@@ -984,8 +1645,32 @@ class ScalableHierarchyScraper:
         logger.info(f"正規化変更数: {stats['normalization_changes']}")
         logger.info(f"重複削除数: {stats['removed_duplicates']}")
         
+        metrics = result['metadata']['metrics']
+        if metrics['requests'] or metrics['parse_seconds']['count']:
+            hit_rate = metrics['cache']['hit_rate']
+            logger.info(
+                f"📈 リクエスト{metrics['requests']}件 (p50 {metrics['request_seconds']['p50'] or 0:.2f}秒, "
+                f"p90 {metrics['request_seconds']['p90'] or 0:.2f}秒), 再試行{metrics['retries']}件, "
+                f"レート制限待機{metrics['rate_limit']['sleep_seconds']:.1f}秒, "
+                f"パース合計{metrics['parse_seconds']['sum']:.2f}秒, "
+                f"キャッシュ再利用率{'-' if hit_rate is None else f'{hit_rate:.0%}'}"
+            )
+        
         logger.info(f"\n✅ 全tag対応スケーラブルシステム動作確認完了")
 
+_PARSE_WORKER: Optional[ScalableHierarchyScraper] = None
+
+def _init_parse_worker(config: ScrapingConfig):
+    """スナップショット/wikiダンプ再パース用プロセスの初期化"""
+    global _PARSE_WORKER
+    _PARSE_WORKER = ScalableHierarchyScraper(config)
+
+def _parse_snapshot_task(task: Tuple[str, str, List[str], str]) -> Dict:
+    return _PARSE_WORKER._parse_snapshot(*task)
+
+def _parse_dtext_task(task: Tuple[str, List[str], str]) -> Dict:
+    return _PARSE_WORKER._parse_dtext(*task)
+
 def main():
     """メイン実行"""
     import argparse
@@ -996,6 +1681,34 @@ def main():
     parser.add_argument('--max-groups', type=int, help='処理するグループ数の上限')
     parser.add_argument('--skip-first-n', type=int, default=0, help='最初のN個をスキップ')
     parser.add_argument('--rate-limit', type=float, default=1.0, help='レート制限（秒）')
+    parser.add_argument('--fetch-backend', choices=FETCH_BACKENDS, default='auto', help='取得バックエンド（auto: aiohttp優先、なければcurl、replay: 記録済みコーパスから取得）')
+    parser.add_argument('--replay-dir', help='replayバックエンドのコーパス（--fetch-only --snapshot-dirで記録したディレクトリ）')
+    parser.add_argument('--max-connections', type=int, default=8, help='コネクションプール上限')
+    parser.add_argument('--parser-backend', choices=PARSER_BACKENDS, default='auto', help='HTMLパーサー（auto: selectolax > lxml > html.parser）')
+    parser.add_argument('--concurrency', type=int, default=1, help='並行取得ワーカー数（1なら逐次処理）')
+    parser.add_argument('--requests-per-second', type=float, help='ホスト単位のリクエスト/秒（省略時は1/rate-limit）')
+    parser.add_argument('--burst', type=int, default=1, help='トークンバケットのバースト許容数')
+    parser.add_argument('--max-retries', type=int, default=4, help='429/5xx/タイムアウト時の再試行回数')
+    parser.add_argument('--no-adaptive-rate', action='store_true', help='429時のレート自動調整を無効化')
+    parser.add_argument('--cache-dir', default='tmp/http_cache', help='レスポンスキャッシュのディレクトリ')
+    parser.add_argument('--no-cache', action='store_true', help='レスポンスキャッシュを使用しない')
+    parser.add_argument('--cache-ttl', type=float, default=86400.0, help='再検証せずにキャッシュを使う期間（秒）')
+    parser.add_argument('--offline', action='store_true', help='キャッシュのみから取得（ネットワーク不使用）')
+    parser.add_argument('--journal', default='tmp/scalable_scraping_journal.jsonl', help='チェックポイント用ジャーナルのパス')
+    parser.add_argument('--checkpoint-interval', type=int, default=20, help='チェックポイントを書くページ間隔')
+    parser.add_argument('--resume', action='store_true', help='ジャーナルの最終チェックポイントから再開')
+    parser.add_argument('--snapshot-dir', default='tmp/snapshots', help='生HTMLスナップショットの保存先')
+    parser.add_argument('--no-snapshots', action='store_true', help='スナップショットを保存しない')
+    parser.add_argument('--fetch-only', action='store_true', help='取得とスナップショット保存のみ行い、結果JSONは書かない')
+    parser.add_argument('--parse-snapshots', action='store_true', help='ネットワークを使わずスナップショットから結果を再構築')
+    parser.add_argument('--parse-workers', type=int, help='再構築時のプロセス数（省略時はCPU数）')
+    parser.add_argument('--page-index', default='tmp/scalable_scraping_pages.jsonl', help='ページ単位の抽出結果（差分更新用）の保存先')
+    parser.add_argument('--incremental', action='store_true', help='前回結果との差分更新（全ページを再検証し、変更ページのみ再パース・差分を出力）')
+    parser.add_argument('--diff-output', default='tmp/scalable_scraping_diff.json', help='差分更新時の差分出力先')
+    parser.add_argument('--output-format', choices=OUTPUT_FORMATS, default='json',
+                        help='結果の保存形式（json: 従来の単一JSON、jsonl/arrow: 表ごとのファイル + メタデータJSON）')
+    parser.add_argument('--metrics-output', help='計測値をPrometheusのテキスト形式で書き出すパス（textfile collector用）')
+    parser.add_argument('--wiki-dump', nargs='?', const=WIKI_DUMP_PATH, help=f'ネットワークを使わずwikiダンプから構築（省略時: {WIKI_DUMP_PATH}）')
     
     args = parser.parse_args()
     
@@ -1005,6 +1718,26 @@ def main():
         max_groups=args.max_groups,
         skip_first_n=args.skip_first_n,
         rate_limit=args.rate_limit,
+        fetch_backend=args.fetch_backend,
+        replay_dir=args.replay_dir,
+        max_connections=args.max_connections,
+        parser_backend=args.parser_backend,
+        concurrency=args.concurrency,
+        requests_per_second=args.requests_per_second,
+        burst=args.burst,
+        max_retries=args.max_retries,
+        adaptive_rate=not args.no_adaptive_rate,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        # 差分更新では全ページを条件付きリクエストで再検証する
+        cache_ttl=0.0 if args.incremental else args.cache_ttl,
+        offline=args.offline,
+        journal_path=args.journal,
+        checkpoint_interval=args.checkpoint_interval,
+        resume=args.resume,
+        snapshot_dir=None if args.no_snapshots else args.snapshot_dir,
+        parse_workers=args.parse_workers,
+        page_index_path=args.page_index,
+        incremental=args.incremental,
         exclude_sections=[
             "Copyrights, artists, projects and media", 
             "see also"
@@ -1013,17 +1746,46 @@ def main():
         max_depth=10
     )
     
+    output_base = 'tmp/scalable_scraping_result'
+    previous_items = load_previous_items(output_base) if args.incremental else None
+    if args.incremental and previous_items is None:
+        logger.warning(f"前回の結果がありません: {output_base} - 差分は出力しません")
+    
     # スクレイパー実行
     scraper = ScalableHierarchyScraper(config)
-    result = scraper.run_scalable_scraping()
+    try:
+        if args.fetch_only:
+            scraper.scrape_complete_hierarchy_scalable()
+            logger.info(f"\n取得のみ完了: スナップショット {args.snapshot_dir}/manifest.jsonl")
+            return None
+        result = scraper.run_scalable_scraping(from_snapshots=args.parse_snapshots, wiki_dump=args.wiki_dump)
+    finally:
+        scraper.close()
+        if args.metrics_output:
+            scraper.metrics.write_prometheus(args.metrics_output)
+            logger.info(f"計測値を保存: {args.metrics_output}")
     
-    # 結果をJSONファイルに保存
-    output_file = 'tmp/scalable_scraping_result.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    # 結果を保存（jsonl/arrowはitems等を表ごとのファイルに書き出し、小さなメタデータJSONを添える）
+    if args.output_format == 'json':
+        output_file = f"{output_base}.json"
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    else:
+        output_file = save_result_tables(result, output_base, args.output_format)
     
     logger.info(f"\nスケーラブルスクレイピング結果を保存: {output_file}")
     
+    if previous_items is not None:
+        diff = diff_items(previous_items, result['raw_hierarchy_data']['items'])
+        diff['changed_pages'] = scraper.changed_pages
+        with open(args.diff_output, 'w', encoding='utf-8') as f:
+            json.dump(diff, f, ensure_ascii=False, indent=2)
+        summary = diff['summary']
+        logger.info(
+            f"差分を保存: {args.diff_output} (追加{summary['added']}, 削除{summary['removed']}, "
+            f"移動{summary['moved']}, 再分類{summary['reclassified']}, 変更ページ{len(scraper.changed_pages)})"
+        )
+    
     return result
 
 if __name__ == "__main__":
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+全投稿を対象にしたストリーミングサンプラー（一様・層別・重み付き）
+データセット全体をメモリに載せず、メモリマップしたArrowのバッチを順に流しながら標本を選ぶ
+
+1パス目はバッチごとに必要な列（抽出条件・層・重み）だけを読み、各行に乱数キーを割り当てて
+キーの小さい順にn件を保持する。層別では先に層の列だけを数えて層ごとの割り当て数を決め、
+各層で割り当て数までを保持する。保持するのはキー・行番号・層だけなので、メモリは標本の行数に
+比例し、層の数やタグ列のサイズにはよらない。最後に選ばれた行だけを取り出す。
+
+キーはseedから行の順に生成するので、同じseed・同じデータなら結果は同じ（バッチサイズにもよらない）。
+結果はキーの順に並ぶため、一様・重み付きでは先頭n件がそのままサイズnの標本になる:
+
+    table = open_arrow_dataset()
+    df = reservoir_sample(table, 100000, columns=['id', 'rating', 'general'], seed=42)
+"""
+
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+
+from arrow_dataset import ACTIVE_FILTER, SCAN_BATCH_SIZE, iter_slices, to_polars
+from chunk_store import month_expr
+
+logger = logging.getLogger(__name__)
+
+ROW_COLUMN = "_row"
+KEY_COLUMN = "_key"
+STRATUM_COLUMN = "_stratum"
+WEIGHT_COLUMN = "_weight"
+QUOTA_COLUMN = "_quota"
+THRESHOLD_COLUMN = "_threshold"
+
+ALLOCATIONS = ('proportional', 'equal')
+
+# 層別サンプリングでよく使う層
+STRATA = {
+    'rating': pl.col("rating"),
+    'month': month_expr(),
+}
+
+
+def iter_active_batches(table: pa.Table, expressions: Optional[Dict[str, pl.Expr]] = None,
+                        batch_size: int = SCAN_BATCH_SIZE) -> Iterator[pl.DataFrame]:
+    """アクティブな行の行番号と式の値をバッチごとに返す（抽出条件と式が参照する列だけを読む）"""
+    expressions = expressions or {}
+    needed = set(ACTIVE_FILTER.meta.root_names())
+    for expr in expressions.values():
+        needed.update(expr.meta.root_names())
+    columns = [name for name in table.column_names if name in needed]
+
+    for offset, _, batch in iter_slices(table, batch_size):
+        df = to_polars(batch, columns).with_row_index(ROW_COLUMN, offset=offset).filter(ACTIVE_FILTER)
+        yield df.select([pl.col(ROW_COLUMN)] + [expr.alias(name) for name, expr in expressions.items()])
+
+
+def _keys(rng: np.random.Generator, df: pl.DataFrame) -> pl.Series:
+    """小さいほど選ばれやすい乱数キー
+
+    重みがなければ一様乱数。重みwがあれば指数分布Exp(w)（-ln(1-u)/w）で、
+    キーの小さい順にn件を取るとEfraimidis-Spirakisの重み付き非復元抽出になる
+    """
+    u = rng.random(len(df))
+    if WEIGHT_COLUMN not in df.columns:
+        return pl.Series(KEY_COLUMN, u)
+    weights = df[WEIGHT_COLUMN].cast(pl.Float64).to_numpy()
+    if (weights < 0).any():
+        raise ValueError("重みに負の値があります")
+    with np.errstate(divide='ignore'):
+        return pl.Series(KEY_COLUMN, -np.log1p(-u) / weights)
+
+
+def _select_smallest(batches: Iterator[pl.DataFrame], n: int, seed: int) -> Tuple[Optional[pl.DataFrame], int]:
+    """キーの小さいn件と、見た行数を返す"""
+    rng = np.random.default_rng(seed)
+    selected: Optional[pl.DataFrame] = None
+    seen = 0
+
+    for batch in batches:
+        if batch.is_empty():
+            continue
+        seen += len(batch)
+        keyed = batch.with_columns(_keys(rng, batch)).drop(WEIGHT_COLUMN, strict=False)
+        # 既にn件あれば、その最大キー以上の行は入り得ない
+        if selected is not None and len(selected) >= n:
+            keyed = keyed.filter(pl.col(KEY_COLUMN) < selected[KEY_COLUMN].max())
+        merged = keyed if selected is None else pl.concat([selected, keyed])
+        selected = merged.bottom_k(n, by=KEY_COLUMN)
+
+    return selected, seen
+
+
+def _count_strata(batches: Iterator[pl.DataFrame]) -> Dict[Any, int]:
+    """層ごとの行数"""
+    counts: Dict[Any, int] = {}
+    for batch in batches:
+        for stratum, count in batch.group_by(STRATUM_COLUMN).len().iter_rows():
+            counts[stratum] = counts.get(stratum, 0) + count
+    return counts
+
+
+def _select_stratified(batches: Iterator[pl.DataFrame], quotas: Dict[Any, int], seed: int) -> Optional[pl.DataFrame]:
+    """層ごとにキーの小さいquotas[層]件を返す
+
+    バッチの行は層ごとのしきい値（満杯の層で保持中の最大キー）未満のものだけを候補に足し、
+    候補が割り当ての合計の2倍を超えたら層ごとに割り当て数へ切り詰めて、しきい値を更新する。
+    保持する行は割り当ての合計の2倍＋1バッチまでで、切り詰めの手間は候補1行あたり定数になる
+    """
+    rng = np.random.default_rng(seed)
+    capacity = sum(quotas.values())
+    limits: Optional[pl.DataFrame] = None
+    buffer: List[pl.DataFrame] = []
+    buffered = 0
+
+    def compact() -> pl.DataFrame:
+        nonlocal limits
+        kept = pl.concat(buffer).filter(pl.col(KEY_COLUMN).rank('ordinal').over(STRATUM_COLUMN) <= pl.col(QUOTA_COLUMN))
+        full = (
+            kept.group_by(STRATUM_COLUMN)
+            .agg(pl.len().alias('_kept'), pl.col(QUOTA_COLUMN).first(), pl.col(KEY_COLUMN).max().alias('_max'))
+            .filter(pl.col('_kept') >= pl.col(QUOTA_COLUMN))
+            .select(STRATUM_COLUMN, '_max')
+        )
+        limits = (
+            limits.join(full, on=STRATUM_COLUMN, how='left', nulls_equal=True)
+            .with_columns(pl.coalesce('_max', THRESHOLD_COLUMN).alias(THRESHOLD_COLUMN))
+            .drop('_max')
+        )
+        return kept
+
+    for batch in batches:
+        if batch.is_empty():
+            continue
+        if limits is None:
+            # 割り当て0の層は最初から締め切る
+            limits = pl.DataFrame({
+                STRATUM_COLUMN: list(quotas),
+                QUOTA_COLUMN: list(quotas.values()),
+                THRESHOLD_COLUMN: [np.inf if quota > 0 else -np.inf for quota in quotas.values()],
+            }, schema={STRATUM_COLUMN: batch.schema[STRATUM_COLUMN], QUOTA_COLUMN: pl.Int64,
+                       THRESHOLD_COLUMN: pl.Float64})
+        # キーはしきい値にかかわらず全行に振る（バッチの切り方で結果が変わらない）
+        keyed = batch.with_columns(_keys(rng, batch))
+        candidates = (
+            keyed.join(limits, on=STRATUM_COLUMN, how='inner', nulls_equal=True)
+            .filter(pl.col(KEY_COLUMN) < pl.col(THRESHOLD_COLUMN))
+            .drop(THRESHOLD_COLUMN)
+        )
+        if candidates.is_empty():
+            continue
+        buffer.append(candidates)
+        buffered += len(candidates)
+        if buffered > 2 * capacity:
+            buffer = [compact()]
+            buffered = len(buffer[0])
+
+    if not buffer:
+        return None
+    return compact().drop(QUOTA_COLUMN)
+
+
+def allocate(counts: Dict[Any, int], n: int, allocation: str = 'proportional') -> Dict[Any, int]:
+    """層ごとの標本数（proportional: 行数に比例・最大剰余法 / equal: 均等）
+
+    equalで行数が均等割りに満たない層は全行を取り、不足分を残りの層で均等に分け直す。
+    合計がnになるので、nが総行数未満なら標本が足りなくなることはない
+    """
+    if allocation not in ALLOCATIONS:
+        raise ValueError(f"allocationは {ALLOCATIONS} のいずれか: {allocation}")
+    strata = sorted(counts, key=lambda s: (s is None, str(s)))
+    total = sum(counts.values())
+    if not strata or n >= total:
+        return dict(counts)
+
+    quotas: Dict[Any, int] = {}
+    if allocation == 'equal':
+        remaining, open_strata = n, strata
+        while open_strata:
+            base, extra = divmod(remaining, len(open_strata))
+            small = [s for s in open_strata if counts[s] <= base]
+            if not small:
+                # 残りの層はすべてbase+1行以上ある
+                quotas.update({s: base + (1 if i < extra else 0) for i, s in enumerate(open_strata)})
+                break
+            for s in small:
+                quotas[s] = counts[s]
+                remaining -= counts[s]
+            open_strata = [s for s in open_strata if counts[s] > base]
+    else:
+        exact = {s: n * counts[s] / total for s in strata}
+        quotas = {s: int(exact[s]) for s in strata}
+        remainder = n - sum(quotas.values())
+        # 端数の大きい層から1件ずつ（同率は層の順）
+        for s in sorted(strata, key=lambda s: quotas[s] - exact[s])[:remainder]:
+            quotas[s] += 1
+    return {s: min(quotas[s], counts[s]) for s in strata}
+
+
+def _gather(table: pa.Table, selected: pl.DataFrame, columns: Sequence[str]) -> pl.DataFrame:
+    """選ばれた行をキーの順に取り出す（読むのは行番号順、並びは最後に戻す）"""
+    selected = selected.sort(KEY_COLUMN)
+    rows = selected[ROW_COLUMN]
+    order = rows.arg_sort()
+    taken = to_polars(table.select(list(columns)).take(pa.array(rows.gather(order).to_numpy())))
+    return taken.select(pl.all().gather(order.arg_sort()))
+
+
+def reservoir_sample(table: pa.Table, n: int, columns: Sequence[str], seed: int = 42,
+                     batch_size: int = SCAN_BATCH_SIZE) -> pl.DataFrame:
+    """アクティブな投稿から一様にn件（非復元）"""
+    selected, seen = _select_smallest(iter_active_batches(table, batch_size=batch_size), n, seed)
+    if selected is None:
+        return to_polars(table.select(list(columns)).slice(0, 0))
+    logger.info(f"一様サンプリング: {len(selected):,}/{seen:,}件")
+    return _gather(table, selected, columns)
+
+
+def weighted_sample(table: pa.Table, n: int, columns: Sequence[str], weight: Union[str, pl.Expr] = "score",
+                    seed: int = 42, batch_size: int = SCAN_BATCH_SIZE) -> pl.DataFrame:
+    """アクティブな投稿から重みに比例した確率でn件（非復元、重みの既定はscore）"""
+    weight_expr = pl.col(weight) if isinstance(weight, str) else weight
+    batches = iter_active_batches(table, {WEIGHT_COLUMN: weight_expr}, batch_size)
+    selected, seen = _select_smallest(batches, n, seed)
+    if selected is None:
+        return to_polars(table.select(list(columns)).slice(0, 0))
+    logger.info(f"重み付きサンプリング: {len(selected):,}/{seen:,}件")
+    return _gather(table, selected, columns)
+
+
+def stratified_sample(table: pa.Table, n: int, columns: Sequence[str], by: Union[str, pl.Expr] = "rating",
+                      allocation: str = 'proportional', seed: int = 42,
+                      batch_size: int = SCAN_BATCH_SIZE) -> pl.DataFrame:
+    """層ごとに一様にサンプリングして合計n件（byはSTRATAの名前・列名・式）
+
+    1パス目で層の列だけを読んで層ごとの行数を数え、割り当て数を決める（事前に分かっている必要はない）。
+    2パス目では各層で割り当て数までを保持する
+    """
+    if isinstance(by, str):
+        by = STRATA.get(by, pl.col(by))
+    counts = _count_strata(iter_active_batches(table, {STRATUM_COLUMN: by}, batch_size))
+    quotas = allocate(counts, n, allocation)
+    if sum(quotas.values()) < n:
+        logger.warning(f"アクティブな行が{sum(counts.values()):,}件しかないため、標本は{n:,}件に届きません")
+
+    selected = _select_stratified(iter_active_batches(table, {STRATUM_COLUMN: by}, batch_size), quotas, seed)
+    if selected is None:
+        return to_polars(table.select(list(columns)).slice(0, 0))
+    logger.info(f"層別サンプリング（{allocation}, {len(quotas)}層）: {len(selected):,}/{sum(counts.values()):,}件")
+    return _gather(table, selected, columns)
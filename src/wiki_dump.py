@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+wikiダンプ（danbooru-wiki-2024_df.pkl）からtag groupページを読み込むユーティリティ
+DText本文をDanbooruと同じ形のHTMLに変換し、スクレイパーの階層抽出処理をそのまま適用できるようにする
+"""
+
+import html
+import logging
+import pickle
+import re
+from typing import Dict, List
+from urllib.parse import quote
+
+from html_parsers import WIKI_BODY_ID
+
+logger = logging.getLogger(__name__)
+
+WIKI_DUMP_PATH = 'data/0_raw/danbooru-wiki-2024_df.pkl'
+ROOT_WIKI_TITLE = 'tag_groups'
+HIERARCHY_TITLE_PREFIXES = ('tag_group:', 'list_of_')
+
+HEADING_RE = re.compile(r'^h([1-6])(?:#[\w\-]+)?\.\s*(.*)$', re.IGNORECASE)
+BULLET_RE = re.compile(r'^(\*+)\s+(.*)$')
+# [[wiki]] / [[wiki|表示名]] / {{タグ検索}} / "表示名":[URL] / "表示名":URL
+INLINE_LINK_RE = re.compile(
+    r'\[\[(?P<wiki>[^\]|]+)(?:\|(?P<label>[^\]]*))?\]\]'
+    r'|\{\{(?P<search>[^}]+)\}\}'
+    r'|"(?P<text>[^"]+)":(?:\[(?P<bracket_url>[^\]]+)\]|(?P<url>(?:https?://|/)\S+))'
+)
+# 階層に影響しない装飾タグ（[b], [expand=...], [/spoiler] など）
+FORMAT_TAG_RE = re.compile(r'\[/?(?:b|i|u|s|tn|spoiler|expand|quote|section|nodtext|code)(?:=[^\]]*)?\]', re.IGNORECASE)
+QUALIFIER_RE = re.compile(r'\s*\([^)]*\)$')
+
+
+def normalize_wiki_title(title: str) -> str:
+    """wikiタイトルをDanbooruのページ名形式（小文字、空白→_）に揃える"""
+    return title.strip().lower().replace(' ', '_')
+
+
+def wiki_page_href(title: str) -> str:
+    """wikiページへの相対URL（Danbooruのリンク表記と同じくコロン等をエスケープ）"""
+    return '/wiki_pages/' + quote(normalize_wiki_title(title), safe='')
+
+
+def is_hierarchy_title(title: str) -> bool:
+    return title == ROOT_WIKI_TITLE or title.startswith(HIERARCHY_TITLE_PREFIXES)
+
+
+def load_hierarchy_pages(wiki_path: str = WIKI_DUMP_PATH) -> Dict[str, str]:
+    """ダンプからtag groups / tag group:* / list of * ページの本文を読み込む（タイトル → DText）"""
+    logger.info(f"wikiダンプ読み込み: {wiki_path}")
+    with open(wiki_path, 'rb') as f:
+        wiki_df = pickle.load(f)
+
+    # pandas / polars どちらのDataFrameでも列単位でzipできる
+    titles = wiki_df['title']
+    bodies = wiki_df['body']
+    deleted = wiki_df['is_deleted'] if 'is_deleted' in wiki_df.columns else [False] * len(wiki_df)
+
+    pages = {}
+    for title, body, is_deleted in zip(titles, bodies, deleted):
+        if is_deleted or not title or body is None:
+            continue
+        title = normalize_wiki_title(title)
+        if is_hierarchy_title(title):
+            pages[title] = body
+    logger.info(f"階層ページ: {len(pages)}件 / 全{len(wiki_df)}件")
+    return pages
+
+
+def _wiki_link_text(target: str, label: str = None) -> str:
+    """[[...]]リンクの表示テキスト（Danbooruの表示規則に合わせる）"""
+    if label is None:
+        return target.split('#', 1)[0].strip().replace('_', ' ')
+    if label == '':
+        # パイプトリック: [[foo (bar)|]] → foo
+        return QUALIFIER_RE.sub('', target.split('#', 1)[0].strip().replace('_', ' '))
+    return label.strip()
+
+
+def render_inline(text: str) -> str:
+    """1行分のDTextをリンク付きHTMLに変換"""
+    text = FORMAT_TAG_RE.sub('', text)
+    parts: List[str] = []
+    position = 0
+    for match in INLINE_LINK_RE.finditer(text):
+        parts.append(html.escape(text[position:match.start()], quote=False))
+        if match.group('wiki') is not None:
+            target = match.group('wiki')
+            href = wiki_page_href(target.split('#', 1)[0])
+            label = _wiki_link_text(target, match.group('label'))
+        elif match.group('search') is not None:
+            label = match.group('search').strip()
+            href = '/posts?tags=' + quote(label)
+        else:
+            label = match.group('text')
+            href = match.group('bracket_url') or match.group('url')
+        parts.append(f'<a href="{html.escape(href)}">{html.escape(label, quote=False)}</a>')
+        position = match.end()
+    parts.append(html.escape(text[position:], quote=False))
+    return ''.join(parts).strip()
+
+
+def dtext_to_html(body: str) -> str:
+    """DText本文をwiki本文のHTMLに変換
+
+    見出し（h4. ...）と箇条書き（*, **, ...）のみ構造化する。ネストした箇条書きは
+    Danbooruの出力と同じく親liの兄弟ulとして出力する
+    """
+    out = [f'<div id="{WIKI_BODY_ID}">']
+    list_depth = 0
+
+    def close_lists(target_depth: int):
+        nonlocal list_depth
+        while list_depth > target_depth:
+            out.append('</ul>')
+            list_depth -= 1
+
+    for line in body.replace('\r\n', '\n').split('\n'):
+        line = line.strip()
+        bullet = BULLET_RE.match(line)
+        if bullet:
+            level = len(bullet.group(1))
+            close_lists(level)
+            while list_depth < level:
+                out.append('<ul>')
+                list_depth += 1
+            out.append(f'<li>{render_inline(bullet.group(2))}</li>')
+            continue
+
+        close_lists(0)
+        heading = HEADING_RE.match(line)
+        if heading:
+            out.append(f'<h{heading.group(1)}>{render_inline(heading.group(2))}</h{heading.group(1)}>')
+        elif line:
+            out.append(f'<p>{render_inline(line)}</p>')
+
+    close_lists(0)
+    out.append('</div>')
+    return ''.join(out)
@@ -0,0 +1,94 @@
+import datetime
+import json
+import os
+import random
+import shutil
+import tempfile
+
+import pyarrow as pa
+import pyarrow.ipc
+import pytest
+
+_ORIGINAL_CWD = os.getcwd()
+_WORK_DIR = tempfile.mkdtemp(prefix="danbooru_tag_tests_")
+
+POST_ROWS = 6000
+POST_FILES = 3
+# レーティングの偏り（eが少なく、均等割り当てでは不足分の再配分が必要になる）
+RATING_WEIGHTS = {'g': 0.6, 's': 0.25, 'q': 0.12, 'e': 0.03}
+
+
+def pytest_sessionstart(session):
+    # scalable_hierarchy_scraperはimport時にカレントディレクトリのtmp/にログファイルを作るので、
+    # テストモジュールの収集前に一時ディレクトリへ移る（リポジトリにtmp/を残さない）
+    os.chdir(_WORK_DIR)
+
+
+def pytest_unconfigure(config):
+    os.chdir(_ORIGINAL_CWD)
+    shutil.rmtree(_WORK_DIR, ignore_errors=True)
+
+
+def make_posts(rows: int, seed: int = 0, first_id: int = 0) -> pa.Table:
+    """danbooru-tags-2024と同じ列構成の合成投稿（作成日時は約2年に分布）"""
+    rng = random.Random(seed)
+    base = datetime.datetime(2005, 5, 24, tzinfo=datetime.timezone(datetime.timedelta(hours=9)))
+    ids = list(range(first_id, first_id + rows))
+    tags = ['1girl', 'solo', 'long_hair', 'smile', 'cat_ears', 'blue_eyes']
+    return pa.table({
+        'id': ids,
+        'created_at': [(base + datetime.timedelta(hours=i * 3 + rng.random())).isoformat(timespec='milliseconds')
+                       for i in ids],
+        'updated_at': ['2025-01-19T01:46:35.057+09:00'] * rows,
+        'score': [rng.randint(-5, 200) for _ in ids],
+        'up_score': [0] * rows,
+        'down_score': [0] * rows,
+        'fav_count': [rng.randint(0, 50) for _ in ids],
+        'rating': rng.choices(list(RATING_WEIGHTS), list(RATING_WEIGHTS.values()), k=rows),
+        'image_width': [rng.randint(1, 3000) for _ in ids],
+        'image_height': [rng.randint(1, 3000) for _ in ids],
+        'file_ext': [rng.choice(['jpg', 'png']) for _ in ids],
+        'tag_count': [rng.randint(1, 80) for _ in ids],
+        'tag_count_general': [1] * rows,
+        'tag_count_artist': [1] * rows,
+        'tag_count_character': [1] * rows,
+        'tag_count_copyright': [1] * rows,
+        'tag_count_meta': [1] * rows,
+        'parent_id': pa.array([None] * rows, pa.int64()),
+        'has_children': [False] * rows,
+        'is_deleted': [rng.random() < 0.05 for _ in ids],
+        'is_banned': [rng.random() < 0.02 for _ in ids],
+        'general': [' '.join(rng.sample(tags, rng.randint(1, len(tags)))) for _ in ids],
+        'character': ['c'] * rows,
+        'copyright': ['original'] * rows,
+        'artist': [f"a{rng.randint(0, 99)}" for _ in ids],
+        'meta': ['highres'] * rows,
+    })
+
+
+def write_dataset(path, table: pa.Table, files: int = POST_FILES):
+    """save_to_disk()と同じ配置（train/にArrowストリーム形式のファイル + state.json）で書く"""
+    split_dir = path / "train"
+    split_dir.mkdir(parents=True, exist_ok=True)
+    per_file = -(-table.num_rows // files)
+    data_files = []
+    for index in range(files):
+        name = f"data-{index:05d}-of-{files:05d}.arrow"
+        part = table.slice(index * per_file, per_file)
+        with pa.OSFile(str(split_dir / name), 'wb') as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+            for batch in part.to_batches(max_chunksize=500):
+                writer.write_batch(batch)
+        data_files.append({'filename': name})
+    with open(split_dir / "state.json", 'w', encoding='utf-8') as f:
+        json.dump({'_data_files': data_files}, f)
+    return path
+
+
+@pytest.fixture(scope='session')
+def posts() -> pa.Table:
+    return make_posts(POST_ROWS)
+
+
+@pytest.fixture(scope='session')
+def dataset_dir(tmp_path_factory, posts):
+    return write_dataset(tmp_path_factory.mktemp("danbooru-tags-2024"), posts)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+tests/fixtures/tag_groups/（リプレイ用の合成コーパス）を作り直す
+
+    python tests/fixtures/build_tag_groups.py
+
+ページはスナップショット形式（manifest.jsonl + pages/*.html.gz）で書く。
+zstandardがなくても読めるようにgzipで保存する
+"""
+
+import shutil
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT.parents[1] / "src"))
+
+from hierarchy_snapshots import SnapshotStore  # noqa: E402
+
+CORPUS_DIR = ROOT / "tag_groups"
+BASE_URL = "https://danbooru.donmai.us/posts?tags="
+
+
+def page(body: str) -> bytes:
+    """postページの体裁（ヘッダー・サイドバーのノイズ + wiki本文）"""
+    return f"""<!DOCTYPE html>
+<html><head><title>Danbooru</title></head><body>
+<header><h1>Search</h1><nav><ul><li><a href="/posts">Posts</a></li></ul></nav></header>
+<aside id="sidebar"><h2>Tags</h2><ul><li><a href="/posts?tags=solo">solo</a></li></ul></aside>
+<div id="wiki-page-body" class="prose">
+{body}
+</div>
+<footer id="page-footer"><ul><li><a href="/terms_of_service">Terms of Service</a></li></ul></footer>
+</body></html>
+""".encode('utf-8')
+
+
+# (タグ, 深度, 取得元アイテム名, 取得時点のアイテムパス, 本文)
+PAGES = [
+    ("tag_groups", 0, None, None, """
+<h4>Visual characteristics</h4>
+<ul>
+  <li><a href="/wiki_pages/tag_group:body_parts">Tag group:Body parts</a>
+    <ul>
+      <li><a href="/wiki_pages/tag_group:hair">Tag group:Hair</a></li>
+    </ul>
+  </li>
+  <li><a href="/wiki_pages/tag_group:attire">Tag group:Attire</a></li>
+</ul>
+<h4>Lists</h4>
+<ul>
+  <li><a href="/wiki_pages/list_of_animal_ears">List of animal ears</a></li>
+</ul>
+<h4>See also</h4>
+<ul>
+  <li><a href="/wiki_pages/tag_group:copyrights">Tag group:Copyrights</a></li>
+</ul>
+"""),
+    ("tag_group:body_parts", 1, "Tag group:Body parts", ["Visual characteristics", "Tag group:Body parts"], """
+<h5>Head</h5>
+<ul>
+  <li><a href="/wiki_pages/animal_ears">animal ears</a>
+    <ul>
+      <li><a href="/wiki_pages/cat_ears">cat ears</a></li>
+      <li><a href="/wiki_pages/fox_ears">fox ears</a></li>
+    </ul>
+  </li>
+  <li><a href="/wiki_pages/tag_group:hair">Tag group:Hair</a></li>
+</ul>
+<h5>Torso</h5>
+<ul>
+  <li><a href="/wiki_pages/breasts">breasts</a></li>
+  <ul>
+    <li><a href="/wiki_pages/large_breasts">large breasts</a></li>
+  </ul>
+  <li><a href="/wiki_pages/navel">navel</a></li>
+</ul>
+"""),
+    ("tag_group:hair", 1, "Tag group:Hair", ["Visual characteristics", "Tag group:Body parts", "Tag group:Hair"], """
+<h5>Hair length</h5>
+<ul>
+  <li><a href="/wiki_pages/long_hair">long hair</a></li>
+  <li><a href="/wiki_pages/short_hair">short hair</a></li>
+</ul>
+<h5>Hair color</h5>
+<ul>
+  <li><a href="/wiki_pages/blonde_hair">blonde hair</a>
+    <ul>
+      <li><a href="/wiki_pages/light_blonde_hair">light blonde hair</a></li>
+    </ul>
+  </li>
+  <li><a href="/wiki_pages/streaked_hair">streaked hair</a></li>
+</ul>
+<h5>Styles</h5>
+<ul>
+  <li><a href="/wiki_pages/tag_group:hair_styles">Tag group:Hair styles</a></li>
+</ul>
+"""),
+    ("tag_group:attire", 1, "Tag group:Attire", ["Visual characteristics", "Tag group:Attire"], """
+<h5>Headwear</h5>
+<ul>
+  <li><a href="/wiki_pages/hat">hat</a></li>
+  <li><a href="/wiki_pages/hair_ribbon">hair ribbon</a></li>
+</ul>
+<h5>Dresses</h5>
+<ul>
+  <li><a href="/wiki_pages/dress">dress</a></li>
+  <li>See also: <a href="/wiki_pages/tag_group:dress">Tag group:Dress</a></li>
+</ul>
+"""),
+    ("list_of_animal_ears", 1, "List of animal ears", ["Lists", "List of animal ears"], """
+<ul>
+  <li><a href="/wiki_pages/cat_ears">cat ears</a></li>
+  <li><a href="/wiki_pages/wolf_ears">wolf ears</a></li>
+</ul>
+"""),
+    ("tag_group:hair_styles", 2, "Tag group:Hair styles",
+     ["Visual characteristics", "Tag group:Body parts", "Tag group:Hair", "Styles", "Tag group:Hair styles"], """
+<ul>
+  <li><a href="/wiki_pages/ponytail">ponytail</a></li>
+  <li><a href="/wiki_pages/twintails">twintails</a></li>
+  <li><a href="/wiki_pages/tag_group:hair">Tag group:Hair</a></li>
+</ul>
+"""),
+]
+
+
+def main():
+    if CORPUS_DIR.exists():
+        shutil.rmtree(CORPUS_DIR)
+    store = SnapshotStore(str(CORPUS_DIR))
+    store.codec = 'gzip'
+    for tag, depth, name, path, body in PAGES:
+        url = BASE_URL + tag
+        item = {'name': name, 'path': path} if name is not None else None
+        store.save(url, url, page(body), depth, item)
+    print(f"{len(PAGES)}ページ → {CORPUS_DIR}")
+
+
+if __name__ == "__main__":
+    main()
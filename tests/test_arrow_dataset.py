@@ -0,0 +1,82 @@
+"""Arrowデータセットの読み込みと遅延スキャン（射影・絞り込み・先頭N行の押し下げ）"""
+
+import json
+
+import polars as pl
+import pytest
+
+from arrow_dataset import (ACTIVE_FILTER, created_datetime_expr, dataset_files, min_created_datetime, open_arrow_dataset,
+                           scan_active_posts, scan_arrow_table, to_polars, with_score_per_hour)
+
+COLUMNS = ['id', 'created_at', 'score', 'rating']
+
+
+@pytest.fixture(scope='module')
+def eager(posts) -> pl.DataFrame:
+    return to_polars(posts)
+
+
+def test_dataset_files_follow_state_json(dataset_dir):
+    split_dir = dataset_dir / "train"
+    with open(split_dir / "state.json", encoding='utf-8') as f:
+        expected = [split_dir / data_file['filename'] for data_file in json.load(f)['_data_files']]
+    assert dataset_files(str(dataset_dir)) == expected
+    assert len(expected) > 1
+
+
+def test_dataset_files_without_state_json(tmp_path):
+    split_dir = tmp_path / "train"
+    split_dir.mkdir()
+    for name in ("data-00001.arrow", "data-00000.arrow"):
+        (split_dir / name).touch()
+    assert [path.name for path in dataset_files(str(tmp_path))] == ["data-00000.arrow", "data-00001.arrow"]
+    with pytest.raises(FileNotFoundError):
+        dataset_files(str(tmp_path), "test")
+
+
+def test_open_arrow_dataset(dataset_dir, posts):
+    assert open_arrow_dataset(str(dataset_dir)).equals(posts)
+
+
+@pytest.mark.parametrize('batch_size', [1000, 4096, 100000])
+def test_scan_pushes_down_filter_and_projection(posts, eager, batch_size):
+    lazy = scan_arrow_table(posts, batch_size).filter(ACTIVE_FILTER).select(COLUMNS)
+    assert lazy.collect().equals(eager.filter(ACTIVE_FILTER).select(COLUMNS))
+
+
+@pytest.mark.parametrize('n', [0, 1, 999, 2500])
+def test_scan_head_semantics(posts, eager, n):
+    scan = scan_arrow_table(posts, 1000)
+    # head → filter: 先頭n行のうち条件を満たす行
+    assert scan.head(n).filter(ACTIVE_FILTER).select(COLUMNS).collect().equals(
+        eager.head(n).filter(ACTIVE_FILTER).select(COLUMNS))
+    # filter → head: 条件を満たす行の先頭n行
+    assert scan.filter(ACTIVE_FILTER).head(n).select(COLUMNS).collect().equals(
+        eager.filter(ACTIVE_FILTER).head(n).select(COLUMNS))
+
+
+def test_scan_active_posts(dataset_dir, eager):
+    assert scan_active_posts(str(dataset_dir), COLUMNS).collect().equals(eager.filter(ACTIVE_FILTER).select(COLUMNS))
+
+
+def test_score_per_hour_uses_global_minimum(posts, eager):
+    active = scan_arrow_table(posts, 1000).filter(ACTIVE_FILTER)
+    min_date = min_created_datetime(active)
+    expected_min = eager.filter(ACTIVE_FILTER).select(created_datetime_expr()).to_series().min()
+    assert min_date == expected_min
+
+    scored = with_score_per_hour(active.with_columns(created_datetime_expr()), min_date).collect()
+    oldest = scored.filter(pl.col('created_datetime') == min_date)
+    assert oldest['hours_since_start'].to_list() == [1]
+    assert (scored['score_per_hour'] == scored['score'] / scored['hours_since_start']).all()
+
+
+def test_min_created_datetime_with_mixed_offsets():
+    # 文字列の最小値（00:10-05:00 = 05:10 UTC）より、+09:00の00:30（前日15:30 UTC）の方が古い
+    created_at = ["2005-05-24T00:30:00.000+09:00", "2005-05-24T00:10:00.000-05:00", "2005-06-01T00:00:00.000+09:00"]
+    lazy = pl.LazyFrame({'created_at': created_at})
+    expected = pl.DataFrame({'created_at': created_at}).select(created_datetime_expr()).to_series().min()
+    assert min_created_datetime(lazy) == expected
+    assert min_created_datetime(lazy.filter(pl.col('created_at') > '2005-05-25')) == expected.replace(
+        month=5, day=31, hour=15, minute=0)
+    assert min_created_datetime(lazy.filter(pl.col('created_at') > '2006')) is None
@@ -0,0 +1,93 @@
+"""中間チャンクのParquetストアとmanifest"""
+
+import polars as pl
+import pytest
+
+from arrow_dataset import ACTIVE_FILTER, to_polars
+from chunk_store import (PARTITION_COLUMN, ChunkManifest, ChunkRecord, chunk_checksum, chunk_files, chunk_paths,
+                         column_range, list_months, month_expr, remove_chunk, scan_chunks, write_chunk)
+
+COLUMNS = ['id', 'created_at', 'score', 'rating']
+
+
+@pytest.fixture
+def frames(posts):
+    active = to_polars(posts, COLUMNS + ['is_deleted', 'is_banned']).filter(ACTIVE_FILTER).select(COLUMNS)
+    return [active.slice(0, 2000), active.slice(2000)]
+
+
+@pytest.fixture
+def store(tmp_path, frames):
+    store_dir = str(tmp_path / "chunks")
+    for chunk_id, df in enumerate(frames):
+        write_chunk(df, chunk_id, store_dir)
+    return store_dir
+
+
+def test_write_chunk_partitions_by_month(tmp_path, frames):
+    store_dir = str(tmp_path / "chunks")
+    counts = write_chunk(frames[0], 0, store_dir)
+    expected = dict(frames[0].group_by(month_expr()).len().iter_rows())
+    assert counts == expected
+    assert list_months(store_dir) == sorted(expected)
+    for path in chunk_paths(0, store_dir):
+        month = path.parent.name[len(PARTITION_COLUMN) + 1:]
+        assert pl.read_parquet(path)['created_at'].str.slice(0, 7).unique().to_list() == [month]
+
+
+def test_rewriting_chunk_replaces_files(store, frames):
+    write_chunk(frames[0].head(10), 0, store)
+    assert scan_chunks(store, ['id']).collect().height == 10 + len(frames[1])
+    files = len(chunk_paths(0, store))
+    assert remove_chunk(0, store) == files
+    assert chunk_paths(0, store) == []
+
+
+def test_scan_chunks_by_month(store, frames):
+    everything = pl.concat(frames)
+    assert scan_chunks(store, COLUMNS).collect().sort('id').equals(everything)
+
+    months = list_months(store)[:3]
+    selected = scan_chunks(store, COLUMNS, months=months).collect().sort('id')
+    assert selected.equals(everything.filter(month_expr().is_in(months)))
+    with pytest.raises(FileNotFoundError):
+        scan_chunks(store, COLUMNS, months=['1999-01'])
+
+
+def test_column_range_from_statistics(store, frames):
+    everything = pl.concat(frames)
+    assert column_range('score', store) == (everything['score'].min(), everything['score'].max())
+    assert column_range('id', store) == (everything['id'].min(), everything['id'].max())
+
+
+def test_manifest_round_trip(store):
+    manifest = ChunkManifest(store)
+    source = {'input_path': 'x', 'total_rows': 10}
+    assert manifest.load(source) == {}
+
+    records = {
+        chunk_id: ChunkRecord(chunk_id, 0, 1, 'done', months={p.parent.name.split('=')[1]: 1 for p in chunk_paths(chunk_id, store)},
+                              checksum=chunk_checksum(chunk_id, store))
+        for chunk_id in (0, 1)
+    }
+    manifest.commit(source, records)
+    assert manifest.load(source) == records
+    assert manifest.load({**source, 'total_rows': 11}) is None
+    assert all(manifest.is_complete(record, verify_checksum=True) for record in records.values())
+
+
+def test_manifest_detects_missing_and_modified_files(store):
+    manifest = ChunkManifest(store)
+    months = {p.parent.name.split('=')[1]: 1 for p in chunk_paths(0, store)}
+    record = ChunkRecord(0, 0, 1, 'done', months=months, checksum=chunk_checksum(0, store))
+    assert not manifest.is_complete(None)
+    assert not manifest.is_complete(ChunkRecord(0, 0, 1, 'failed'))
+
+    first = chunk_paths(0, store)[0]
+    first.write_bytes(first.read_bytes() + b'\0')
+    assert manifest.is_complete(record)
+    assert not manifest.is_complete(record, verify_checksum=True)
+
+    first.unlink()
+    assert not manifest.is_complete(record)
+    assert len(chunk_files(store)) == len(chunk_paths(1, store)) + len(months) - 1
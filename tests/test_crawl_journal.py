@@ -0,0 +1,79 @@
+"""CrawlJournalの復元（チェックポイント・失敗ページの再試行）"""
+
+from crawl_journal import CrawlJournal
+
+
+def _target(name: str, depth: int = 1):
+    url = f"https://danbooru.donmai.us/wiki_pages/{name}"
+    return (url, {'name': name}, url, depth)
+
+
+def _result(name: str):
+    return {'name': name, 'items': []}
+
+
+def _journal(tmp_path, interval: int = 100) -> CrawlJournal:
+    return CrawlJournal(str(tmp_path / "journal.jsonl"), checkpoint_interval=interval)
+
+
+def test_load_without_journal(tmp_path):
+    assert _journal(tmp_path).load() is None
+
+
+def test_load_restores_pending_after_checkpoint(tmp_path):
+    a, b, c = _target('a'), _target('b'), _target('c', depth=2)
+    journal = _journal(tmp_path)
+    journal.start("start", {'main': True}, [a, b], {a[0], b[0]}, 2)
+    journal.record_page(a, _result('a'), [c])
+    journal.checkpoint([b, c], {a[0], b[0], c[0]}, 3, [])
+    journal.record_page(b, _result('b'), [])
+    journal.close()
+
+    state = _journal(tmp_path).load()
+    assert state.main_result == {'main': True}
+    assert list(state.pending) == [c[0]]
+    assert state.visited_urls == {a[0], b[0], c[0]}
+    assert state.scheduled_count == 3
+    assert [r['name'] for r in state.page_results] == ['a', 'b']
+
+
+def test_failed_page_is_retried(tmp_path):
+    a, b = _target('a'), _target('b')
+    journal = _journal(tmp_path)
+    journal.start("start", {}, [a, b], {a[0], b[0]}, 2)
+    journal.record_page(a, None, [])
+    journal.record_page(b, _result('b'), [])
+    journal.close()
+
+    state = _journal(tmp_path).load()
+    assert list(state.pending) == [a[0]]
+    assert [r['name'] for r in state.page_results] == ['b']
+
+
+def test_retried_page_after_checkpoint_is_not_fetched_again(tmp_path):
+    a = _target('a')
+    journal = _journal(tmp_path)
+    journal.start("start", {}, [a], {a[0]}, 1)
+    journal.record_page(a, None, [])
+    journal.checkpoint([], {a[0]}, 1, [a])
+    # 再開後の再試行で成功
+    journal.record_page(a, _result('a'), [])
+    journal.close()
+
+    state = _journal(tmp_path).load()
+    assert state.pending == {}
+    assert [r['name'] for r in state.page_results] == ['a']
+
+
+def test_truncated_tail_is_ignored(tmp_path):
+    a, b = _target('a'), _target('b')
+    journal = _journal(tmp_path)
+    journal.start("start", {}, [a, b], {a[0], b[0]}, 2)
+    journal.record_page(a, _result('a'), [])
+    journal.close()
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"type": "page", "target": ')
+
+    state = _journal(tmp_path).load()
+    assert list(state.pending) == [b[0]]
+    assert [r['name'] for r in state.page_results] == ['a']
@@ -0,0 +1,99 @@
+"""クロールの計測（ヒストグラム・Prometheusテキスト形式）"""
+
+import pytest
+
+from crawl_metrics import LATENCY_BUCKETS, CrawlMetrics, Histogram
+
+PREFIX = 'danbooru_scraper'
+# 境界ちょうど（0.05）と、最大バケットを超える値（45.0 → +Infのみ）を含める
+LATENCIES = [0.03, 0.05, 0.2, 0.7, 3.0, 45.0]
+
+
+def _sample_lines(text: str, name: str):
+    """コメント以外の行から、指定したメトリクス名（ラベル込み）→ 値の辞書を作る"""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        key, value = line.rsplit(' ', 1)
+        if key == name or key.startswith(name + '{') or key.startswith(name + '_'):
+            samples[key] = value
+    return samples
+
+
+@pytest.fixture
+def metrics() -> CrawlMetrics:
+    metrics = CrawlMetrics()
+    for seconds in LATENCIES:
+        metrics.record_response(200, None, seconds, 2048)
+    metrics.record_response(None, 'timeout', 30.0, 0)
+    metrics.record_retry()
+    metrics.record_wait(1.5)
+    metrics.record_wait(0.0)  # 待たなかった分は数えない
+    metrics.record_cache('hit')
+    metrics.record_cache('miss')
+    return metrics
+
+
+def test_request_histogram_lines(metrics):
+    text = metrics.to_prometheus()
+    name = f'{PREFIX}_request_duration_seconds'
+    assert f'# TYPE {name} histogram' in text.splitlines()
+
+    samples = _sample_lines(text, name)
+    observed = LATENCIES + [30.0]
+    buckets = {f'{name}_bucket{{le="{bound!r}"}}': str(sum(v <= bound for v in observed))
+               for bound in LATENCY_BUCKETS}
+    buckets[f'{name}_bucket{{le="+Inf"}}'] = str(len(observed))
+    assert samples == {
+        **buckets,
+        f'{name}_sum': repr(sum(observed)),
+        f'{name}_count': str(len(observed)),
+    }
+    # 境界値は「以下」のバケットに入り、累積は単調
+    assert samples[f'{name}_bucket{{le="0.05"}}'] == '2'
+    assert samples[f'{name}_bucket{{le="30.0"}}'] == '6'
+    counts = [int(value) for key, value in samples.items() if '_bucket' in key]
+    assert counts == sorted(counts)
+
+
+def test_counter_lines(metrics):
+    text = metrics.to_prometheus()
+    assert _sample_lines(text, f'{PREFIX}_responses_total') == {
+        f'{PREFIX}_responses_total{{status="200"}}': '6',
+        f'{PREFIX}_responses_total{{status="timeout"}}': '1',
+    }
+    assert f'{PREFIX}_retries_total 1' in text.splitlines()
+    assert f'{PREFIX}_rate_limit_waits_total 1' in text.splitlines()
+    assert f'{PREFIX}_rate_limit_sleep_seconds_total 1.5' in text.splitlines()
+    assert f'{PREFIX}_cache_lookups_total{{outcome="hit"}} 1' in text.splitlines()
+    # 本文なし（size=0）は応答サイズのヒストグラムに入れない
+    assert f'{PREFIX}_response_size_bytes_count 6' in text.splitlines()
+
+
+def test_empty_metrics_and_custom_prefix():
+    text = CrawlMetrics().to_prometheus(prefix='test')
+    assert 'test_request_duration_seconds_bucket{le="+Inf"} 0' in text.splitlines()
+    assert 'test_request_duration_seconds_sum 0.0' in text.splitlines()
+    assert 'test_request_duration_seconds_count 0' in text.splitlines()
+    assert all(line.startswith(('# HELP test_', '# TYPE test_', 'test_')) for line in text.splitlines())
+    assert text.endswith('\n')
+
+
+def test_write_prometheus_replaces_file(metrics, tmp_path):
+    path = tmp_path / "metrics" / "scraper.prom"
+    metrics.write_prometheus(str(path))
+    assert path.read_text(encoding='utf-8') == metrics.to_prometheus()
+    assert [p.name for p in path.parent.iterdir()] == ["scraper.prom"]
+
+
+def test_histogram_quantiles_stay_within_observed_range():
+    hist = Histogram(LATENCY_BUCKETS)
+    assert hist.quantile(0.5) is None
+    for seconds in LATENCIES:
+        hist.observe(seconds)
+    assert hist.quantile(0.0) == min(LATENCIES)
+    assert hist.quantile(1.0) == max(LATENCIES)
+    # 3件目（0.2）は0.1〜0.25のバケット
+    assert 0.1 <= hist.quantile(0.5) <= 0.25
+    assert hist.summary()['buckets']['+Inf'] == len(LATENCIES)
@@ -0,0 +1,43 @@
+"""create_top_n_samplesの上位抽出と保存"""
+
+import pickle
+
+import polars as pl
+
+from arrow_dataset import ACTIVE_FILTER, created_datetime_expr, to_polars
+from create_top_n_samples import COLUMNS_TO_KEEP, extract_top_by_score_per_hour, save_sample
+
+
+def test_saved_score_per_hour_is_relative_to_sample(posts, tmp_path):
+    active = to_polars(posts).filter(ACTIVE_FILTER).select(COLUMNS_TO_KEEP)
+    ranked = extract_top_by_score_per_hour(active, 100)
+    # 抽出（並び順）は全体の最古日時を基準にする
+    global_min = active.select(created_datetime_expr().min()).item()
+    assert (ranked['hours_since_start'] ==
+            (ranked['created_datetime'] - global_min).dt.total_hours() + 1).all()
+
+    # 最古の投稿は上位に入るので、それを含まない下位側を保存する
+    sample = ranked.tail(50)
+    path = tmp_path / "sample.pkl"
+    save_sample(sample, str(path), "top50", 50)
+    with open(path, 'rb') as f:
+        saved = pickle.load(f)
+
+    # 保存する値はサンプル内の最古日時を基準に計算し直す（従来どおり）
+    sample_min = sample['created_datetime'].min()
+    assert sample_min > global_min
+    assert saved.columns == COLUMNS_TO_KEEP + ['created_datetime', 'hours_since_start', 'score_per_hour']
+    assert saved['id'].to_list() == sample['id'].to_list()
+    assert saved['hours_since_start'].min() == 1
+    assert saved['hours_since_start'].to_list() == (
+        (sample['created_datetime'] - sample_min).dt.total_hours() + 1).to_list()
+    assert saved['hours_since_start'].to_list() != sample['hours_since_start'].to_list()
+    assert saved['score_per_hour'].to_list() == (saved['score'] / saved['hours_since_start']).to_list()
+
+
+def test_save_sample_without_score_per_hour(posts, tmp_path):
+    sample = to_polars(posts).filter(ACTIVE_FILTER).select(COLUMNS_TO_KEEP).head(10)
+    path = tmp_path / "sample.pkl"
+    save_sample(sample, str(path), "random10", 10)
+    with open(path, 'rb') as f:
+        assert pickle.load(f).equals(sample)
@@ -0,0 +1,126 @@
+"""取得バックエンドを、gzip/brで応答するローカルHTTPサーバーに対して確認する"""
+
+import gzip
+import shutil
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import fetch_backends
+from fetch_backends import AiohttpFetcher, CurlFetcher
+
+PAGE = ("<html><body><div id='wiki-page-body'><ul><li><a href='/wiki_pages/long_hair'>long hair</a></li>"
+        "</ul></div></body></html>" * 20).encode('utf-8')
+
+requires_aiohttp = pytest.mark.skipif(not fetch_backends.HAS_AIOHTTP, reason="aiohttp未導入（fast extra）")
+requires_brotli = pytest.mark.skipif(not fetch_backends.HAS_BROTLI, reason="brotli未導入（fast extra）")
+
+
+def _curl_supports(feature: str) -> bool:
+    if shutil.which('curl') is None:
+        return False
+    return feature in subprocess.run(['curl', '-V'], capture_output=True, text=True).stdout.lower()
+
+
+def _encode(body: bytes, encoding: str) -> bytes:
+    if encoding == 'gzip':
+        return gzip.compress(body)
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(body)
+    return body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def do_GET(self):
+        self.server.client_ports.append(self.client_address[1])
+        encoding = self.path.strip('/')
+        if encoding not in ('plain', 'gzip', 'br'):
+            body = b'not found'
+            self.send_response(404)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        body = _encode(PAGE, encoding)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('ETag', f'"{encoding}"')
+        if encoding != 'plain':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.client_ports = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server, path: str) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/{path}"
+
+
+@pytest.fixture
+def aiohttp_fetcher():
+    fetcher = AiohttpFetcher(timeout=10, max_connections=1)
+    yield fetcher
+    fetcher.close()
+
+
+@requires_aiohttp
+@pytest.mark.parametrize('encoding', ['plain', 'gzip', pytest.param('br', marks=requires_brotli)])
+def test_aiohttp_decodes_body(server, aiohttp_fetcher, encoding):
+    result = aiohttp_fetcher.fetch(_url(server, encoding))
+    assert result.ok
+    assert result.body == PAGE
+    assert result.headers['etag'] == f'"{encoding}"'
+
+
+@requires_aiohttp
+def test_aiohttp_reuses_connection(server, aiohttp_fetcher):
+    server.client_ports.clear()
+    for _ in range(5):
+        assert aiohttp_fetcher.fetch(_url(server, 'gzip')).ok
+    # 1本のkeep-aliveコネクションで5リクエスト
+    assert len(server.client_ports) == 5
+    assert len(set(server.client_ports)) == 1
+
+
+@requires_aiohttp
+def test_aiohttp_http_error(server, aiohttp_fetcher):
+    result = aiohttp_fetcher.fetch(_url(server, 'missing'))
+    assert not result.ok
+    assert result.status == 404
+    assert result.error == 'http'
+
+
+@requires_aiohttp
+@pytest.mark.skipif(shutil.which('curl') is None, reason="curl未導入")
+@pytest.mark.parametrize('encoding', [
+    'plain',
+    'gzip',
+    pytest.param('br', marks=[requires_brotli, pytest.mark.skipif(not _curl_supports('brotli'), reason="curlがbr非対応")]),
+    'missing',
+])
+def test_curl_parity(server, aiohttp_fetcher, encoding):
+    expected = aiohttp_fetcher.fetch(_url(server, encoding))
+    actual = CurlFetcher(timeout=10).fetch(_url(server, encoding))
+    assert (actual.status, actual.error, actual.ok) == (expected.status, expected.error, expected.ok)
+    if expected.ok:
+        assert actual.body == expected.body == PAGE
+        assert actual.headers['etag'] == expected.headers['etag']
@@ -0,0 +1,117 @@
+"""グループ選択（should_process_group / GroupMatcher）が従来の判定と一致すること"""
+
+import fnmatch
+import itertools
+from pathlib import Path
+
+import pytest
+
+from group_matcher import GroupMatcher, literal_alternation
+from scalable_hierarchy_scraper import ScalableHierarchyScraper, ScrapingConfig
+
+CORPUS_DIR = Path(__file__).parent / "fixtures" / "tag_groups"
+
+# (グループ名, パス)。パスなし・大文字小文字違い・除外セクション配下を含める
+GROUPS = [
+    ("Tag group:Hair", ["Visual characteristics", "Tag group:Hair"]),
+    ("tag group:hair styles", ["Visual characteristics", "Tag group:Hair", "tag group:hair styles"]),
+    ("Tag group:Attire", ["Visual characteristics", "Tag group:Attire"]),
+    ("Tag group:Dress", ["Visual characteristics", "Tag group:Attire", "Dresses", "Tag group:Dress"]),
+    ("Body parts", ["Body parts"]),
+    ("List of animal ears", ["Lists", "List of animal ears"]),
+    ("Tag group:Copyrights", ["See also", "Tag group:Copyrights"]),
+    ("Tag group:Artists", ["Copyrights, artists, projects and media", "Tag group:Artists"]),
+    ("Tag group:Hair", None),
+    ("Hair", []),
+]
+
+CONFIGS = list(itertools.product(
+    [0, 2],                                                                      # skip_first_n
+    [None, 0, 3],                                                                # max_groups
+    [None, [], ["Tag group:Hair"], ["hair", "Tag group:Attire", "BODY PARTS"]],  # target_groups
+    [None, [], ["tag group:*"], ["*HAIR*", "Tag group:A?tire", "[bl]*"]],        # group_name_patterns
+    [None, ["lists", "hair styles"]],                                            # exclude_sections
+))
+
+
+def baseline_should_process_group(config, group_name, index, processed_count, item_path=None):
+    """最適化前のshould_process_group（基準の実装）"""
+    excluded_sections = set(s.lower() for s in config.exclude_sections)
+
+    def should_exclude_section(section_name):
+        section_lower = section_name.lower().strip()
+        return any(excluded in section_lower for excluded in excluded_sections)
+
+    if item_path is not None:
+        for path_segment in item_path:
+            if should_exclude_section(path_segment):
+                return False, f"除外パス内（{path_segment}）"
+    if should_exclude_section(group_name):
+        return False, f"除外グループ（{group_name}）"
+    if index < config.skip_first_n:
+        return False, f"スキップ（{index+1}/{config.skip_first_n}番目）"
+    if config.max_groups is not None and processed_count >= config.max_groups:
+        return False, f"上限到達（{processed_count}/{config.max_groups}）"
+    if config.target_groups is not None:
+        if group_name in config.target_groups:
+            return True, ""
+        if item_path is None:
+            return False, "対象外グループ"
+        full_path_str = ' -> '.join(item_path).lower()
+        if not any(target.lower() in full_path_str for target in config.target_groups):
+            return False, "対象外グループ"
+    if config.group_name_patterns is not None:
+        if not any(fnmatch.fnmatch(group_name.lower(), p.lower()) for p in config.group_name_patterns):
+            return False, "パターン不一致"
+    return True, ""
+
+
+def make_scraper(skip_first_n, max_groups, target_groups, group_name_patterns, exclude_sections):
+    config = ScrapingConfig(fetch_backend='replay', replay_dir=str(CORPUS_DIR),
+                            skip_first_n=skip_first_n, max_groups=max_groups, target_groups=target_groups,
+                            group_name_patterns=group_name_patterns, exclude_sections=exclude_sections)
+    return ScalableHierarchyScraper(config)
+
+
+@pytest.mark.parametrize('options', CONFIGS)
+def test_should_process_group_matches_baseline(options):
+    scraper = make_scraper(*options)
+    for (name, path), index, processed_count in itertools.product(GROUPS, range(4), range(4)):
+        expected = baseline_should_process_group(scraper.config, name, index, processed_count, path)
+        # 2回目はキャッシュから判定される
+        for _ in range(2):
+            assert scraper.should_process_group(name, index, processed_count, item_path=path) == expected, \
+                (name, path, index, processed_count)
+
+
+def test_nested_groups_only_apply_exclusion_and_max_groups():
+    scraper = make_scraper(5, 2, ["Tag group:Attire"], ["tag group:a*"], ["lists"])
+    path = ["Visual characteristics", "Tag group:Hair", "tag group:hair styles"]
+
+    # メインページ上ならskip・target_groups・パターンのいずれでも落ちる
+    assert scraper.should_process_group("tag group:hair styles", 0, 0, item_path=path)[0] is False
+    # ネストしたグループはindexに関係なく処理する
+    assert scraper.should_process_group("tag group:hair styles", 0, 0, item_path=path, nested=True) == (True, "")
+    assert scraper.should_process_group("tag group:hair styles", 0, 2, item_path=path, nested=True) == (
+        False, "上限到達（2/2）")
+    assert scraper.should_process_group("List of animal ears", 0, 0, item_path=["Lists", "List of animal ears"],
+                                        nested=True) == (False, "除外パス内（Lists）")
+
+
+@pytest.mark.parametrize('words', [
+    ["tag group", "tag list", "tag", "see also"],
+    ["a.b", "a*b", "(x)", "a"],
+])
+def test_literal_alternation_matches_substrings(words):
+    pattern = literal_alternation(words)
+    for text in ["tag groups", "a tag", "see", "see also:", "xa.by", "a+b", "(x)", "ta g", ""]:
+        assert (pattern.search(text) is not None) == any(word in text for word in words), text
+    assert literal_alternation([]) is None
+    assert literal_alternation([""]) is None
+
+
+def test_excluded_segment_is_cached_per_prefix():
+    matcher = GroupMatcher(["see also"])
+    assert matcher.excluded_segment(["Tag groups", "See also", "Tag group:Copyrights"]) == "See also"
+    assert matcher.excluded_segment(["Tag groups", "Hair"]) is None
+    assert ("Tag groups", "See also") in matcher._excluded_paths
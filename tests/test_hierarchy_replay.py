@@ -0,0 +1,218 @@
+"""記録済みコーパス（tests/fixtures/tag_groups）をリプレイしてクロール全体を確認する"""
+
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from benchmark_parsers import available_backends
+from scalable_hierarchy_scraper import NodeType, ScalableHierarchyScraper, ScrapingConfig
+
+CORPUS_DIR = Path(__file__).parent / "fixtures" / "tag_groups"
+BASE_URL = "https://danbooru.donmai.us/posts?tags="
+START_URL = BASE_URL + "tag_groups"
+
+VISUAL = ["Visual characteristics"]
+BODY_PARTS = VISUAL + ["Tag group:Body parts"]
+HAIR = BODY_PARTS + ["Tag group:Hair"]
+HAIR_STYLES = HAIR + ["Styles", "Tag group:Hair styles"]
+ATTIRE = VISUAL + ["Tag group:Attire"]
+ANIMAL_EARS_LIST = ["Lists", "List of animal ears"]
+
+# 名前 → (パス, 分類)
+EXPECTED_ITEMS = {
+    # メインページ
+    "Visual characteristics": (VISUAL, NodeType.TAG_GROUP_ONLY),
+    "Tag group:Body parts": (BODY_PARTS, NodeType.TRADITIONAL_TAG_GROUP),
+    "Tag group:Hair": (HAIR, NodeType.TRADITIONAL_TAG_GROUP),
+    "Tag group:Attire": (ATTIRE, NodeType.TRADITIONAL_TAG_GROUP),
+    "Lists": (["Lists"], NodeType.TAG_GROUP_ONLY),
+    "List of animal ears": (ANIMAL_EARS_LIST, NodeType.FINAL_TAG_ONLY),
+    "See also": (["See also"], NodeType.TAG_GROUP_ONLY),
+    "Tag group:Copyrights": (["See also", "Tag group:Copyrights"], NodeType.TRADITIONAL_TAG_GROUP),
+    # Tag group:Body parts（子ul・兄弟ul）
+    "Head": (BODY_PARTS + ["Head"], NodeType.TAG_GROUP_ONLY),
+    "animal ears": (BODY_PARTS + ["Head", "animal ears"], NodeType.TAG_AND_TAG_GROUP),
+    "fox ears": (BODY_PARTS + ["Head", "animal ears", "fox ears"], NodeType.FINAL_TAG_ONLY),
+    "Torso": (BODY_PARTS + ["Torso"], NodeType.TAG_GROUP_ONLY),
+    "breasts": (BODY_PARTS + ["Torso", "breasts"], NodeType.TAG_AND_TAG_GROUP),
+    "large breasts": (BODY_PARTS + ["Torso", "breasts", "large breasts"], NodeType.FINAL_TAG_ONLY),
+    "navel": (BODY_PARTS + ["Torso", "navel"], NodeType.FINAL_TAG_ONLY),
+    # Tag group:Hair（メインページでネストしていたグループ）
+    "Hair length": (HAIR + ["Hair length"], NodeType.TAG_GROUP_ONLY),
+    "long hair": (HAIR + ["Hair length", "long hair"], NodeType.FINAL_TAG_ONLY),
+    "short hair": (HAIR + ["Hair length", "short hair"], NodeType.FINAL_TAG_ONLY),
+    "Hair color": (HAIR + ["Hair color"], NodeType.TAG_GROUP_ONLY),
+    "blonde hair": (HAIR + ["Hair color", "blonde hair"], NodeType.TAG_AND_TAG_GROUP),
+    "light blonde hair": (HAIR + ["Hair color", "blonde hair", "light blonde hair"], NodeType.FINAL_TAG_ONLY),
+    "streaked hair": (HAIR + ["Hair color", "streaked hair"], NodeType.FINAL_TAG_ONLY),
+    "Styles": (HAIR + ["Styles"], NodeType.TAG_GROUP_ONLY),
+    "Tag group:Hair styles": (HAIR_STYLES, NodeType.TRADITIONAL_TAG_GROUP),
+    # Tag group:Hair styles（深度2）
+    "ponytail": (HAIR_STYLES + ["ponytail"], NodeType.FINAL_TAG_ONLY),
+    "twintails": (HAIR_STYLES + ["twintails"], NodeType.FINAL_TAG_ONLY),
+    # Tag group:Attire
+    "Headwear": (ATTIRE + ["Headwear"], NodeType.TAG_GROUP_ONLY),
+    "hat": (ATTIRE + ["Headwear", "hat"], NodeType.FINAL_TAG_ONLY),
+    "hair ribbon": (ATTIRE + ["Headwear", "hair ribbon"], NodeType.FINAL_TAG_ONLY),
+    "Dresses": (ATTIRE + ["Dresses"], NodeType.TAG_GROUP_ONLY),
+    "dress": (ATTIRE + ["Dresses", "dress"], NodeType.FINAL_TAG_ONLY),
+    # List of animal ears（cat earsはBody partsにもあり、同じ分類なので短いパスが残る）
+    "cat ears": (ANIMAL_EARS_LIST + ["cat ears"], NodeType.FINAL_TAG_ONLY),
+    "wolf ears": (ANIMAL_EARS_LIST + ["wolf ears"], NodeType.FINAL_TAG_ONLY),
+}
+
+FETCHED_PAGES = {BASE_URL + tag for tag in
+                 ("tag_groups", "tag_group:body_parts", "tag_group:hair", "tag_group:attire",
+                  "list_of_animal_ears", "tag_group:hair_styles")}
+
+
+def replay_scraper(**overrides) -> ScalableHierarchyScraper:
+    config = dict(fetch_backend='replay', replay_dir=str(CORPUS_DIR), rate_limit=0.0, max_retries=0)
+    config.update(overrides)
+    return ScalableHierarchyScraper(ScrapingConfig(**config))
+
+
+def crawl(**overrides):
+    scraper = replay_scraper(**overrides)
+    try:
+        return scraper, scraper.scrape_complete_hierarchy_scalable(START_URL)
+    finally:
+        scraper.close()
+
+
+def item_summary(result):
+    return {name: (item['path'], NodeType(item['classification'])) for name, item in result['items'].items()}
+
+
+@pytest.mark.parametrize('parser_backend', available_backends())
+def test_replay_crawl_extracts_items(parser_backend):
+    scraper, result = crawl(parser_backend=parser_backend)
+    assert item_summary(result) == EXPECTED_ITEMS
+    assert result['ignored_elements'] == ["See also:Tag group:Dress"]
+    assert scraper.failed_targets == {}
+
+
+def test_replay_crawl_follows_only_tag_groups_and_lists():
+    scraper, result = crawl()
+    # 除外セクション（See also）のグループと無視要素のリンクは取得しない。Tag group:Hairは1回だけ
+    assert scraper.visited_urls == FETCHED_PAGES
+    assert scraper.metrics.summary()['parse_seconds']['count'] == len(FETCHED_PAGES)
+    followed = {name for name, item in result['items'].items() if item['should_follow']}
+    assert followed == {"Tag group:Body parts", "Tag group:Hair", "Tag group:Attire", "List of animal ears",
+                        "Tag group:Copyrights", "Tag group:Hair styles"}
+
+
+def test_concurrent_crawl_matches_sequential():
+    _, sequential = crawl()
+    scraper, concurrent = crawl(concurrency=4)
+    assert concurrent['items'] == sequential['items']
+    assert scraper.visited_urls == FETCHED_PAGES
+
+
+def test_resume_after_interruption_matches_full_run(tmp_path):
+    _, full = crawl()
+    journal = str(tmp_path / "journal.jsonl")
+
+    scraper = replay_scraper(journal_path=journal, checkpoint_interval=2)
+    fetch_page_result = scraper.fetch_page_result
+    calls = []
+
+    def interrupted(url, base_path, depth, item=None):
+        calls.append(url)
+        if len(calls) == 4:
+            raise KeyboardInterrupt
+        return fetch_page_result(url, base_path, depth, item)
+
+    scraper.fetch_page_result = interrupted
+    with pytest.raises(KeyboardInterrupt):
+        scraper.scrape_complete_hierarchy_scalable(START_URL)
+    scraper.close()
+
+    resumed_scraper, resumed = crawl(journal_path=journal, resume=True)
+    assert resumed['items'] == full['items']
+    # 中断時に処理中だったページから再開し、完了済みのページは取得し直さない
+    assert resumed_scraper.metrics.summary()['parse_seconds']['count'] == len(FETCHED_PAGES) - 3
+
+
+def test_resume_retries_failed_page(tmp_path):
+    _, full = crawl()
+    # Tag group:Hair stylesのページが欠けたコーパス
+    partial = tmp_path / "partial"
+    partial.mkdir()
+    (partial / "pages").symlink_to(CORPUS_DIR / "pages")
+    with open(CORPUS_DIR / "manifest.jsonl", encoding='utf-8') as src, \
+            open(partial / "manifest.jsonl", 'w', encoding='utf-8') as dst:
+        dst.writelines(line for line in src if "tag_group:hair_styles" not in line)
+    journal = str(tmp_path / "journal.jsonl")
+
+    failed_scraper, failed = crawl(replay_dir=str(partial), journal_path=journal)
+    assert list(failed_scraper.failed_targets) == [BASE_URL + "tag_group:hair_styles"]
+    assert "ponytail" not in failed['items']
+
+    resumed_scraper, resumed = crawl(journal_path=journal, resume=True)
+    assert resumed['items'] == full['items']
+    assert resumed_scraper.metrics.summary()['parse_seconds']['count'] == 1
+    assert resumed_scraper.failed_targets == {}
+
+
+def test_snapshot_rebuild_matches_crawl(tmp_path):
+    snapshot_dir = str(tmp_path / "snapshots")
+    _, crawled = crawl(snapshot_dir=snapshot_dir)
+
+    rebuilder = replay_scraper(snapshot_dir=snapshot_dir)
+    try:
+        rebuilt = rebuilder.rebuild_from_snapshots(workers=1)
+    finally:
+        rebuilder.close()
+    assert rebuilt['items'] == crawled['items']
+
+
+def test_incremental_crawl_reuses_unchanged_pages(tmp_path):
+    page_index = str(tmp_path / "pages.jsonl")
+    _, first = crawl(page_index_path=page_index)
+
+    scraper, second = crawl(page_index_path=page_index, incremental=True)
+    assert second['items'] == first['items']
+    assert scraper.reused_pages == len(FETCHED_PAGES)
+    assert scraper.changed_pages == []
+
+
+def test_concurrent_incremental_crawl_counts_reused_pages(tmp_path):
+    page_index = str(tmp_path / "pages.jsonl")
+    first_scraper, first = crawl(page_index_path=page_index, concurrency=4)
+    assert sorted(first_scraper.changed_pages) == sorted(FETCHED_PAGES)
+
+    scraper, second = crawl(page_index_path=page_index, incremental=True, concurrency=4)
+    assert second['items'] == first['items']
+    assert scraper.reused_pages == len(FETCHED_PAGES)
+    assert scraper.changed_pages == []
+
+
+def test_list_deeper_than_recursion_limit(monkeypatch):
+    """リストの深さがPythonの再帰上限を超えても、各アイテムを1回ずつ抽出する"""
+    depth = sys.getrecursionlimit() + 100
+    opening, closing = [], []
+    for i in range(depth):
+        if i % 2 == 0:  # 子のul（リンクあり）
+            opening.append(f'<ul><li><a href="/wiki_pages/tag_{i}">tag {i}</a>')
+            closing.append('</li></ul>')
+        else:           # 兄弟のul（リンクなし）
+            opening.append(f'<ul><li>tag {i}</li>')
+            closing.append('</ul>')
+    html = '<div id="wiki-page-body"><h5>Deep</h5>' + ''.join(opening) + ''.join(reversed(closing)) + '</div>'
+    soup = BeautifulSoup(html, 'html.parser')
+
+    scraper = replay_scraper(max_depth=depth)
+    added = Counter()
+    add_item = scraper._add_item
+    monkeypatch.setattr(scraper, '_add_item', lambda result, name, item: (added.update([name]),
+                                                                            add_item(result, name, item)))
+    result = scraper.extract_hierarchy_from_page(soup, ["Tag group:Deep"])
+
+    names = [f"tag {i}" for i in range(depth)]
+    assert added == Counter(["Deep"] + names)  # 見出しもアイテムになる
+    assert list(result['items']) == ["Deep"] + names
+    assert result['items'][names[-1]]['path'] == ["Tag group:Deep", "Deep"] + names
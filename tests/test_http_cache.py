@@ -0,0 +1,115 @@
+"""永続レスポンスキャッシュ（TTL・条件付き再検証・オフライン）をリプレイコーパスで確認する"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from fetch_backends import FetchResult
+from http_cache import ResponseCache
+from scalable_hierarchy_scraper import ScalableHierarchyScraper, ScrapingConfig
+
+CORPUS_DIR = Path(__file__).parent / "fixtures" / "tag_groups"
+START_URL = "https://danbooru.donmai.us/posts?tags=tag_groups"
+
+
+class CountingFetcher:
+    """取得バックエンドをラップし、送った条件付きヘッダと応答ステータスを記録する"""
+
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+        self.name = fetcher.name
+        self.requests = []
+
+    def fetch(self, url, headers=None):
+        response = self.fetcher.fetch(url, headers=headers)
+        self.requests.append((dict(headers or {}), response.status))
+        return response
+
+    def close(self):
+        self.fetcher.close()
+
+
+def cached_scraper(cache_dir, **overrides) -> ScalableHierarchyScraper:
+    config = dict(fetch_backend='replay', replay_dir=str(CORPUS_DIR), rate_limit=0.0, max_retries=0,
+                  cache_dir=str(cache_dir))
+    config.update(overrides)
+    scraper = ScalableHierarchyScraper(ScrapingConfig(**config))
+    scraper.fetcher = CountingFetcher(scraper.fetcher)
+    return scraper
+
+
+def test_fresh_entry_is_used_without_request(tmp_path):
+    scraper = cached_scraper(tmp_path)
+    first = scraper._fetch(START_URL)
+    second = scraper._fetch(START_URL)
+
+    assert not first.from_cache and second.from_cache
+    assert second.body == first.body
+    assert [status for _, status in scraper.fetcher.requests] == [200]
+    assert scraper.metrics.cache == {'hit': 1, 'revalidated': 0, 'miss': 1}
+
+
+def test_expired_entry_is_revalidated_with_etag(tmp_path):
+    cached_scraper(tmp_path)._fetch(START_URL)
+    entry_before = ResponseCache(str(tmp_path)).lookup(START_URL)
+
+    scraper = cached_scraper(tmp_path, cache_ttl=0.0)
+    response = scraper._fetch(START_URL)
+
+    # リプレイは本文のsha256をETagとして返し、一致すれば304で本文を送らない
+    (headers, status), = scraper.fetcher.requests
+    assert headers == {'If-None-Match': entry_before.etag}
+    assert status == 304
+    assert response.ok and response.from_cache
+    assert response.body == ResponseCache(str(tmp_path)).load(entry_before).body
+    assert scraper.metrics.cache['revalidated'] == 1
+    assert ResponseCache(str(tmp_path)).lookup(START_URL).fetched_at >= entry_before.fetched_at
+
+
+def test_changed_page_replaces_cached_body(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=0.0)
+    cache.store(START_URL, FetchResult(url=START_URL, status=200, body=b"old", headers={'etag': '"old"'}))
+
+    scraper = cached_scraper(tmp_path, cache_ttl=0.0)
+    response = scraper._fetch(START_URL)
+    (headers, status), = scraper.fetcher.requests
+    assert headers == {'If-None-Match': '"old"'}
+    assert status == 200 and not response.from_cache
+    assert cache.load(cache.lookup(START_URL)).body == response.body != b"old"
+
+
+def test_offline_mode_uses_cache_or_reports_miss(tmp_path):
+    cached_scraper(tmp_path)._fetch(START_URL)
+
+    # オフラインではTTL切れでも再検証しない
+    scraper = cached_scraper(tmp_path, offline=True, cache_ttl=0.0)
+    assert scraper._fetch(START_URL).from_cache
+    missing = scraper._fetch(START_URL + "_missing")
+    assert missing.error == 'offline_miss' and not missing.ok
+    assert scraper.fetcher.requests == []
+    assert scraper.metrics.cache == {'hit': 1, 'revalidated': 0, 'miss': 1}
+
+
+def test_offline_mode_requires_cache_dir():
+    with pytest.raises(ValueError):
+        ScalableHierarchyScraper(ScrapingConfig(fetch_backend='replay', replay_dir=str(CORPUS_DIR), offline=True))
+
+
+def test_identical_bodies_share_storage(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    for url in ("https://a.example/1", "https://a.example/2"):
+        cache.store(url, FetchResult(url=url, status=200, body=b"same body"))
+    assert len(list(cache.body_dir.rglob("*.gz"))) == 1
+    assert cache.load(cache.lookup("https://a.example/2")).url == "https://a.example/2"
+
+
+def test_corrupt_or_orphaned_entries_are_ignored(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    entry = cache.store(START_URL, FetchResult(url=START_URL, status=200, body=b"body"))
+    cache._index_path("broken").write_text("{not json", encoding='utf-8')
+    assert cache.lookup("broken") is None
+
+    cache._body_path(entry.body_hash).unlink()
+    assert cache.lookup(START_URL) is None
+    assert json.loads(cache._index_path(START_URL).read_text(encoding='utf-8'))['body_hash'] == entry.body_hash
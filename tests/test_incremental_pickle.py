@@ -0,0 +1,121 @@
+"""チャンク処理（incremental_pickle）"""
+
+import json
+import pickle
+import sys
+
+import polars as pl
+import pytest
+
+import incremental_pickle
+from arrow_dataset import ACTIVE_FILTER, created_datetime_expr, to_polars, with_score_per_hour
+from chunk_store import CHUNK_STORE_DIR, MANIFEST_NAME, ChunkRecord, chunk_paths, scan_chunks
+from incremental_pickle import COLUMNS_TO_KEEP, STORE_COLUMNS, IncrementalPickler, process_chunk
+
+
+@pytest.mark.parametrize('action', ['process', 'full'])
+def test_main_exits_with_error_when_processing_fails(monkeypatch, tmp_path, action):
+    combined = []
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(IncrementalPickler, 'run_incremental_processing', lambda self, workers, verify: False)
+    monkeypatch.setattr(IncrementalPickler, 'combine_chunks_and_extract_top', lambda self: combined.append(True))
+    monkeypatch.setattr(sys, 'argv', ['incremental_pickle.py', action])
+
+    with pytest.raises(SystemExit) as excinfo:
+        incremental_pickle.main()
+    assert excinfo.value.code == 1
+    assert combined == []
+
+
+@pytest.fixture
+def workdir(monkeypatch, tmp_path):
+    # ストア（data/temp_chunks）と結果ファイルはカレントディレクトリからの相対パス
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    return tmp_path
+
+
+@pytest.fixture(scope='module')
+def expected_store(posts) -> pl.DataFrame:
+    return (to_polars(posts).filter(ACTIVE_FILTER).select(COLUMNS_TO_KEEP)
+            .with_columns(created_datetime_expr()).sort('id'))
+
+
+def store_frame() -> pl.DataFrame:
+    return scan_chunks(columns=STORE_COLUMNS).collect().sort('id')
+
+
+def count_processed(monkeypatch, fail_chunk=None):
+    """process_chunk()の呼び出しを記録する（fail_chunkは例外にする）"""
+    processed = []
+
+    def recording(table, chunk_id, start_idx, end_idx, store_dir=CHUNK_STORE_DIR):
+        processed.append(chunk_id)
+        if chunk_id == fail_chunk:
+            raise OSError("disk full")
+        return process_chunk(table, chunk_id, start_idx, end_idx, store_dir)
+
+    monkeypatch.setattr(incremental_pickle, 'process_chunk', recording)
+    return processed
+
+
+def test_processing_writes_every_active_row(workdir, dataset_dir, expected_store):
+    pickler = IncrementalPickler(str(dataset_dir), chunk_size=1000)
+    assert pickler.run_incremental_processing()
+    assert store_frame().equals(expected_store)
+
+    source = json.loads((workdir / CHUNK_STORE_DIR / MANIFEST_NAME).read_text(encoding='utf-8'))
+    records = [ChunkRecord(**record) for record in source['chunks']]
+    assert len(records) == len(pickler.chunk_ranges()) == 6
+    assert all(record.status == 'done' for record in records)
+    assert sum(record.active_rows for record in records) == len(expected_store)
+
+
+def test_rerun_processes_only_failed_chunk(monkeypatch, workdir, dataset_dir, expected_store):
+    pickler = IncrementalPickler(str(dataset_dir), chunk_size=1000)
+    processed = count_processed(monkeypatch, fail_chunk=2)
+    assert not pickler.run_incremental_processing()
+    assert processed == [0, 1, 2, 3, 4, 5]
+
+    processed = count_processed(monkeypatch)
+    assert IncrementalPickler(str(dataset_dir), chunk_size=1000).run_incremental_processing()
+    assert processed == [2]
+    assert store_frame().equals(expected_store)
+
+
+def test_missing_chunk_file_is_reprocessed(monkeypatch, workdir, dataset_dir, expected_store):
+    assert IncrementalPickler(str(dataset_dir), chunk_size=1000).run_incremental_processing()
+    chunk_paths(3)[0].unlink()
+
+    processed = count_processed(monkeypatch)
+    assert IncrementalPickler(str(dataset_dir), chunk_size=1000).run_incremental_processing()
+    assert processed == [3]
+    assert store_frame().equals(expected_store)
+
+
+def test_changed_chunk_size_rebuilds_store(monkeypatch, workdir, dataset_dir, expected_store):
+    assert IncrementalPickler(str(dataset_dir), chunk_size=1000).run_incremental_processing()
+
+    processed = count_processed(monkeypatch)
+    assert IncrementalPickler(str(dataset_dir), chunk_size=2500).run_incremental_processing()
+    assert processed == [0, 1, 2]
+    assert store_frame().equals(expected_store)
+
+
+def test_parallel_processing_matches_sequential(workdir, dataset_dir, expected_store):
+    assert IncrementalPickler(str(dataset_dir), chunk_size=1000).run_incremental_processing(workers=2)
+    assert store_frame().equals(expected_store)
+
+
+def test_combine_matches_global_top_k(workdir, dataset_dir, expected_store):
+    # ファイル数より小さいバッチで、前のバッチの最小値による足切りも通す
+    pickler = IncrementalPickler(str(dataset_dir), chunk_size=1000, combine_batch_size=4)
+    assert pickler.run_incremental_processing()
+    top_df = pickler.combine_chunks_and_extract_top(top_n=50)
+
+    min_date = expected_store['created_datetime'].min()
+    expected = with_score_per_hour(expected_store.lazy(), min_date).collect().top_k(50, by='score_per_hour')
+    assert top_df['score_per_hour'].to_list() == sorted(expected['score_per_hour'].to_list(), reverse=True)
+    assert set(top_df['id']) == set(expected['id'])
+    with open(workdir / "data" / "danbooru_tags_top20k.pkl", 'rb') as f:
+        assert pickle.load(f).equals(top_df)
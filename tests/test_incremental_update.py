@@ -0,0 +1,76 @@
+"""差分更新のページ索引と、前回結果との構造差分"""
+
+import json
+
+from incremental_update import PageIndex, PageRecord, diff_items, load_previous_items
+
+
+def _item(path, classification='final_tag_only'):
+    return {'name': path[-1], 'path': path, 'classification': classification}
+
+
+BEFORE = {
+    'long hair': _item(['Hair', 'Hair length', 'long hair']),
+    'short hair': _item(['Hair', 'Hair length', 'short hair']),
+    'ponytail': _item(['Hair', 'ponytail']),
+    'blonde hair': _item(['Hair', 'Hair color', 'blonde hair']),
+    'animal ears': _item(['Body parts', 'animal ears']),
+    'hat': _item(['Attire', 'hat']),
+}
+AFTER = {
+    'long hair': _item(['Hair', 'Hair length', 'long hair']),                        # 変更なし
+    'short hair': _item(['Hair', 'Hair length', 'short hair']),                      # 変更なし
+    'ponytail': _item(['Hair', 'Hair styles', 'ponytail']),                          # 移動
+    'blonde hair': _item(['Hair', 'Hair color', 'blonde hair'], 'tag_and_tag_group'),  # 再分類
+    'animal ears': _item(['Head', 'animal ears'], 'tag_and_tag_group'),             # 移動 + 再分類
+    'twintails': _item(['Hair', 'Hair styles', 'twintails']),                        # 追加
+    # hatは削除
+}
+
+
+def test_diff_items_classifies_every_change():
+    diff = diff_items(BEFORE, AFTER)
+    assert diff['summary'] == {'added': 1, 'removed': 1, 'moved': 2, 'reclassified': 2, 'unchanged': 2}
+    assert diff['added'] == {'twintails': AFTER['twintails']}
+    assert diff['removed'] == {'hat': BEFORE['hat']}
+    assert diff['moved'] == {
+        'animal ears': {'old_path': ['Body parts', 'animal ears'], 'new_path': ['Head', 'animal ears']},
+        'ponytail': {'old_path': ['Hair', 'ponytail'], 'new_path': ['Hair', 'Hair styles', 'ponytail']},
+    }
+    assert diff['reclassified'] == {
+        'animal ears': {'old': 'final_tag_only', 'new': 'tag_and_tag_group'},
+        'blonde hair': {'old': 'final_tag_only', 'new': 'tag_and_tag_group'},
+    }
+    # 出力は名前順
+    assert list(diff['moved']) == sorted(diff['moved'])
+
+
+def test_diff_items_of_identical_and_empty_results():
+    assert diff_items(BEFORE, BEFORE)['summary'] == {
+        'added': 0, 'removed': 0, 'moved': 0, 'reclassified': 0, 'unchanged': len(BEFORE)}
+    assert diff_items({}, AFTER)['summary']['added'] == len(AFTER)
+    assert diff_items(BEFORE, {})['summary'] == {
+        'added': 0, 'removed': len(BEFORE), 'moved': 0, 'reclassified': 0, 'unchanged': 0}
+
+
+def test_page_index_round_trip_ignores_truncated_line(tmp_path):
+    index = PageIndex(str(tmp_path / "pages.jsonl"))
+    assert index.load() == {}
+    records = {
+        key: PageRecord(key, key, depth, ['Hair'], f"{depth:064x}", {'items': {}, 'headings': []})
+        for depth, key in enumerate(["https://a.example/1", "https://a.example/2"])
+    }
+    index.save(records)
+    assert index.load() == records
+
+    with open(index.path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "https://a.example/3", "url"')
+    assert index.load() == records
+
+
+def test_load_previous_items_from_json_result(tmp_path):
+    output_base = str(tmp_path / "scalable_scraping_result")
+    assert load_previous_items(output_base) is None
+    with open(output_base + ".json", 'w', encoding='utf-8') as f:
+        json.dump({'raw_hierarchy_data': {'items': BEFORE}}, f)
+    assert load_previous_items(output_base) == BEFORE
@@ -0,0 +1,88 @@
+"""normalize_data（小文字化・重複解決）と統合処理"""
+
+import pytest
+
+from benchmark_normalize import synthetic_hierarchy
+from scalable_hierarchy_scraper import NodeType, ScalableHierarchyScraper, ScrapingConfig
+
+
+@pytest.fixture(scope='module')
+def scraper():
+    return ScalableHierarchyScraper(ScrapingConfig(fetch_backend='curl'))
+
+
+def _item(name, path, classification=NodeType.FINAL_TAG_ONLY.value):
+    return {
+        'name': name, 'url': f"https://danbooru.donmai.us/wiki_pages/{name.lower()}", 'path': path,
+        'parent': path[-2], 'depth': len(path), 'has_nested_list': False,
+        'classification': classification, 'should_follow': False,
+    }
+
+
+def _hierarchy(*items):
+    return {'headings': [], 'items': {item['name']: item for item in items},
+            'excluded_sections': [], 'ignored_elements': []}
+
+
+def test_duplicate_resolved_by_priority(scraper):
+    result = scraper.normalize_data(_hierarchy(
+        _item('Long_Hair', ['Hair', 'Long_Hair']),
+        _item('long_hair', ['Hair', 'Length', 'Extra', 'long_hair'], NodeType.TAG_AND_TAG_GROUP.value),
+    ))
+    kept = result['items']['long_hair']
+    assert kept['classification'] == NodeType.TAG_AND_TAG_GROUP.value
+    assert kept['path'] == ['hair', 'length', 'extra', 'long_hair']
+    assert result['removed_duplicates'] == [{
+        'duplicate': 'long_hair',
+        'kept_classification': NodeType.TAG_AND_TAG_GROUP.value,
+        'kept_path': 'hair → length → extra → long_hair',
+        'discarded_classification': NodeType.FINAL_TAG_ONLY.value,
+        'discarded_path': 'hair → long_hair',
+    }]
+    assert result['normalization_log'] == [{'action': 'lowercase', 'original': 'Long_Hair', 'normalized': 'long_hair'}]
+
+
+def test_duplicate_with_same_priority_keeps_shorter_path(scraper):
+    result = scraper.normalize_data(_hierarchy(
+        _item('Ribbon', ['Attire', 'Accessories', 'Ribbon']),
+        _item('ribbon', ['Attire', 'ribbon']),
+    ))
+    assert result['items']['ribbon']['path'] == ['attire', 'ribbon']
+
+
+def test_consolidation(scraper):
+    result = scraper.normalize_data(_hierarchy(
+        _item('breasts', ['Body', 'breasts']),
+        _item('tag group:breasts tags', ['Body', 'Chest', 'tag group:breasts tags'],
+              NodeType.TRADITIONAL_TAG_GROUP.value),
+        _item('hair', ['Body', 'Head', 'Top', 'hair']),
+        _item('Tag group:Hair', ['Body', 'Tag group:Hair'], NodeType.TRADITIONAL_TAG_GROUP.value),
+    ))
+    items = result['items']
+    assert set(items) == {'breasts', 'hair'}
+    # base_item_preferred: ベース項目のパスの方が長い → ベース項目を残す
+    assert items['hair']['path'] == ['body', 'head', 'top', 'hair']
+    # tag_group_more_detailed: tag group側を残してベース名に変える
+    assert items['breasts']['path'] == ['body', 'chest', 'tag group:breasts tags']
+    assert items['breasts']['classification'] == NodeType.TRADITIONAL_TAG_GROUP.value
+
+
+def test_synthetic_hierarchy_exercises_all_branches(scraper):
+    hierarchy = synthetic_hierarchy(5000)
+    assert {item['classification'] for item in hierarchy['items'].values()} == {t.value for t in NodeType}
+
+    result = scraper.normalize_data(hierarchy)
+    removed = result['removed_duplicates']
+    pairs = [(record['kept_classification'], record['discarded_classification']) for record in removed]
+    assert any(kept != discarded for kept, discarded in pairs)
+    assert any(kept == discarded for kept, discarded in pairs)
+    for kept, discarded in pairs:
+        assert scraper._classify_priority(kept) >= scraper._classify_priority(discarded)
+
+    items = result['items']
+    assert len(items) < len(hierarchy['items']) - len(removed)
+    assert all(name == name.lower() for name in items)
+    for name in items:
+        if name.startswith('tag group:'):
+            base = name[len('tag group:'):]
+            assert base not in items and base.removesuffix(' tags') not in items
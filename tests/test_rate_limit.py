@@ -0,0 +1,215 @@
+"""レート制限（RateLimiter・ホスト単位のトークンバケット）とRetry-Afterに従う再試行"""
+
+from email.utils import formatdate
+from pathlib import Path
+
+import pytest
+
+import scalable_hierarchy_scraper
+from fetch_backends import FetchResult
+from scalable_hierarchy_scraper import (RateLimiter, ScalableHierarchyScraper, ScrapingConfig, TokenBucketLimiter,
+                                        parse_retry_after)
+
+HOST_A = "https://a.example/page"
+HOST_B = "https://b.example/page"
+CORPUS_DIR = Path(__file__).parent / "fixtures" / "tag_groups"
+START_URL = "https://danbooru.donmai.us/posts?tags=tag_groups"
+
+
+class FakeClock:
+    """timeモジュールの代わり（sleepで時刻を進める）"""
+
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+        self.slept = []
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(scalable_hierarchy_scraper, 'time', clock)
+    return clock
+
+
+def test_token_bucket_allows_burst_then_paces_at_rate(clock):
+    limiter = TokenBucketLimiter(rate=2.0, burst=3)
+    assert [limiter.wait(HOST_A) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert [limiter.wait(HOST_A) for _ in range(3)] == [0.5, 0.5, 0.5]
+    assert clock.slept == [0.5, 0.5, 0.5]
+
+
+def test_token_bucket_refills_up_to_burst(clock):
+    limiter = TokenBucketLimiter(rate=2.0, burst=3)
+    for _ in range(3):
+        limiter.wait(HOST_A)
+    clock.now += 1.0  # 2トークン補充
+    assert [limiter.wait(HOST_A) for _ in range(3)] == [0.0, 0.0, 0.5]
+    clock.now += 60.0  # 長く空いてもburstまでしか溜まらない
+    assert [limiter.wait(HOST_A) for _ in range(4)] == [0.0, 0.0, 0.0, 0.5]
+
+
+def test_token_bucket_isolates_hosts(clock):
+    limiter = TokenBucketLimiter(rate=1.0, burst=1)
+    assert limiter.wait(HOST_A) == 0.0
+    assert limiter.wait(HOST_B) == 0.0
+    assert limiter.wait(HOST_A) == 1.0
+
+    limiter.on_throttle(HOST_A, 10.0)
+    assert limiter.host_rate(HOST_A) == 0.5
+    assert limiter.host_rate(HOST_B) == 1.0
+    assert limiter.wait(HOST_A) == 10.0
+    assert limiter.wait(HOST_B) == 0.0
+
+
+def test_token_bucket_recovers_rate_additively(clock):
+    limiter = TokenBucketLimiter(rate=1.0, burst=1, increase_step=0.25)
+    limiter.on_throttle(HOST_A, 0.0)
+    limiter.on_throttle(HOST_A, 0.0)
+    assert limiter.host_rate(HOST_A) == 0.25
+    rates = []
+    for _ in range(4):
+        limiter.on_success(HOST_A)
+        rates.append(limiter.host_rate(HOST_A))
+    assert rates == [0.5, 0.75, 1.0, 1.0]
+
+
+def test_token_bucket_unlimited_rate_only_honours_defer(clock):
+    limiter = TokenBucketLimiter(rate=0.0)
+    assert [limiter.wait(HOST_A) for _ in range(5)] == [0.0] * 5
+    limiter.defer(HOST_A, 3.0)
+    assert limiter.wait(HOST_A) == 3.0
+    assert limiter.wait(HOST_B) == 0.0
+
+
+class ScriptedFetcher:
+    """決められたステータスを順に返し、尽きたら元の取得バックエンド（リプレイ）に任せる"""
+
+    def __init__(self, fetcher, responses):
+        self.fetcher = fetcher
+        self.name = fetcher.name
+        self.responses = list(responses)
+        self.calls = 0
+
+    def fetch(self, url, headers=None):
+        self.calls += 1
+        if not self.responses:
+            return self.fetcher.fetch(url, headers=headers)
+        status, response_headers = self.responses.pop(0)
+        return FetchResult(url=url, status=status, headers=response_headers, error='http', message=f"HTTP {status}")
+
+    def close(self):
+        self.fetcher.close()
+
+
+def scripted_scraper(responses, **overrides) -> ScalableHierarchyScraper:
+    config = dict(fetch_backend='replay', replay_dir=str(CORPUS_DIR), rate_limit=0.0, max_retries=4)
+    config.update(overrides)
+    scraper = ScalableHierarchyScraper(ScrapingConfig(**config))
+    scraper.fetcher = ScriptedFetcher(scraper.fetcher, responses)
+    return scraper
+
+
+@pytest.mark.parametrize('value, expected', [
+    ("120", 120.0),
+    (" 5 ", 5.0),
+    ("0", 0.0),
+    (None, None),
+    ("", None),
+    ("soon", None),
+    ("-5", None),
+])
+def test_parse_retry_after_seconds(clock, value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date(clock):
+    assert parse_retry_after(formatdate(clock.now + 30, usegmt=True)) == 30.0
+    # 過去の日付は待たない
+    assert parse_retry_after(formatdate(clock.now - 30, usegmt=True)) == 0.0
+    assert parse_retry_after("Wed, 99 Foo 2024 00:00:00 GMT") is None
+
+
+def test_rate_limiter_backs_off_multiplicatively(clock):
+    limiter = RateLimiter(interval=1.0, max_interval=5.0)
+    intervals = []
+    for _ in range(4):
+        limiter.on_throttle(0.0)
+        intervals.append(limiter.interval)
+    assert intervals == [2.0, 4.0, 5.0, 5.0]
+
+    # 間隔0（無制限）からのスロットリングは0.5秒を基準に倍にする
+    unlimited = RateLimiter(interval=0.0)
+    unlimited.on_throttle(0.0)
+    assert unlimited.interval == 1.0
+
+
+def test_rate_limiter_recovers_additively(clock):
+    limiter = RateLimiter(interval=1.0, increase_step=0.25)
+    limiter.on_throttle(0.0)
+    limiter.on_throttle(0.0)
+    intervals = []
+    for _ in range(4):
+        limiter.on_success()
+        intervals.append(limiter.interval)
+    # 1/4 → 1/2 → 3/4 → 1 req/s で設定値に戻り、それ以上は上げない
+    assert intervals == [2.0, pytest.approx(4 / 3), 1.0, 1.0]
+
+
+def test_rate_limiter_honours_defer_and_interval(clock):
+    limiter = RateLimiter(interval=1.0)
+    assert limiter.wait_if_needed() == 0.0
+    assert limiter.wait_if_needed() == 1.0
+    limiter.on_throttle(7.0)
+    assert limiter.wait_if_needed() == 7.0
+    assert limiter.wait_if_needed() == 2.0
+
+    fixed = RateLimiter(interval=1.0, adaptive=False)
+    fixed.on_throttle(3.0)
+    assert fixed.interval == 1.0
+    fixed.on_success()
+    assert fixed.interval == 1.0
+
+
+def test_retry_follows_retry_after_then_succeeds(clock):
+    scraper = scripted_scraper([(429, {'retry-after': '3'}), (503, {}), (500, {})])
+    response = scraper._fetch(START_URL)
+
+    assert response.ok
+    assert scraper.fetcher.calls == 4
+    assert clock.slept[0] == 3.0
+    assert scraper.metrics.retries == 3
+    assert scraper.metrics.summary()['responses'] == {'200': 1, '429': 1, '500': 1, '503': 1}
+    # 429/503で2回倍にし、500では間隔を変えずに待つだけ。成功で少し戻る
+    assert scraper.rate_limiter.interval == pytest.approx(1.0 / (1.0 / 2.0 + 0.05))
+
+
+def test_retry_after_is_capped_by_backoff_max(clock):
+    scraper = scripted_scraper([(429, {'retry-after': '3600'})], backoff_max=10.0)
+    assert scraper._fetch(START_URL).ok
+    assert clock.slept == [10.0]
+
+
+def test_retries_are_exhausted(clock):
+    scraper = scripted_scraper([(503, {'retry-after': '1'})] * 10, max_retries=2)
+    response = scraper._fetch(START_URL)
+
+    assert response.status == 503 and not response.ok
+    assert scraper.fetcher.calls == 3
+    assert scraper.metrics.retries == 2
+
+
+def test_client_errors_are_not_retried(clock):
+    scraper = scripted_scraper([(404, {})])
+    assert scraper._fetch(START_URL).status == 404
+    assert scraper.fetcher.calls == 1
+    assert scraper.metrics.retries == 0
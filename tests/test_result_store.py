@@ -0,0 +1,125 @@
+"""表形式（JSON Lines / Arrow）の結果の保存・読み込み"""
+
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+import scalable_hierarchy_scraper
+from result_store import (ITEM_COLUMNS, has_table_result, iter_result_rows, load_result_items, metadata_path,
+                          read_result_metadata, save_result_tables, scan_items_with_paths)
+
+CORPUS_DIR = Path(__file__).parent / "fixtures" / "tag_groups"
+
+
+def _items(count: int, seed: int = 0):
+    """親パスが入り組んだアイテム（ノードIDの順とアイテムの順が一致しない）"""
+    rng = random.Random(seed)
+    groups = [f"Tag group:G{i}" for i in range(20)]
+    items = {}
+    for i in range(count):
+        path = [rng.choice(groups)] + [f"section {rng.randrange(5)}"] * rng.randrange(3)
+        name = f"tag_{i}"
+        items[name] = {
+            'name': name,
+            'url': f"https://danbooru.donmai.us/wiki_pages/{name}",
+            'path': path + [name],
+            'parent': path[-1],
+            'depth': len(path) + 1,
+            'has_nested_list': i % 7 == 0,
+            'classification': 'final_tag_only',
+            'should_follow': False,
+        }
+    return dict(rng.sample(list(items.items()), len(items)))
+
+
+def _result(items):
+    small = {'headings': [], 'excluded_sections': [], 'ignored_elements': []}
+    return {
+        'metadata': {'start_url': 'https://danbooru.donmai.us/wiki_pages/tag_groups'},
+        'raw_hierarchy_data': {'items': items, **small},
+        'normalized_data': {
+            'items': items,
+            'normalization_log': [{'action': 'lowercase', 'original': 'Tag_0', 'normalized': 'tag_0'}],
+            'removed_duplicates': [{'duplicate': 'tag_1', 'kept_classification': 'final_tag_only', 'kept_path': 'a → tag_1',
+                                    'discarded_classification': 'final_tag_only', 'discarded_path': 'a → b → tag_1'}],
+            **small,
+        },
+    }
+
+
+@pytest.mark.parametrize('output_format', ['jsonl', 'arrow'])
+def test_round_trip(tmp_path, output_format):
+    items = _items(500)
+    base = str(tmp_path / "result")
+    save_result_tables(_result(items), base, output_format, batch_size=64)
+
+    assert load_result_items(base) == {name: {c: item[c] for c in ITEM_COLUMNS} for name, item in items.items()}
+    normalized = _result(items)['normalized_data']
+    for table in ('normalization_log', 'removed_duplicates'):
+        assert list(iter_result_rows(base, table)) == normalized[table]
+
+
+@pytest.mark.parametrize('output_format', ['jsonl', 'arrow'])
+def test_scan_items_with_paths_keeps_item_order(tmp_path, output_format):
+    items = _items(5000)
+    base = str(tmp_path / "result")
+    save_result_tables(_result(items), base, output_format, batch_size=256)
+
+    scanned = scan_items_with_paths(base).collect()
+    assert scanned.columns == ITEM_COLUMNS
+    assert scanned.to_dicts() == list(iter_result_rows(base))
+
+    joined = scan_items_with_paths(base, separator=' > ').collect()
+    assert joined['name'].to_list() == list(items)
+    assert joined['path'].to_list() == [' > '.join(item['path']) for item in items.values()]
+
+
+def test_newer_layout_wins(tmp_path):
+    base = str(tmp_path / "result")
+    assert not has_table_result(base)
+    save_result_tables(_result(_items(10)), base)
+    assert has_table_result(base)
+
+    json_path = tmp_path / "result.json"
+    json_path.write_text("{}", encoding='utf-8')
+    meta_time = os.stat(metadata_path(base)).st_mtime
+    os.utime(json_path, (meta_time + 10, meta_time + 10))
+    assert not has_table_result(base)
+
+
+def _run_main(monkeypatch, tmp_path, *args):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'argv', [
+        'scalable_hierarchy_scraper.py', '--fetch-backend', 'replay', '--replay-dir', str(CORPUS_DIR),
+        '--rate-limit', '0', '--no-cache', '--no-snapshots', *args,
+    ])
+    return scalable_hierarchy_scraper.main()
+
+
+def test_main_writes_single_json_by_default(monkeypatch, tmp_path):
+    result = _run_main(monkeypatch, tmp_path)
+    output = tmp_path / "tmp" / "scalable_scraping_result.json"
+    assert not (tmp_path / "tmp" / "scalable_scraping_result.meta.json").exists()
+    with open(output, encoding='utf-8') as f:
+        saved = json.load(f)
+    assert set(saved) == {'metadata', 'raw_hierarchy_data', 'normalized_data', 'statistics'}
+    assert saved['normalized_data']['items'] == result['normalized_data']['items']
+    # ログは従来どおりレコードのリスト
+    log = saved['normalized_data']['normalization_log']
+    assert log and all(set(record) == {'action', 'original', 'normalized'} for record in log)
+    assert saved['statistics']['normalization_changes'] == len(log)
+    assert isinstance(saved['normalized_data']['removed_duplicates'], list)
+
+
+@pytest.mark.parametrize('output_format', ['jsonl', 'arrow'])
+def test_main_writes_tables_when_requested(monkeypatch, tmp_path, output_format):
+    result = _run_main(monkeypatch, tmp_path, '--output-format', output_format)
+    base = str(tmp_path / "tmp" / "scalable_scraping_result")
+    assert not os.path.exists(base + ".json")
+    assert read_result_metadata(base)['format'] == output_format
+    assert load_result_items(base) == {
+        name: {c: item[c] for c in ITEM_COLUMNS} for name, item in result['normalized_data']['items'].items()}
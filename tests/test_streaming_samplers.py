@@ -0,0 +1,92 @@
+"""ストリーミングサンプラー（一様・重み付き・層別）"""
+
+import polars as pl
+import pytest
+
+from arrow_dataset import ACTIVE_FILTER, to_polars
+from streaming_samplers import allocate, reservoir_sample, stratified_sample, weighted_sample
+
+COLUMNS = ['id', 'rating', 'score', 'created_at']
+
+
+@pytest.fixture(scope='module')
+def active(posts) -> pl.DataFrame:
+    return to_polars(posts).filter(ACTIVE_FILTER)
+
+
+def _rating_counts(df: pl.DataFrame):
+    return dict(df.group_by('rating').len().iter_rows())
+
+
+def test_allocate_proportional_sums_to_n():
+    quotas = allocate({'g': 600, 's': 250, 'q': 120, 'e': 30}, 100)
+    assert quotas == {'e': 3, 'g': 60, 'q': 12, 's': 25}
+    assert sum(allocate({'a': 1, 'b': 1, 'c': 1}, 2).values()) == 2
+
+
+def test_allocate_equal_redistributes_shortfall():
+    assert allocate({'a': 5, 'b': 1000}, 100, 'equal') == {'a': 5, 'b': 95}
+    quotas = allocate({'a': 5, 'b': 1000, 'c': 30, 'd': 31}, 100, 'equal')
+    assert quotas == {'a': 5, 'b': 34, 'c': 30, 'd': 31}
+
+
+def test_allocate_takes_everything_when_n_exceeds_total():
+    assert allocate({'a': 5, 'b': 7}, 100, 'equal') == {'a': 5, 'b': 7}
+    with pytest.raises(ValueError):
+        allocate({'a': 1}, 1, 'random')
+
+
+@pytest.mark.parametrize('sampler', [reservoir_sample, weighted_sample])
+def test_sample_is_active_and_distinct(posts, sampler):
+    df = sampler(posts, 500, COLUMNS, seed=1)
+    assert len(df) == 500
+    assert df['id'].n_unique() == 500
+    assert to_polars(posts).filter(ACTIVE_FILTER & pl.col('id').is_in(df['id'].implode()))['id'].len() == 500
+
+
+@pytest.mark.parametrize('sampler', [reservoir_sample, weighted_sample])
+def test_sample_is_batch_size_invariant(posts, sampler):
+    expected = sampler(posts, 300, COLUMNS, seed=3, batch_size=6000)
+    for batch_size in (61, 997):
+        assert sampler(posts, 300, COLUMNS, seed=3, batch_size=batch_size).equals(expected)
+
+
+def test_reservoir_prefix_is_smaller_sample(posts):
+    large = reservoir_sample(posts, 400, COLUMNS, seed=5)
+    small = reservoir_sample(posts, 100, COLUMNS, seed=5)
+    assert small.equals(large.head(100))
+
+
+def test_weighted_sample_prefers_heavy_rows(posts, active):
+    df = weighted_sample(posts, 500, COLUMNS, weight='score', seed=2)
+    assert df['score'].mean() > active['score'].mean()
+
+
+@pytest.mark.parametrize('allocation', ['proportional', 'equal'])
+def test_stratified_quotas_are_exact(posts, active, allocation):
+    n = 400
+    df = stratified_sample(posts, n, COLUMNS, by='rating', allocation=allocation, seed=4, batch_size=512)
+    assert len(df) == n
+    assert df['id'].n_unique() == n
+    assert _rating_counts(df) == allocate(_rating_counts(active), n, allocation)
+
+
+def test_stratified_equal_takes_whole_small_stratum(posts, active):
+    counts = _rating_counts(active)
+    n = 4 * counts['e'] + 100
+    df = stratified_sample(posts, n, COLUMNS, by='rating', allocation='equal', seed=4)
+    sampled = _rating_counts(df)
+    assert len(df) == n
+    assert sampled['e'] == counts['e']
+
+
+@pytest.mark.parametrize('by', ['rating', 'month'])
+def test_stratified_is_batch_size_invariant(posts, by):
+    expected = stratified_sample(posts, 250, COLUMNS, by=by, seed=6, batch_size=6000)
+    for batch_size in (61, 997):
+        assert stratified_sample(posts, 250, COLUMNS, by=by, seed=6, batch_size=batch_size).equals(expected)
+
+
+def test_stratified_sample_larger_than_data(posts, active):
+    df = stratified_sample(posts, len(active) + 10, COLUMNS, by='rating', seed=0)
+    assert sorted(df['id'].to_list()) == sorted(active['id'].to_list())
@@ -0,0 +1,148 @@
+"""wikiダンプ（DText）からの階層再構築"""
+
+import pickle
+from pathlib import Path
+
+import polars as pl
+import pytest
+
+from scalable_hierarchy_scraper import NodeType, ScalableHierarchyScraper, ScrapingConfig
+from wiki_dump import dtext_to_html, load_hierarchy_pages, render_inline
+
+CORPUS_DIR = Path(__file__).parent / "fixtures" / "tag_groups"
+START_URL = "https://danbooru.donmai.us/posts?tags=tag_groups"
+
+# tests/fixtures/tag_groupsと同じページをDTextで書いたもの（リンク表記はページごとに変えてある）
+WIKI_PAGES = {
+    "tag_groups": """
+h4. Visual characteristics
+* [[Tag group:Body parts]]
+** [[Tag group:Hair]]
+* [[tag_group:attire|Tag group:Attire]]
+
+h4#lists. Lists
+* [[List of animal ears]]
+
+h4. See also
+* [[Tag group:Copyrights]]
+""",
+    "Tag group:Body parts": """
+h5. Head
+* [[animal ears]]
+** [[cat ears]]
+** [[fox_ears|fox ears]]
+* [[Tag group:Hair]]
+
+h5. Torso
+* [[breasts]]
+** [[large breasts]]
+* [[navel]]
+""",
+    "tag_group:hair": """
+h5. Hair length
+* [[long hair]]
+* [[short hair]]
+
+h5. Hair color
+* [[blonde hair]]
+** [[light blonde hair]]
+* [[streaked hair]]
+
+h5. Styles
+* [[Tag group:Hair styles]]
+""",
+    "tag_group:attire": """
+h5. Headwear
+* [[hat]]
+* [b][[hair ribbon]][/b]
+
+h5. Dresses
+* [[dress]]
+* See also: [[Tag group:Dress]]
+""",
+    "list_of_animal_ears": """
+* [[cat ears]]
+* [[wolf ears (animal)|]]
+""",
+    "tag_group:hair_styles": """
+* [[ponytail]]
+* [[twintails]]
+* [[Tag group:Hair]]
+""",
+}
+
+
+@pytest.fixture
+def wiki_dump(tmp_path) -> str:
+    rows = [(title, body, False) for title, body in WIKI_PAGES.items()]
+    rows += [
+        ("tag_group:attire", "* [[deleted revision]]", True),  # 削除済みは読まない
+        ("tag_group:removed", "* [[removed tag]]", True),
+        ("long_hair", "A hairstyle.", False),                  # 階層ページ以外
+    ]
+    df = pl.DataFrame(rows, schema=['title', 'body', 'is_deleted'], orient='row')
+    path = tmp_path / "wiki.pkl"
+    with open(path, 'wb') as f:
+        pickle.dump(df, f)
+    return str(path)
+
+
+def scraper(**overrides) -> ScalableHierarchyScraper:
+    config = dict(fetch_backend='replay', replay_dir=str(CORPUS_DIR), rate_limit=0.0, max_retries=0)
+    config.update(overrides)
+    return ScalableHierarchyScraper(ScrapingConfig(**config))
+
+
+def item_summary(result):
+    return {name: (item['path'], NodeType(item['classification']), item['should_follow'])
+            for name, item in result['items'].items()}
+
+
+def test_headings_and_nested_lists():
+    html = dtext_to_html("h4#top. Colors\n* [[red]]\n** [[dark red]]\n*** [[maroon]]\n* [[blue]]\nh5. Other")
+    assert html == (
+        '<div id="wiki-page-body"><h4>Colors</h4>'
+        '<ul><li><a href="/wiki_pages/red">red</a></li>'
+        '<ul><li><a href="/wiki_pages/dark_red">dark red</a></li>'
+        '<ul><li><a href="/wiki_pages/maroon">maroon</a></li></ul></ul>'
+        '<li><a href="/wiki_pages/blue">blue</a></li></ul>'
+        '<h5>Other</h5></div>'
+    )
+
+
+@pytest.mark.parametrize('dtext, expected', [
+    ("[[long hair]]", '<a href="/wiki_pages/long_hair">long hair</a>'),
+    ("[[long_hair|Long Hair]]", '<a href="/wiki_pages/long_hair">Long Hair</a>'),
+    ("[[fox (animal)|]]", '<a href="/wiki_pages/fox_%28animal%29">fox</a>'),
+    ("[[Tag group:Hair#styles]]", '<a href="/wiki_pages/tag_group%3Ahair">Tag group:Hair</a>'),
+    ("{{cat_ears rating:g}}", '<a href="/posts?tags=cat_ears%20rating%3Ag">cat_ears rating:g</a>'),
+    ('"Site":[https://example.com/a]', '<a href="https://example.com/a">Site</a>'),
+    ("[b]a < b[/b] [[x]]", 'a &lt; b <a href="/wiki_pages/x">x</a>'),
+])
+def test_render_inline_links(dtext, expected):
+    assert render_inline(dtext) == expected
+
+
+def test_load_hierarchy_pages_skips_deleted_and_other_pages(wiki_dump):
+    pages = load_hierarchy_pages(wiki_dump)
+    assert set(pages) == {"tag_groups", "tag_group:body_parts", "tag_group:hair", "tag_group:attire",
+                          "list_of_animal_ears", "tag_group:hair_styles"}
+    assert pages["tag_group:attire"] == WIKI_PAGES["tag_group:attire"]
+
+
+def test_wiki_dump_rebuild_matches_html_crawl(wiki_dump):
+    crawler = scraper()
+    try:
+        crawled = crawler.scrape_complete_hierarchy_scalable(START_URL)
+    finally:
+        crawler.close()
+
+    rebuilder = scraper()
+    try:
+        rebuilt = rebuilder.rebuild_from_wiki_dump(wiki_dump, workers=1)
+    finally:
+        rebuilder.close()
+
+    assert item_summary(rebuilt) == item_summary(crawled)
+    assert rebuilt['ignored_elements'] == crawled['ignored_elements']
+    assert rebuilder.visited_urls == crawler.visited_urls